@@ -7,4 +7,6 @@ from .dpenalty_spring_dq import dpenalty_spring_dq
 from .d2penalty_spring_dq2 import d2penalty_spring_dq2
 from .kinematic_jacobian import kinematic_jacobian
 from .transform_mesh import transform_mesh
-from .newtons_method import newtons_method
\ No newline at end of file
+from .newtons_method import newtons_method
+from .elastic_energy_batched import elastic_energy_batched
+from .penalty_spring_batched import penalty_spring_batched
@@ -7,10 +7,11 @@ between objects. The Hessian matrix is essential for Newton's method optimizatio
 and provides information about the curvature of the contact energy landscape.
 
 The penalty spring energy for a contact is:
-    E = (k_contact) * d² (we don't need the max function because the collision detector filters out non-penetrating contacts)
+    E = w * k_contact * d² (we don't need the max function because the collision detector filters out non-penetrating contacts)
 where:
     d = n · (x_b - x_a) is the penetration depth
     n is the contact normal vector
+    w is the weight of the contact (1 for a single contact, the cluster size for a contact of a reduced manifold, see given/contact_manifold.py)
     x_a, x_b are the world positions of contact points
 
 Parameters:
@@ -24,6 +25,7 @@ Contact Information:
     - object1_id, object2_id: IDs of contacting objects
     - ref_pos_1, ref_pos_2: Reference positions in object local coordinates
     - contact_normal: Unit normal vector pointing from object1 to object2
+    - weight: Weight w of the contact, multiplies its energy, gradient and Hessian
 
 Output Format:
     For each contact, four 12x12 Hessian blocks are stored:
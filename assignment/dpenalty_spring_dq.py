@@ -6,10 +6,11 @@ configuration parameters q for contact constraints between objects. The gradient
 provides the forces that prevent interpenetration between objects.
 
 The penalty spring energy for a contact is:
-    E = k_contact * d² (we don't need the max function because the collision detector filters out non-penetrating contacts)
+    E = w * k_contact * d² (we don't need the max function because the collision detector filters out non-penetrating contacts)
 where:
     d = n · (x_b - x_a) is the penetration depth
     n is the contact normal vector
+    w is the weight of the contact (1 for a single contact, the cluster size for a contact of a reduced manifold, see given/contact_manifold.py)
     x_a, x_b are the world positions of contact points
 
 Parameters:
@@ -23,6 +24,7 @@ Contact Information:
     - object1_id, object2_id: IDs of contacting objects
     - ref_pos_1, ref_pos_2: Reference positions in object local coordinates
     - contact_normal: Unit normal vector pointing from object1 to object2
+    - weight: Weight w of the contact, multiplies its energy, gradient and Hessian
 
 The gradient contributions are accumulated atomically for each object involved
 in contacts, providing the total contact forces acting on each object.
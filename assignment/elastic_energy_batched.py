@@ -0,0 +1,41 @@
+"""
+Batched Elastic Energy for the Line Search
+
+The batched line search (see given/line_search.py) needs the elastic energy at
+q + alpha*p for every step size alpha. elastic_energy accumulates into a single value, so
+it would need one launch per step size. This kernel evaluates all step sizes in one
+launch over (step size, object) pairs and accumulates every step size into its own row
+of energy_out.
+
+The energy of an object is the one of elastic_energy.py:
+    Energy = 0.5*k*||F'F-I||^2_F * volume
+evaluated at the configuration q_alpha = q + alpha*p of the object.
+
+Parameters:
+    energy_out (wp.array2d): Output (A,S) array, the energy of object obj_id at step size alphas[alpha_id] is accumulated
+        atomically into energy_out[alpha_id, obj_id % S]. S = 1 gives the total energy of every step size, S = number of
+        objects gives the energy of every object separately
+    q (wp.array): Configuration array containing deformation gradients (12-DOF per object)
+    p (wp.array): Search direction (12-DOF per object)
+    alphas (wp.array): Step sizes
+    volumes (wp.array): Volume array for each object
+
+Launch with dim=(number of step sizes, number of objects).
+"""
+
+import warp as wp
+
+@wp.kernel
+def elastic_energy_batched(energy_out: wp.array2d(dtype=wp.float64), q: wp.array(dtype=wp.vec(length=12,dtype=wp.float64)), p: wp.array(dtype=wp.vec(length=12,dtype=wp.float64)), \
+    alphas: wp.array(dtype=wp.float64), volumes: wp.array(dtype=wp.float64)):
+
+    alpha_id, obj_id = wp.tid()
+    slot = obj_id % energy_out.shape[1]
+
+    # TODO: Implement the batched elastic energy computation
+    # 1. Compute the configuration q[obj_id] + alphas[alpha_id]*p[obj_id]
+    # 2. Compute the elastic energy of the object at that configuration, as in elastic_energy
+    # 3. Accumulate it atomically into energy_out[alpha_id, slot]
+
+    # Placeholder to prevent parsing errors
+    wp.atomic_add(energy_out, alpha_id, slot, wp.float64(0.0))
@@ -8,25 +8,44 @@ vector to find the optimal configuration q.
 
 The implementation includes:
 - Conjugate gradient (CG) solver for the linear system (use warp.optim.linear.cg with tol = 1e-5 and maxiter = 50)
-- Diagonal preconditioning for improved convergence (use warp.optim.linear.preconditioner with 'diag')
-- Backtracking line search for step size control (max 5 line search iterations)
+- Diagonal preconditioning for improved convergence (use warp.optim.linear.preconditioner with 'diag'),
+  or block Jacobi preconditioning when preconditioner == 'block_jacobi' (see given/block_jacobi_preconditioner.py),
+  or mass.inverse() as M when preconditioner == 'mass' (see given/compact_mass.py)
+- Optional sparse direct solve instead of CG: if direct_solver is given, call direct_solver.factorize(H)
+  and direct_solver.solve(-g) (see given/block_cholesky.py)
+- Optional CG warm start: if cg_warm_start is True, every CG solve after the first starts from
+  scaled_warm_start(H, -g, previous Δq) instead of zero (see given/warm_start.py)
+- Backtracking line search for step size control (max 5 line search iterations), or, if batched_energy_func
+  is given, a batched line search: evaluate batched_energy_func(q, -Δq, alphas) for alphas = line_search_alphas(...)
+  and update q with the step size selected by armijo_step_size (same Armijo constant and energy tolerance as below),
+  without any host sync (see given/line_search.py)
 - Support for constrained optimization via projection matrices (see given/fixed_dof_projection.py)
+- Matrix free systems: hessian_func may return a HessianOperator instead of a BsrMatrix. It is already projected,
+  use it as the CG system matrix directly and build the preconditioner from H.diagonal() (see given/hessian_operator.py).
+  The same operator is returned in every iteration of a step, its elastic Hessian blocks are updated in place
 
 Parameters:
     q (torch.Tensor): Current configuration vector (flattened 12-DOF per object)
     energy_func: Function that computes total energy E(q)
     gradient_func: Function that computes gradient ∇E(q)
-    hessian_func: Function that computes Hessian matrix ∇²E(q)
-    P (wps.BsrMatrix, optional): Projection matrix for constrained optimization
+    hessian_func: Function that computes Hessian matrix ∇²E(q), as a BsrMatrix or a (projected) HessianOperator
+    P (wps.BsrMatrix, optional): Projection matrix for constrained optimization, None if the Hessian and gradient
+        already account for the fixed DOFs (see given/system_matrix.py)
+    preconditioner (str, optional): CG preconditioner, 'diag', 'block_jacobi' or 'mass'
+    direct_solver (BlockCholeskySolver, optional): if given, used instead of CG to solve for the Newton direction
+    cg_warm_start (bool, optional): start CG from the previous Newton direction scaled to the current system
+    batched_energy_func (optional): function (q, p, alphas) -> energies at q + alpha*p as a device tensor, enables the batched line search
+        (evaluated with one launch of elastic_energy_batched and penalty_spring_batched over all step sizes)
+    mass (CompactMass, optional): mass matrix of the DOFs the linear system is solved for, its inverse is the 'mass' preconditioner
 
 Returns:
-    None: Updates q in-place through iterative optimization
+    (int, int): number of Newton iterations and total number of CG iterations, q is updated in-place
 
 Algorithm:
-    1. For each iteration (max 10):
+    1. For each iteration (max NEWTON_MAX_ITERATIONS = 10):
        a. Compute H = ∇²E(q) and g = ∇E(q)
-       b. Check convergence: ||g|| < 1e-1
-       c. Solve H * Δq = -g using CG with diagonal preconditioning
+       b. Check convergence: ||g|| < NEWTON_TOLERANCE = 1e-1
+       c. Solve H * Δq = -g using CG with diagonal (or block Jacobi) preconditioning, or the direct solver
        d. Perform backtracking line search to find optimal step size α
        e. Update: q = q - α * Δq
 
@@ -41,19 +60,26 @@ import warp as wp
 import warp.optim.linear as wpol
 import warp.sparse as wps
 import torch
+from given import block_jacobi_preconditioner, BlockCholeskySolver, scaled_warm_start, line_search_alphas, armijo_step_size, HessianOperator, \
+    CompactMass, NEWTON_MAX_ITERATIONS, NEWTON_TOLERANCE
 
-def newtons_method(q: torch.Tensor, energy_func, gradient_func, hessian_func, P: wps.BsrMatrix = None):
+def newtons_method(q: torch.Tensor, energy_func, gradient_func, hessian_func, P: wps.BsrMatrix = None, preconditioner: str = "diag", direct_solver: BlockCholeskySolver = None, cg_warm_start: bool = False, \
+    batched_energy_func = None, mass: CompactMass = None):
     # TODO: Implement Newton's method
-    # 1. For each iteration (max 10):
+    # 1. For each iteration (max NEWTON_MAX_ITERATIONS):
     #    a. Compute Hessian H andg radient g
     #    b. Check convergence
-    #    c. Create diagonal preconditioner
-    #    d. Solve H * Δq = -g 
+    #    c. Create diagonal preconditioner (block_jacobi_preconditioner if preconditioner == 'block_jacobi'),
+    #       from H.diagonal() if H is a HessianOperator, or use mass.inverse() if preconditioner == 'mass'
+    #    d. Solve H * Δq = -g (with direct_solver.factorize and direct_solver.solve if a direct solver is given,
+    #       otherwise CG starting from scaled_warm_start(H, -g, previous Δq) if cg_warm_start, else from zero)
     #    e. Perform backtracking line search:
     #       - Start with α = 1.0
     #       - For up to 5 iterations, check Armijo condition
     #       - If condition fails, reduce α by factor 0.5
+    #       (with batched_energy_func: one batched evaluation and armijo_step_size instead)
     #    f. Update configuration: q = q - α * Δq
+    # 2. Return the number of Newton iterations and the total number of CG iterations
     
     # Placeholder to prevent parsing errors
     pass
@@ -6,10 +6,11 @@ objects in the simulation. The penalty method approximates hard contact constrai
 using soft spring forces that penalize interpenetration.
 
 The penalty spring energy for a contact is:
-    E = k_contact * d² (we don't need the max function because the collision detector filters out non-penetrating contacts)
+    E = w * k_contact * d² (we don't need the max function because the collision detector filters out non-penetrating contacts)
 where:
     d = n · (x_b - x_a) is the penetration depth
     n is the contact normal vector
+    w is the weight of the contact (1 for a single contact, the cluster size for a contact of a reduced manifold, see given/contact_manifold.py)
     x_a, x_b are the world positions of contact points on objects A and B
     k_contact is the contact stiffness parameter
 
@@ -29,6 +30,7 @@ Contact Information:
     - object1_id, object2_id: IDs of contacting objects
     - ref_pos_1, ref_pos_2: Reference positions in object local coordinates
     - contact_normal: Unit normal contact normal in the world frame
+    - weight: Weight w of the contact, multiplies its energy, gradient and Hessian
 
 The penalty energy is accumulated atomically across all contacts to compute
 the total penalty energy of the system and stored in E_out[0].
@@ -0,0 +1,56 @@
+"""
+Batched Penalty Spring Energy for the Line Search
+
+The batched line search (see given/line_search.py) needs the contact energy at
+q + alpha*p for every step size alpha. penalty_spring accumulates into a single value, so
+it would need one launch per step size. This kernel evaluates all step sizes in one
+launch over (step size, contact) pairs and accumulates every step size into its own row
+of E_out.
+
+The energy of a contact is the one of penalty_spring.py:
+    E = w * k_contact * d²
+where:
+    d = n · (x_b - x_a) is the penetration depth
+    n is the contact normal vector
+    w is the weight of the contact (CollisionResult.weight)
+    x_a = J_a * q_a, x_b = J_b * q_b are the world positions of the contact points on objects A and B
+evaluated at the configurations q_alpha = q + alpha*p of objects A and B.
+
+Parameters:
+    E_out (wp.array2d): Output (A,S) array, the energy of a contact at step size alphas[alpha_id] is accumulated atomically
+        into E_out[alpha_id, min(object1_id, object2_id) % S]. S = 1 gives the total energy of every step size. For a set of
+        bodies numbered first, whose contacts only touch objects numbered after them, S = number of bodies gives the energy
+        of every body separately
+    q (wp.array): Configuration array containing deformation gradients (12-DOF per object)
+    p (wp.array): Search direction (12-DOF per object, zero for objects that do not move)
+    alphas (wp.array): Step sizes
+    contacts (wp.array): Array of CollisionResult structures containing contact information (see given/object_pair_collision_detection.py)
+    contact_stiffness (wp.float64): Stiffness parameter for penalty springs
+
+Launch with dim=(number of step sizes, number of contacts).
+"""
+
+import warp as wp
+from given import CollisionResult
+from .kinematic_jacobian import kinematic_jacobian
+
+@wp.kernel
+def penalty_spring_batched(E_out: wp.array2d(dtype=wp.float64), q: wp.array(dtype=wp.vec(length=12,dtype=wp.float64)), p: wp.array(dtype=wp.vec(length=12,dtype=wp.float64)), \
+    alphas: wp.array(dtype=wp.float64), contacts: wp.array(dtype=CollisionResult), contact_stiffness: wp.float64):
+
+    # Each thread processes a single (step size, contact) pair
+    alpha_id, contact_id = wp.tid()
+
+    # Check if we're out of bounds
+    if contact_id >= contacts.shape[0]:
+        return  # Do nothing because we ran too many threads
+
+    slot = wp.min(contacts[contact_id].object1_id, contacts[contact_id].object2_id) % E_out.shape[1]
+
+    # TODO: Implement the batched penalty spring energy computation
+    # 1. Compute the configurations of both objects at q + alphas[alpha_id]*p
+    # 2. Compute the penalty spring energy of the contact at those configurations, as in penalty_spring
+    # 3. Accumulate it atomically into E_out[alpha_id, slot]
+
+    # Placeholder to prevent parsing errors
+    wp.atomic_add(E_out, alpha_id, slot, wp.float64(0.0))
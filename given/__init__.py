@@ -1,4 +1,40 @@
 from .fixed_dof_projection import fixed_dof_projection
 from .object_pair_collision_detection import object_pair_collision_detection
 from .object_pair_collision_detection import detect_collisions
-from .object_pair_collision_detection import CollisionResult
\ No newline at end of file
+from .object_pair_collision_detection import CollisionResult
+from .object_pair_collision_detection import CollisionPair
+from .object_pair_collision_detection import detect_collisions_batched
+from .object_pair_collision_detection import build_collision_work_list
+from .object_pair_collision_detection import contact_object_ids
+from .broad_phase import compute_world_bounds
+from .broad_phase import sweep_and_prune
+from .broad_phase import HashGridBroadPhase
+from .contact_cache import ContactCache
+from .analytic_shapes import AnalyticShape
+from .analytic_shapes import analytic_shape_array
+from .sdf_grid import SDFGrid
+from .sdf_grid import sdf_grid_arrays
+from .vertex_cull_work_list import build_vertex_bvhs
+from .vertex_cull_work_list import build_vertex_cull_work_list
+from .contact_manifold import reduce_contact_manifolds
+from .block_jacobi_preconditioner import block_jacobi_preconditioner
+from .block_cholesky import BlockCholeskySolver
+from .warm_start import scaled_warm_start
+from .line_search import line_search_alphas
+from .line_search import armijo_step_size
+from .hessian_operator import HessianOperator
+from .system_matrix import SystemMatrix
+from .contact_islands import contact_islands
+from .contact_islands import localize_contacts
+from .dense_newton import batched_dense_newton
+from .dense_newton import NEWTON_MAX_ITERATIONS
+from .dense_newton import NEWTON_TOLERANCE
+from .body_sleeping import BodySleeping
+from .block_descent import color_bodies
+from .block_descent import block_descent
+from .contact_pair_reduction import contact_pair_segments
+from .contact_pair_reduction import reduce_contact_pairs
+from .compact_mass import CompactMass
+from .compact_mass import CompactMassInverse
+from .compact_mass import compact_mass_blocks
+from .scratch_buffers import ScratchBuffers
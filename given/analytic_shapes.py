@@ -0,0 +1,90 @@
+"""
+Analytic Collision Shapes
+
+Spheres, boxes and slabs are common enough that a closest point query against their
+triangle mesh (a BVH traversal per query vertex) is wasted work. An object can describe
+its surface with one of the closed form shapes below, expressed in the undeformed space
+of the object:
+    - sphere:     center c, radius r                 phi(p) = |p - c| - r
+    - box:        center c, half extents h           phi(p) = standard box signed distance
+    - half space: point c on the plane, normal n     phi(p) = n . (p - c)
+phi is negative inside the shape. Together with its gradient (the outward unit normal)
+it gives the closest surface point p - phi(p)*grad(phi)(p) of every query point.
+
+The narrow phase uses the analytic signed distance whenever the target object of a pair
+has an analytic shape. The shape only replaces the target surface, the vertices of the
+collision mesh are still used when the object is the querying side of a pair and its
+bounds are still used by the broad phase.
+"""
+
+import warp as wp
+
+SHAPE_MESH = wp.constant(0)
+SHAPE_SPHERE = wp.constant(1)
+SHAPE_BOX = wp.constant(2)
+SHAPE_HALF_SPACE = wp.constant(3)
+
+shape_types = {"mesh": 0, "sphere": 1, "box": 2, "half_space": 3}
+
+@wp.struct
+class AnalyticShape:
+    shape_type: wp.int32  # one of SHAPE_MESH, SHAPE_SPHERE, SHAPE_BOX, SHAPE_HALF_SPACE
+    center: wp.vec3d  # sphere or box center, point on the plane for a half space
+    size: wp.vec3d  # (radius, 0, 0) for a sphere, half extents for a box, unit normal for a half space
+
+@wp.func
+def analytic_signed_distance(shape: AnalyticShape, point: wp.vec3d):
+    # returns (grad phi, phi) with grad phi the outward unit normal of the closest surface point
+    p = point - shape.center
+
+    if shape.shape_type == SHAPE_SPHERE:
+        length = wp.length(p)
+        normal = wp.vec3d(wp.float64(0.0), wp.float64(1.0), wp.float64(0.0))
+        if length > wp.float64(0.0):
+            normal = p/length
+        return wp.vec4d(normal[0], normal[1], normal[2], length - shape.size[0])
+
+    if shape.shape_type == SHAPE_BOX:
+        q = wp.vec3d(wp.abs(p[0]) - shape.size[0], wp.abs(p[1]) - shape.size[1], wp.abs(p[2]) - shape.size[2])
+        outside = wp.vec3d(wp.max(q[0], wp.float64(0.0)), wp.max(q[1], wp.float64(0.0)), wp.max(q[2], wp.float64(0.0)))
+        outside_length = wp.length(outside)
+
+        if outside_length > wp.float64(0.0):
+            normal = wp.vec3d(wp.sign(p[0])*outside[0], wp.sign(p[1])*outside[1], wp.sign(p[2])*outside[2])/outside_length
+            return wp.vec4d(normal[0], normal[1], normal[2], outside_length)
+
+        # inside, the closest face is the one along the axis of largest q
+        axis = int(0)
+        if q[1] > q[axis]:
+            axis = 1
+        if q[2] > q[axis]:
+            axis = 2
+        normal = wp.vec3d(wp.float64(0.0), wp.float64(0.0), wp.float64(0.0))
+        normal[axis] = wp.float64(1.0) if p[axis] >= wp.float64(0.0) else wp.float64(-1.0)
+        return wp.vec4d(normal[0], normal[1], normal[2], q[axis])
+
+    # half space
+    return wp.vec4d(shape.size[0], shape.size[1], shape.size[2], wp.dot(p, shape.size))
+
+def analytic_shape_array(shape_type: list, centers: list, sizes: list, device) -> wp.array:
+    """
+    Pack per object shape descriptions into a Warp array.
+
+    Args:
+        shape_type: shape name of every object, a key of shape_types
+        centers: (N,3) shape centers in the undeformed space of each object
+        sizes: (N,3) shape sizes, see AnalyticShape
+        device: Warp or torch device
+
+    Returns:
+        wp.array: array of AnalyticShape structs, one per object
+    """
+    shapes = []
+    for i in range(len(shape_type)):
+        shape = AnalyticShape()
+        shape.shape_type = shape_types[shape_type[i]]
+        shape.center = wp.vec3d(*[float(x) for x in centers[i]])
+        shape.size = wp.vec3d(*[float(x) for x in sizes[i]])
+        shapes.append(shape)
+
+    return wp.array(shapes, dtype=AnalyticShape, device=str(device))
@@ -0,0 +1,166 @@
+"""
+Block Coordinate Descent with Graph Coloring
+
+Instead of a global Newton step, the incremental potential can be minimized one body at a
+time, in the spirit of Vertex Block Descent (Chen et al. 2024) with a 12 DOF affine body
+as the block. With all other bodies held fixed, body i takes the local Newton step
+    q_i -= H_ii^{-1} g_i
+    H_ii = M_ii + dt^2 (H_e,ii + sum of the contact Hessian blocks on the diagonal of i)
+    g_i  = block i of the gradient of the incremental potential
+so no global matrix is ever assembled or solved.
+
+Bodies only interact through contacts, so bodies that share no contact can be updated at
+the same time. color_bodies colors the contact graph of the free bodies such that no
+two bodies of a color are in contact, and block_descent sweeps over the colors, updating
+all bodies of a color in one launch of block_descent_step (a Gauss-Seidel sweep over
+the colors, Jacobi within a color).
+
+Block descent converges linearly, optionally accelerated with the Chebyshev semi-iterative
+method (Wang 2015): with the estimated spectral radius rho of the sweep,
+    omega_1 = 1, omega_2 = 2/(2 - rho^2), omega_{k+1} = 4/(4 - rho^2 omega_k)
+    q^{k+1} = omega_{k+1} (q_sweep^{k+1} - q^{k-1}) + q^{k-1}
+"""
+
+import warp as wp
+import torch
+
+@wp.func
+def block_solve(A: wp.mat((12,12),dtype=wp.float64), b: wp.vec(length=12,dtype=wp.float64)):
+    # solves A x = b with a dense Cholesky factorization, falls back to a Jacobi step if A is not positive definite
+    L = wp.matrix(shape=(12,12), dtype=wp.float64)
+    positive = int(1)
+    for j in range(12):
+        s = A[j,j]
+        for k in range(j):
+            s -= L[j,k]*L[j,k]
+        if s <= wp.float64(0.0):
+            positive = 0
+            break
+        L[j,j] = wp.sqrt(s)
+        for i in range(j + 1, 12):
+            t = A[i,j]
+            for k in range(j):
+                t -= L[i,k]*L[j,k]
+            L[i,j] = t/L[j,j]
+
+    x = wp.vector(length=12, dtype=wp.float64)
+    if positive == 1:
+        #L y = b, then L^T x = y
+        for i in range(12):
+            t = b[i]
+            for k in range(i):
+                t -= L[i,k]*x[k]
+            x[i] = t/L[i,i]
+        for r in range(12):
+            i = 11 - r
+            t = x[i]
+            for k in range(i + 1, 12):
+                t -= L[k,i]*x[k]
+            x[i] = t/L[i,i]
+    else:
+        for i in range(12):
+            if A[i,i] > wp.float64(0.0):
+                x[i] = b[i]/A[i,i]
+
+    return x
+
+@wp.kernel
+def block_descent_step(
+    q: wp.array(dtype=wp.vec(length=12,dtype=wp.float64)),
+    g: wp.array(dtype=wp.vec(length=12,dtype=wp.float64)),
+    H: wp.array(dtype=wp.mat((12,12),dtype=wp.float64)),
+    bodies: wp.array(dtype=wp.int32)
+):
+    # one thread per body of the current color, local Newton step of the body
+    i = bodies[wp.tid()]
+    q[i] = q[i] - block_solve(H[i], g[i])
+
+def color_bodies(contact_pairs: torch.Tensor, free: torch.Tensor) -> torch.Tensor:
+    """
+    Color the contact graph of the free bodies, bodies in contact get different colors.
+
+    Every round gives the next color to the uncolored bodies that have a higher priority
+    than all of their uncolored neighbours (bodies with more contacts first), which is an
+    independent set of the remaining graph.
+
+    Args:
+        contact_pairs: (P,2) (object1_id, object2_id) pairs with contacts, ids of static objects are >= free.shape[0]
+        free: (N,) bool, True for every free (dynamic and not pinned) body
+
+    Returns:
+        torch.Tensor: (N,) int64 color of every body numbered 0..C-1, -1 for bodies that are not free
+    """
+    num_bodies = free.shape[0]
+    device = free.device
+
+    a = contact_pairs[:,0].long()
+    b = contact_pairs[:,1].long()
+    edges = (a < num_bodies) & (b < num_bodies) & (a != b)
+    edges[edges.clone()] = free[a[edges]] & free[b[edges]]
+    a, b = torch.cat((a[edges], b[edges])), torch.cat((b[edges], a[edges]))
+
+    degree = torch.bincount(a, minlength=num_bodies)
+    priority = degree*num_bodies + torch.arange(num_bodies, device=device)
+
+    colors = torch.full((num_bodies,), -1, dtype=torch.int64, device=device)
+    color = 0
+    while True:
+        uncolored = free & (colors < 0)
+        if not torch.any(uncolored):
+            break
+
+        #bodies with an uncolored neighbour of higher priority wait for a later color
+        waiting = torch.zeros((num_bodies,), dtype=torch.bool, device=device)
+        waiting[a[uncolored[a] & uncolored[b] & (priority[b] > priority[a])]] = True
+
+        colors[uncolored & ~waiting] = color
+        color += 1
+
+    return colors
+
+def block_descent(q: torch.Tensor, gradient_func, hessian_blocks_func, colors: torch.Tensor, max_iterations: int, tolerance: float, chebyshev_rho: float = None) -> int:
+    """
+    Minimize the incremental potential by colored block coordinate descent, in place.
+
+    Args:
+        q: (12*N,) configuration of the N dynamic bodies, updated in place
+        gradient_func: function (12*N,) -> (12*N,) gradient of the incremental potential
+        hessian_blocks_func: function (12*N,) -> (N,12,12) diagonal Hessian block of every body
+        colors: (N,) color of every body, -1 for bodies that do not move, see color_bodies
+        max_iterations: maximum number of sweeps over all colors
+        tolerance: norm of the gradient of the free DOFs below which the solve stops
+        chebyshev_rho: estimated spectral radius of a sweep for Chebyshev acceleration, None to disable it
+
+    Returns:
+        int: number of sweeps
+    """
+    num_colors = int(colors.max().item()) + 1
+    color_sets = [wp.from_torch(torch.nonzero(colors == c).reshape((-1,)).to(torch.int32)) for c in range(num_colors)]
+    free = (colors >= 0).repeat_interleave(12)
+
+    q_blocks = wp.from_torch(q.reshape((-1,12)), dtype=wp.vec(length=12,dtype=wp.float64))
+    q_previous = q.clone()
+    omega = 1.0
+
+    sweeps = 0
+    for k in range(max_iterations):
+        q_start = q.clone()
+
+        for c in range(num_colors):
+            g = gradient_func(q)
+            if c == 0 and torch.linalg.norm(g[free]) < tolerance:
+                return sweeps
+
+            wp.launch(block_descent_step, dim=color_sets[c].shape[0], inputs=[q_blocks, wp.from_torch(g.reshape((-1,12)), dtype=wp.vec(length=12,dtype=wp.float64)), \
+                wp.from_torch(hessian_blocks_func(q).contiguous(), dtype=wp.mat((12,12),dtype=wp.float64)), color_sets[c]], device=q_blocks.device)
+
+        #Chebyshev semi-iterative acceleration of the sweep
+        if chebyshev_rho is not None:
+            rho2 = chebyshev_rho*chebyshev_rho
+            omega = 1.0 if k == 0 else (2.0/(2.0 - rho2) if k == 1 else 4.0/(4.0 - rho2*omega))
+            q.copy_(omega*(q - q_previous) + q_previous)
+        q_previous = q_start
+
+        sweeps += 1
+
+    return sweeps
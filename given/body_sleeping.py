@@ -0,0 +1,151 @@
+"""
+Body Sleeping
+
+Once the bodies of a stack have settled they keep paying for the narrow phase, the
+assembly and the Newton solve in every step although they do not move anymore.
+BodySleeping counts, for every movable (dynamic and not pinned) body, the consecutive
+steps in which it was still:
+    - its velocity ||q - q_prev||/dt is below velocity_threshold
+    - its contact force changed by less than force_threshold times its magnitude since
+      the previous step
+A body resting on another one carries a constant contact force (its weight), so the
+change of the contact force is tested rather than its magnitude.
+
+Bodies fall asleep island by island (see given/contact_islands.py): once every body of an
+island has been still for sleep_steps steps the whole island falls asleep as one sleep
+group. Sleeping bodies are frozen like pinned ones (see Simulator.update_free_dofs) and
+pairs of frozen objects are not sent to the narrow phase. A sleep group wakes up as a
+whole when one of its bodies
+    - gets a contact with an awake body that it had no contact with in the previous step
+    - is in contact with an awake body moving faster than velocity_threshold
+    - receives an impulse (see Simulator.apply_impulse)
+"""
+
+import torch
+
+class BodySleeping:
+    """
+    Sleep state of the dynamic bodies of a scene.
+
+    Call wake_on_contacts() after collision detection and update() after the Newton solve of every step.
+    """
+
+    def __init__(self, movable: torch.Tensor, velocity_threshold: float, force_threshold: float, sleep_steps: int):
+        """
+        Args:
+            movable: (N,) bool, True for every dynamic body that is not pinned
+            velocity_threshold: velocity norm below which a body is still
+            force_threshold: change of the contact force per step, relative to its norm, below which a body is still
+            sleep_steps: number of consecutive still steps after which an island falls asleep
+        """
+        self.movable = movable
+        self.velocity_threshold = velocity_threshold
+        self.force_threshold = force_threshold
+        self.sleep_steps = sleep_steps
+        self.reset()
+
+    def reset(self):
+        """
+        Wake every body up and forget the step history.
+        """
+        num_bodies = self.movable.shape[0]
+        device = self.movable.device
+
+        self.asleep = torch.zeros((num_bodies,), dtype=torch.bool, device=device)
+        self.still_steps = torch.zeros((num_bodies,), dtype=torch.int64, device=device)
+        self.group = torch.full((num_bodies,), -1, dtype=torch.int64, device=device)
+        self.num_groups = 0
+        self.contact_forces = None
+        self.pair_keys = torch.zeros((0,), dtype=torch.int64, device=device)
+
+    def wake(self, bodies: torch.Tensor) -> bool:
+        """
+        Wake up the sleep groups of the given bodies.
+
+        Args:
+            bodies: indices of the bodies to wake up, awake bodies are ignored
+
+        Returns:
+            bool: True if a body woke up
+        """
+        groups = self.group[bodies.long()]
+        waking = self.asleep & torch.isin(self.group, groups[groups >= 0])
+        if not torch.any(waking):
+            return False
+
+        self.asleep[waking] = False
+        self.group[waking] = -1
+        self.still_steps[waking] = 0
+
+        return True
+
+    def wake_on_contacts(self, contact_pairs: torch.Tensor, velocities: torch.Tensor) -> bool:
+        """
+        Wake up the sleep groups touched by an awake body through a new contact or while it moves.
+
+        Args:
+            contact_pairs: (P,2) (object1_id, object2_id) pairs with contacts, ids of static objects are >= N
+            velocities: (N,12) velocity of every body
+
+        Returns:
+            bool: True if a body woke up
+        """
+        num_bodies = self.movable.shape[0]
+
+        a = contact_pairs[:,0].long()
+        b = contact_pairs[:,1].long()
+        dynamic = (a < num_bodies) & (b < num_bodies)
+        a = a[dynamic]
+        b = b[dynamic]
+
+        #contact pairs are compared without orientation
+        keys = torch.minimum(a, b)*num_bodies + torch.maximum(a, b)
+        new = ~torch.isin(keys, self.pair_keys)
+        self.pair_keys = keys
+
+        awake = self.movable & ~self.asleep
+        moving = torch.linalg.norm(velocities, dim=1) >= self.velocity_threshold
+        waking_a = self.asleep[a] & awake[b] & (new | moving[b])
+        waking_b = self.asleep[b] & awake[a] & (new | moving[a])
+
+        return self.wake(torch.cat((a[waking_a], b[waking_b])))
+
+    def update(self, velocities: torch.Tensor, contact_forces: torch.Tensor, islands: torch.Tensor) -> bool:
+        """
+        Count the still steps of the awake bodies and put the islands that have been still long enough to sleep.
+
+        Args:
+            velocities: (N,12) velocity of every body
+            contact_forces: (N,12) contact force of every body
+            islands: (N,) island of every awake movable body, -1 for all other bodies, see contact_islands
+
+        Returns:
+            bool: True if a body fell asleep
+        """
+        force_change = contact_forces - self.contact_forces if self.contact_forces is not None else contact_forces
+        self.contact_forces = contact_forces.clone()
+
+        still = (torch.linalg.norm(velocities, dim=1) < self.velocity_threshold) & \
+            (torch.linalg.norm(force_change, dim=1) <= self.force_threshold*torch.linalg.norm(contact_forces, dim=1))
+        awake = islands >= 0
+        self.still_steps = torch.where(awake & still, self.still_steps + 1, 0)
+
+        if not torch.any(awake):
+            return False
+
+        #an island is as still as its least still body
+        num_islands = int(islands.max().item()) + 1
+        island_steps = torch.full((num_islands,), self.sleep_steps, dtype=torch.int64, device=islands.device)
+        island_steps = island_steps.scatter_reduce(0, islands[awake], self.still_steps[awake], reduce="amin")
+
+        falling_asleep = awake.clone()
+        falling_asleep[awake] = island_steps[islands[awake]] >= self.sleep_steps
+        if not torch.any(falling_asleep):
+            return False
+
+        self.asleep |= falling_asleep
+        self.group[falling_asleep] = self.num_groups + islands[falling_asleep]
+        self.num_groups += num_islands
+        self.still_steps[falling_asleep] = 0
+
+        return True
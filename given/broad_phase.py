@@ -0,0 +1,305 @@
+"""
+Object-Level Broad Phase Collision Detection
+
+This module culls object pairs that cannot be in contact before they are sent to
+the (comparatively expensive) vertex-vs-mesh narrow phase in
+object_pair_collision_detection.py.
+
+Each object stores an axis aligned bounding box (AABB) of its undeformed mesh. For an
+affine body with configuration q (a 3x4 matrix [A | t]) the world space bounds of the
+transformed box are
+    center_world = A * center_local + t
+    half_world   = |A| * half_local
+where |A| is the elementwise absolute value of A. The world space boxes are inflated by
+a small margin (the contact threshold) so that pairs which are just touching are kept.
+
+Overlapping boxes are found using sweep and prune: boxes are sorted by their lower x
+coordinate, each box is tested only against the boxes whose lower x bound lies inside
+its own x extent and the surviving candidates are filtered using the y and z extents.
+
+Sweep and prune sorts all boxes and expands every sweep interval, which is fine for tens
+of objects but not for piles of thousands of bodies. For those, HashGridBroadPhase inserts
+the box centers into a uniform hash grid (wp.HashGrid) and every box only visits the
+centers within its own bounding radius plus the largest bounding radius, which takes
+roughly linear time. The cell size is the diameter of the largest grid object and the
+grid gets enough cells to cover the scene, both are set up once from the bounds of the
+first call. Objects much larger than the typical body (e.g. a floor) would force a huge
+cell size, so they are kept out of the grid and swept along x over the sorted boxes
+instead, which only visits the boxes near their x extent.
+
+Pairs are returned as unordered (a, b) pairs with a < b, sorted lexicographically so
+that the narrow phase visits them in a deterministic order.
+"""
+
+import math
+import warp as wp
+import torch
+
+@wp.kernel
+def object_world_bounds(
+    lowers_out: wp.array(dtype=wp.vec3d),
+    uppers_out: wp.array(dtype=wp.vec3d),
+    global_q: wp.array(dtype=wp.vec(length=12,dtype=wp.float64)),
+    local_lowers: wp.array(dtype=wp.vec3d),
+    local_uppers: wp.array(dtype=wp.vec3d),
+    margin: wp.float64
+):
+    # one thread per object
+    obj_id = wp.tid()
+
+    # q format: [R00, R01, R02, tx, R10, R11, R12, ty, R20, R21, R22, tz]
+    A = wp.mat33d(
+        global_q[obj_id][0], global_q[obj_id][1], global_q[obj_id][2],
+        global_q[obj_id][4], global_q[obj_id][5], global_q[obj_id][6],
+        global_q[obj_id][8], global_q[obj_id][9], global_q[obj_id][10]
+    )
+    t = wp.vec3d(global_q[obj_id][3], global_q[obj_id][7], global_q[obj_id][11])
+
+    center = wp.float64(0.5)*(local_lowers[obj_id] + local_uppers[obj_id])
+    half = wp.float64(0.5)*(local_uppers[obj_id] - local_lowers[obj_id])
+
+    world_center = A @ center + t
+    world_half = wp.vec3d(
+        wp.abs(A[0, 0])*half[0] + wp.abs(A[0, 1])*half[1] + wp.abs(A[0, 2])*half[2],
+        wp.abs(A[1, 0])*half[0] + wp.abs(A[1, 1])*half[1] + wp.abs(A[1, 2])*half[2],
+        wp.abs(A[2, 0])*half[0] + wp.abs(A[2, 1])*half[1] + wp.abs(A[2, 2])*half[2]
+    )
+
+    inflate = wp.vec3d(margin, margin, margin)
+    lowers_out[obj_id] = world_center - world_half - inflate
+    uppers_out[obj_id] = world_center + world_half + inflate
+
+def compute_world_bounds(lowers_out: torch.Tensor, uppers_out: torch.Tensor, global_q: torch.Tensor, local_lowers: torch.Tensor, local_uppers: torch.Tensor, margin: float):
+    """
+    Compute inflated world space AABBs for every object.
+
+    Args:
+        lowers_out: (N,3) output tensor of lower box corners
+        uppers_out: (N,3) output tensor of upper box corners
+        global_q: (N,12) generalized coordinates of all objects
+        local_lowers: (N,3) lower corners of the undeformed object bounds
+        local_uppers: (N,3) upper corners of the undeformed object bounds
+        margin: distance used to inflate every box
+
+    Returns:
+        (lowers_out, uppers_out)
+    """
+    wp.launch(object_world_bounds, dim=global_q.shape[0], \
+        inputs=[wp.from_torch(lowers_out, dtype=wp.vec3d), wp.from_torch(uppers_out, dtype=wp.vec3d), \
+                wp.from_torch(global_q, dtype=wp.vec(length=12,dtype=wp.float64)), \
+                wp.from_torch(local_lowers, dtype=wp.vec3d), wp.from_torch(local_uppers, dtype=wp.vec3d), wp.float64(margin)], \
+        device=wp.device_from_torch(global_q.device))
+
+    return lowers_out, uppers_out
+
+def sweep_and_prune(lowers: torch.Tensor, uppers: torch.Tensor) -> torch.Tensor:
+    """
+    Find all pairs of overlapping AABBs using sweep and prune along the x axis.
+
+    Args:
+        lowers: (N,3) lower box corners
+        uppers: (N,3) upper box corners
+
+    Returns:
+        torch.Tensor: (K,2) int64 tensor of overlapping pairs (a, b) with a < b, sorted by a then b
+    """
+    num_boxes = lowers.shape[0]
+    device = lowers.device
+
+    #sort boxes along the sweep axis
+    order = torch.argsort(lowers[:, 0])
+    sorted_lowers = lowers[order, 0].contiguous()
+    sorted_uppers = uppers[order, 0].contiguous()
+
+    #every box i overlaps, along x, the sorted boxes i+1 ... end-1 whose lower bound is inside its extent
+    start = torch.arange(1, num_boxes+1, device=device)
+    end = torch.searchsorted(sorted_lowers, sorted_uppers, right=True)
+    counts = (end - start).clamp(min=0)
+
+    #expand the sweep intervals into explicit candidate pairs
+    first = torch.repeat_interleave(torch.arange(num_boxes, device=device), counts)
+    interval_offsets = torch.cumsum(counts, 0) - counts
+    second = first + 1 + torch.arange(first.shape[0], device=device) - torch.repeat_interleave(interval_offsets, counts)
+
+    a = order[first]
+    b = order[second]
+
+    #prune candidates using the remaining two axes
+    overlap = ((lowers[a, 1:] <= uppers[b, 1:]) & (lowers[b, 1:] <= uppers[a, 1:])).all(dim=1)
+    pairs = torch.stack((torch.minimum(a, b), torch.maximum(a, b)), dim=1)[overlap]
+
+    #deterministic pair order
+    keys = pairs[:, 0]*num_boxes + pairs[:, 1]
+    return pairs[torch.argsort(keys)]
+
+@wp.func
+def boxes_overlap(lowers: wp.array(dtype=wp.vec3d), uppers: wp.array(dtype=wp.vec3d), a: wp.int32, b: wp.int32):
+    return lowers[a][0] <= uppers[b][0] and lowers[b][0] <= uppers[a][0] and \
+        lowers[a][1] <= uppers[b][1] and lowers[b][1] <= uppers[a][1] and \
+        lowers[a][2] <= uppers[b][2] and lowers[b][2] <= uppers[a][2]
+
+@wp.kernel
+def hash_grid_neighbours(
+    grid: wp.uint64,
+    centers: wp.array(dtype=wp.vec3),
+    grid_objects: wp.array(dtype=wp.int32),
+    radii: wp.array(dtype=wp.float32),
+    max_radius: wp.array(dtype=wp.float32),
+    lowers: wp.array(dtype=wp.vec3d),
+    uppers: wp.array(dtype=wp.vec3d),
+    num_pairs: wp.array(dtype=wp.int32),
+    pairs_out: wp.array2d(dtype=wp.int32)
+):
+    # one thread per grid object, appends its overlapping neighbours with a larger index, pairs beyond the capacity of pairs_out are only counted
+    i = wp.tid()
+    a = grid_objects[i]
+
+    query = wp.hash_grid_query(grid, centers[i], radii[i] + max_radius[0])
+    j = wp.int32(0)
+    while wp.hash_grid_query_next(query, j):
+        b = grid_objects[j]
+        if b > a and boxes_overlap(lowers, uppers, a, b):
+            slot = wp.atomic_add(num_pairs, 0, 1)
+            if slot < pairs_out.shape[0]:
+                pairs_out[slot, 0] = a
+                pairs_out[slot, 1] = b
+
+def large_object_pairs(lowers: torch.Tensor, uppers: torch.Tensor, large_objects: torch.Tensor, max_small_width: torch.Tensor) -> torch.Tensor:
+    """
+    Find the overlapping pairs that involve a large box by sweeping every large box along x over the sorted boxes.
+
+    Args:
+        lowers: (N,3) lower box corners
+        uppers: (N,3) upper box corners
+        large_objects: (L,) int64 indices of the large boxes
+        max_small_width: scalar tensor, largest x extent of the boxes that are not large
+
+    Returns:
+        torch.Tensor: (K,2) int64 tensor of overlapping pairs (a, b) with a < b, unsorted, pairs of two large boxes can appear twice
+    """
+    device = lowers.device
+    num_large = large_objects.shape[0]
+
+    order = torch.argsort(lowers[:, 0])
+    sorted_lowers = lowers[order, 0].contiguous()
+
+    #boxes starting inside the x extent of a large box, and boxes starting up to max_small_width before it, which a small box can reach across
+    #a large box starting further before overlaps the large box only if it is itself found by the sweep of the other one
+    start = torch.searchsorted(sorted_lowers, (lowers[large_objects, 0] - max_small_width).contiguous())
+    end = torch.searchsorted(sorted_lowers, uppers[large_objects, 0].contiguous(), right=True)
+    counts = (end - start).clamp(min=0)
+
+    #expand the sweep intervals into explicit candidate pairs
+    first = torch.repeat_interleave(torch.arange(num_large, device=device), counts)
+    interval_offsets = torch.cumsum(counts, 0) - counts
+    second = start[first] + torch.arange(first.shape[0], device=device) - torch.repeat_interleave(interval_offsets, counts)
+
+    a = large_objects[first]
+    b = order[second]
+
+    overlap = ((lowers[a] <= uppers[b]) & (lowers[b] <= uppers[a])).all(dim=1) & (a != b)
+    return torch.stack((torch.minimum(a, b), torch.maximum(a, b)), dim=1)[overlap]
+
+class HashGridBroadPhase:
+    """
+    Broad phase for piles of many similar bodies, a hash grid over the box centers plus a sweep for the few large boxes.
+
+    The split into grid objects and large objects and the grid resolution are set up from the bounds of the first call.
+    """
+
+    def __init__(self, device, large_object_ratio: float = 4.0, max_grid_dim: int = 128):
+        """
+        Args:
+            device: torch device
+            large_object_ratio: boxes whose bounding radius exceeds this multiple of the median radius are swept instead of being put in the grid
+            max_grid_dim: largest number of grid cells along every axis, the grid wraps around beyond it
+        """
+        self.device = device
+        self.large_object_ratio = large_object_ratio
+        self.max_grid_dim = max_grid_dim
+
+        self.grid = None
+        self.grid_objects = None
+        self.large_objects = None
+        self.max_small_width = None
+
+        #grid pairs are appended through an atomic counter, the buffer grows when a step finds more pairs than it holds
+        self.num_pairs = torch.zeros((1,), dtype=torch.int32, device=device)
+        self.pairs_buffer = torch.zeros((0,2), dtype=torch.int32, device=device)
+
+    def setup(self, lowers: torch.Tensor, uppers: torch.Tensor):
+        """
+        Split the boxes into grid objects and large objects and size the grid to cover the grid objects.
+
+        Args:
+            lowers: (N,3) lower box corners
+            uppers: (N,3) upper box corners
+        """
+        radii = 0.5*torch.linalg.norm(uppers - lowers, dim=1)
+        large = radii > self.large_object_ratio*torch.median(radii)
+
+        self.grid_objects = torch.nonzero(~large).reshape(-1).to(torch.int32)
+        self.large_objects = torch.nonzero(large).reshape(-1)
+        self.max_small_width = torch.zeros((), dtype=lowers.dtype, device=self.device)
+
+        num_grid = self.grid_objects.shape[0]
+        if num_grid == 0:
+            return
+
+        #cells as wide as the largest grid object, and enough of them to cover the grid objects without wrapping around
+        self.cell_size = max(2.0*float(radii[~large].max()), 1e-6)
+        extent = uppers[~large].amax(dim=0) - lowers[~large].amin(dim=0)
+        dims = [min(max(math.ceil(e/self.cell_size) + 1, 1), self.max_grid_dim) for e in extent.tolist()]
+        self.grid = wp.HashGrid(dims[0], dims[1], dims[2], device=wp.device_from_torch(self.device))
+
+        self.max_small_width = (uppers - lowers)[~large, 0].amax()
+        self.pairs_buffer = torch.zeros((4*num_grid, 2), dtype=torch.int32, device=self.device)
+
+    def pairs(self, lowers: torch.Tensor, uppers: torch.Tensor) -> torch.Tensor:
+        """
+        Find all pairs of overlapping AABBs.
+
+        Args:
+            lowers: (N,3) lower box corners
+            uppers: (N,3) upper box corners
+
+        Returns:
+            torch.Tensor: (K,2) int64 tensor of overlapping pairs (a, b) with a < b, sorted by a then b
+        """
+        if self.grid_objects is None:
+            self.setup(lowers, uppers)
+
+        num_boxes = lowers.shape[0]
+        pairs = [torch.zeros((0,2), dtype=torch.int64, device=self.device)]
+
+        #objects in the grid, every query covers the radius of the object plus the largest radius, read on the device
+        num_grid = self.grid_objects.shape[0]
+        if num_grid > 1:
+            grid_objects = self.grid_objects.long()
+            centers = wp.from_torch((0.5*(lowers[grid_objects] + uppers[grid_objects])).to(torch.float32).contiguous(), dtype=wp.vec3)
+            radii = (0.5*torch.linalg.norm(uppers[grid_objects] - lowers[grid_objects], dim=1)).to(torch.float32).contiguous()
+            max_radius = radii.amax().reshape((1,))
+            self.grid.build(centers, self.cell_size)
+
+            inputs = [self.grid.id, centers, wp.from_torch(self.grid_objects), wp.from_torch(radii), wp.from_torch(max_radius), \
+                wp.from_torch(lowers, dtype=wp.vec3d), wp.from_torch(uppers, dtype=wp.vec3d), wp.from_torch(self.num_pairs)]
+
+            #the number of pairs is the only value read back, a second launch is only needed if the buffer overflowed
+            self.num_pairs.zero_()
+            wp.launch(hash_grid_neighbours, dim=num_grid, inputs=inputs + [wp.from_torch(self.pairs_buffer)], device=wp.device_from_torch(self.device))
+            num_pairs = int(self.num_pairs.item())
+            if num_pairs > self.pairs_buffer.shape[0]:
+                self.pairs_buffer = torch.zeros((2*num_pairs, 2), dtype=torch.int32, device=self.device)
+                self.num_pairs.zero_()
+                wp.launch(hash_grid_neighbours, dim=num_grid, inputs=inputs + [wp.from_torch(self.pairs_buffer)], device=wp.device_from_torch(self.device))
+
+            pairs.append(self.pairs_buffer[0:num_pairs].long())
+
+        #large objects against the boxes near them along x
+        if self.large_objects.shape[0] > 0:
+            pairs.append(large_object_pairs(lowers, uppers, self.large_objects, self.max_small_width))
+
+        #grid pairs come in the order the threads found them, and pairs of two large objects can be found twice
+        pairs = torch.cat(pairs)
+        keys = torch.unique(pairs[:, 0]*num_boxes + pairs[:, 1], sorted=True)
+        return torch.stack((keys // num_boxes, keys % num_boxes), dim=1)
@@ -0,0 +1,205 @@
+"""
+Compact Affine Body Mass Matrix
+
+With q = [F_00, F_01, F_02, t_0, F_10, ..., t_2] the world position of a point X of an
+affine body is x_r = [F_r0, F_r1, F_r2, t_r] . [X, 1], so the mass matrix of every body is
+three copies of the same 4x4 block (see assignment/mass_matrix_abd_object.py),
+    M_i = I_3 (x) Mbar_i,        Mbar_i = rho * int [X, 1][X, 1]^T dV
+Storing M as a BSR matrix of 12x12 blocks keeps 144 values per body where 16 are enough,
+and every product M x multiplies the zero blocks too.
+
+CompactMass stores the 4x4 block Mbar_i of every body and nothing else:
+    - matvec applies M with one thread per body, row r of body i is
+          (M x)_i,r = Mbar_i x_i,r         x_i,r = (x_i[4r], ..., x_i[4r+3])
+    - system_blocks writes the diagonal blocks (I_3 (x) Mbar_i) + s H_i of the Newton
+      system into a buffer of the caller in one launch, the expanded mass blocks are
+      never stored
+    - inverse applies M^-1 = I_3 (x) Mbar_i^-1, a cheap exact block inverse that can be used
+      as a CG preconditioner (preconditioner == "mass"). The 4x4 blocks are factored with a
+      batched Cholesky factorization on the first call only. Blocks that are not positive
+      definite (e.g. the zero blocks of an unimplemented mass_matrix_abd_object) fall back
+      to the identity
+"""
+
+import warp as wp
+import warp.optim.linear as wpol
+import torch
+
+@wp.kernel
+def compact_mass_mv(
+    z: wp.array(dtype=wp.vec(length=12,dtype=wp.float64)),
+    x: wp.array(dtype=wp.vec(length=12,dtype=wp.float64)),
+    blocks: wp.array(dtype=wp.mat((4,4),dtype=wp.float64))
+):
+    # one thread per body, z_i = (I_3 (x) Mbar_i) x_i
+    i = wp.tid()
+    Mbar = blocks[i]
+    xi = x[i]
+
+    zi = wp.vector(length=12, dtype=wp.float64)
+    for r in range(3):
+        for c in range(4):
+            s = wp.float64(0.0)
+            for d in range(4):
+                s += Mbar[c,d]*xi[4*r + d]
+            zi[4*r + c] = s
+
+    z[i] = zi
+
+@wp.kernel
+def compact_mass_inverse_mv(
+    z: wp.array(dtype=wp.vec(length=12,dtype=wp.float64)),
+    x: wp.array(dtype=wp.vec(length=12,dtype=wp.float64)),
+    y: wp.array(dtype=wp.vec(length=12,dtype=wp.float64)),
+    inverse_blocks: wp.array(dtype=wp.mat((4,4),dtype=wp.float64)),
+    alpha: wp.float64,
+    beta: wp.float64
+):
+    # one thread per body, z_i = alpha*(I_3 (x) Mbar_i^-1) x_i + beta*y_i
+    i = wp.tid()
+    Minv = inverse_blocks[i]
+    xi = x[i]
+
+    zi = wp.vector(length=12, dtype=wp.float64)
+    for r in range(3):
+        for c in range(4):
+            s = wp.float64(0.0)
+            for d in range(4):
+                s += Minv[c,d]*xi[4*r + d]
+            zi[4*r + c] = alpha*s
+
+    if beta != wp.float64(0.0):
+        zi += beta*y[i]
+
+    z[i] = zi
+
+@wp.kernel
+def compact_system_blocks(
+    blocks_out: wp.array(dtype=wp.mat((12,12),dtype=wp.float64)),
+    blocks: wp.array(dtype=wp.mat((4,4),dtype=wp.float64)),
+    energy_blocks: wp.array(dtype=wp.mat((12,12),dtype=wp.float64)),
+    scale: wp.float64
+):
+    # one thread per body, (I_3 (x) Mbar_i) + scale*H_i
+    i = wp.tid()
+    Mbar = blocks[i]
+
+    block = scale*energy_blocks[i]
+    for r in range(3):
+        for c in range(4):
+            for d in range(4):
+                block[4*r + c, 4*r + d] = block[4*r + c, 4*r + d] + Mbar[c,d]
+
+    blocks_out[i] = block
+
+class CompactMassInverse(wpol.LinearOperator):
+    """
+    Inverse of a CompactMass as a linear operator, can be passed as M to warp.optim.linear.cg.
+    """
+
+    def __init__(self, inverse_blocks: torch.Tensor):
+        """
+        Args:
+            inverse_blocks: (N,4,4) inverse of the 4x4 mass block of every body
+        """
+        num_bodies = inverse_blocks.shape[0]
+        self.inverse_blocks = wp.from_torch(inverse_blocks.contiguous(), dtype=wp.mat((4,4),dtype=wp.float64))
+        super().__init__((12*num_bodies, 12*num_bodies), wp.mat((12,12),dtype=wp.float64), self.inverse_blocks.device, self.apply)
+
+    def apply(self, x: wp.array, y: wp.array, z: wp.array, alpha: float, beta: float):
+        """
+        z = alpha*M^-1 x + beta*y, the matvec of warp.optim.linear.LinearOperator.
+        """
+        wp.launch(compact_mass_inverse_mv, dim=self.inverse_blocks.shape[0], inputs=[z, x, y, self.inverse_blocks, wp.float64(alpha), wp.float64(beta)], \
+            device=self.device)
+
+class CompactMass:
+    """
+    Block diagonal ABD mass matrix stored as one 4x4 block per body.
+    """
+
+    def __init__(self, blocks: torch.Tensor):
+        """
+        Args:
+            blocks: (N,4,4) mass block Mbar of every body, see compact_mass_blocks
+        """
+        self.blocks = blocks.contiguous()
+        self.blocks_wp = wp.from_torch(self.blocks, dtype=wp.mat((4,4),dtype=wp.float64))
+        #factored on the first call of inverse()
+        self.inverse_operator = None
+
+    def subset(self, bodies: torch.Tensor) -> "CompactMass":
+        """
+        Mass matrix of a subset of the bodies.
+
+        Args:
+            bodies: indices of the bodies
+
+        Returns:
+            CompactMass: mass matrix of the bodies, in the order given
+        """
+        return CompactMass(self.blocks[bodies.long()])
+
+    def matvec(self, x: torch.Tensor) -> wp.array:
+        """
+        Product M x.
+
+        Args:
+            x: (12*N,) vector
+
+        Returns:
+            wp.array: (N,) vec12 array holding M x, like the product of a BsrMatrix with 12x12 blocks
+        """
+        x_blocks = wp.from_torch(x.contiguous().reshape((-1,12)), dtype=wp.vec(length=12,dtype=wp.float64))
+        z = wp.empty_like(x_blocks)
+        wp.launch(compact_mass_mv, dim=self.blocks.shape[0], inputs=[z, x_blocks, self.blocks_wp], device=x_blocks.device)
+
+        return z
+
+    def system_blocks(self, blocks_out: torch.Tensor, energy_blocks: torch.Tensor, scale: float) -> torch.Tensor:
+        """
+        Diagonal blocks M_i + scale*H_i of a Newton system, without expanding the mass blocks in memory.
+
+        Args:
+            blocks_out: (N,12,12) buffer the blocks are written to
+            energy_blocks: (N,12,12) Hessian block of every body
+            scale: factor of the Hessian blocks, e.g. dt^2
+
+        Returns:
+            torch.Tensor: blocks_out
+        """
+        wp.launch(compact_system_blocks, dim=self.blocks.shape[0], inputs=[wp.from_torch(blocks_out, dtype=wp.mat((12,12),dtype=wp.float64)), self.blocks_wp, \
+            wp.from_torch(energy_blocks.contiguous(), dtype=wp.mat((12,12),dtype=wp.float64)), wp.float64(scale)], device=self.blocks_wp.device)
+
+        return blocks_out
+
+    def inverse(self) -> CompactMassInverse:
+        """
+        Inverse of the mass matrix, the 4x4 blocks are factored on the first call.
+
+        Returns:
+            CompactMassInverse: operator applying M^-1, blocks that are not positive definite are replaced by the identity
+        """
+        if self.inverse_operator is None:
+            L, info = torch.linalg.cholesky_ex(self.blocks)
+            inverse_blocks = torch.cholesky_inverse(L)
+
+            #a zero or singular block has no inverse, leave these bodies unpreconditioned
+            failed = info > 0
+            inverse_blocks[failed] = torch.eye(4, dtype=self.blocks.dtype, device=self.blocks.device)
+
+            self.inverse_operator = CompactMassInverse(inverse_blocks)
+
+        return self.inverse_operator
+
+def compact_mass_blocks(mass_blocks: torch.Tensor) -> torch.Tensor:
+    """
+    Extract the 4x4 mass block of every body from its 12x12 mass matrix block.
+
+    Args:
+        mass_blocks: (N,12,12) mass matrix blocks, three identical 4x4 blocks on their diagonal
+
+    Returns:
+        torch.Tensor: (N,4,4) 4x4 block of every body
+    """
+    return mass_blocks[:, 0:4, 0:4].clone()
@@ -0,0 +1,198 @@
+"""
+Temporal Contact Cache for the Batched Narrow Phase
+
+Bodies at rest produce nearly the same contacts from one time step to the next. This
+module keeps, for every (query vertex, object pair) entry of the narrow phase work list,
+the result of the last full closest point query:
+    - face: closest face on the target mesh (-1 if nothing was found within max_distance)
+    - point: query point in the undeformed space of the target object
+    - distance: unsigned distance from point to the target mesh (negative if the entry is empty)
+
+The target mesh never changes in its own undeformed space, so the distance to it is
+1-Lipschitz in the query point. A cached entry is used in two ways before falling back
+to a full mesh_query_point_sign_normal:
+    1. If distance - |p - point| > 2*epsilon the vertex cannot be within epsilon of the
+       target, no query is needed and the entry is reported as invalid.
+    2. If a closest face was cached, the query point is projected onto the plane of that
+       face. If the projection lands strictly inside the face, on the inner side and within
+       epsilon, the contact is generated from the cached face without traversing the BVH.
+The factor of two in the first test allows the deformation of the target to shrink
+distances by up to half when mapped to world space.
+
+The cache is stored aligned with the work list and is carried over between time steps
+for the object pairs that are still candidates, so it needs no hashing and no atomics.
+"""
+
+import warp as wp
+import torch
+from .object_pair_collision_detection import CollisionResult, CollisionPair, mesh_face_collision, vertex_collision
+from .analytic_shapes import SHAPE_MESH
+
+@wp.func
+def project_onto_mesh_face(mesh_id: wp.uint64, face: wp.int32, point: wp.vec3f):
+    # returns (u, v, w, signed distance) with u, v, w the barycentric weights of the projection of point onto the face plane
+    a = wp.mesh_get_point(mesh_id, wp.mesh_get_index(mesh_id, face*3 + 0))
+    b = wp.mesh_get_point(mesh_id, wp.mesh_get_index(mesh_id, face*3 + 1))
+    c = wp.mesh_get_point(mesh_id, wp.mesh_get_index(mesh_id, face*3 + 2))
+
+    n = wp.mesh_eval_face_normal(mesh_id, face)
+    signed_distance = wp.dot(point - a, n)
+    x = point - signed_distance*n
+
+    # barycentric weights with x = a*u + b*v + c*w (the convention used by mesh_eval_position)
+    area = wp.dot(wp.cross(b - a, c - a), n)
+    u = wp.dot(wp.cross(b - x, c - x), n)/area
+    v = wp.dot(wp.cross(c - x, a - x), n)/area
+
+    return wp.vec4f(u, v, wp.float32(1.0) - u - v, signed_distance)
+
+@wp.kernel
+def cached_collision_detection(
+    # Undeformed vertices of every object, concatenated
+    all_vertices: wp.array(dtype=wp.vec3d),
+
+    # Work list, one entry per (query vertex, candidate pair)
+    work_vertex: wp.array(dtype=wp.int32),
+    work_pair: wp.array(dtype=wp.int32),
+
+    # Per pair transforms computed by collision_pair_setup
+    pairs: wp.array(dtype=CollisionPair),
+
+    # Node values of all signed distance grids
+    sdf_values: wp.array(dtype=wp.float64),
+
+    # Contact cache, aligned with the work list, updated in place
+    cache_face: wp.array(dtype=wp.int32),
+    cache_point: wp.array(dtype=wp.vec3d),
+    cache_distance: wp.array(dtype=wp.float64),
+
+    # Collision detection parameters
+    max_distance: wp.float64,
+    epsilon: wp.float64,
+    face_tolerance: wp.float32,
+
+    # Output arrays
+    collision_results: wp.array(dtype=CollisionResult)
+):
+    # one thread per work list entry
+    tid = wp.tid()
+
+    if tid >= work_vertex.shape[0]:
+        return
+
+    pair = pairs[work_pair[tid]]
+    local_vertex = all_vertices[work_vertex[tid]]
+
+    # analytic and signed distance grid targets are already cheaper than any cached query
+    if pair.shape2.shape_type != SHAPE_MESH or pair.sdf2.dims[0] > 0:
+        collision_results[tid] = vertex_collision(local_vertex, pair, sdf_values, max_distance, epsilon)
+        return
+
+    world_vertex = pair.A1 @ local_vertex + pair.t1
+
+    local_query_point = pair.A2_inv * (world_vertex - pair.t2)
+    query_point = wp.vec3f(wp.float32(local_query_point[0]), wp.float32(local_query_point[1]), wp.float32(local_query_point[2]))
+
+    cached_distance = cache_distance[tid]
+
+    if cached_distance >= wp.float64(0.0):
+
+        # the vertex is still too far from the target to be in contact
+        if cached_distance - wp.length(local_query_point - cache_point[tid]) > wp.float64(2.0)*epsilon:
+            result = CollisionResult()
+            result.is_valid = wp.int32(0)
+            collision_results[tid] = result
+            return
+
+        # try the closest face of the last full query
+        face = cache_face[tid]
+        if face >= 0:
+            projection = project_onto_mesh_face(pair.mesh2_id, face, query_point)
+            if wp.min(wp.min(projection[0], projection[1]), projection[2]) > face_tolerance:
+                result = mesh_face_collision(local_vertex, world_vertex, pair.A2, pair.A2_inv, pair.t2, pair.mesh2_id, face, projection[0], projection[1], projection[3], \
+                    pair.object1_id, pair.object2_id, epsilon)
+                if result.is_valid == 1:
+                    collision_results[tid] = result
+                    return
+
+    # fall back to a full closest point query and refresh the cache
+    query_result = wp.mesh_query_point_sign_normal(id=pair.mesh2_id, point=query_point, max_dist=wp.float32(max_distance), epsilon=wp.float32(epsilon))
+
+    cache_point[tid] = local_query_point
+    if query_result.result:
+        cache_face[tid] = query_result.face
+        cache_distance[tid] = wp.length(local_query_point - wp.vec3d(wp.mesh_eval_position(pair.mesh2_id, query_result.face, query_result.u, query_result.v)))
+    else:
+        cache_face[tid] = wp.int32(-1)
+        cache_distance[tid] = max_distance
+
+    collision_results[tid] = mesh_face_collision(local_vertex, world_vertex, pair.A2, pair.A2_inv, pair.t2, pair.mesh2_id, query_result.face, query_result.u, query_result.v, query_result.sign, \
+        pair.object1_id, pair.object2_id, epsilon)
+
+class ContactCache:
+    """
+    Per pair cache of the last closest face of every narrow phase query vertex.
+
+    Call update() with the work list of the current time step before launching the
+    narrow phase. Entries of object pairs that were candidates in the previous time step
+    are carried over, entries of new pairs start empty.
+    """
+
+    def __init__(self, device):
+        self.device = device
+        self.pair_keys = torch.zeros((0,), dtype=torch.int64, device=device)
+        self.pair_starts = torch.zeros((0,), dtype=torch.int64, device=device)
+        self.faces = torch.zeros((0,), dtype=torch.int32, device=device)
+        self.points = torch.zeros((0,3), dtype=torch.float64, device=device)
+        self.distances = torch.zeros((0,), dtype=torch.float64, device=device)
+
+    def reset(self):
+        self.__init__(self.device)
+
+    def update(self, pair_objects: torch.Tensor, work_pair: torch.Tensor, num_objects: int):
+        """
+        Align the cache with a new work list.
+
+        Args:
+            pair_objects: (P,2) ordered (query object, target object) pairs, sorted by query object then target object
+            work_pair: pair index of every work list entry, entries grouped by pair (see build_collision_work_list)
+            num_objects: total number of objects in the scene
+        """
+        num_pairs = pair_objects.shape[0]
+        num_work = work_pair.shape[0]
+
+        pair_keys = pair_objects[:,0].long()*num_objects + pair_objects[:,1].long()
+        counts = torch.bincount(work_pair.long(), minlength=num_pairs)
+        pair_starts = torch.cumsum(counts, 0) - counts
+
+        faces = torch.full((num_work,), -1, dtype=torch.int32, device=self.device)
+        points = torch.zeros((num_work,3), dtype=torch.float64, device=self.device)
+        distances = torch.full((num_work,), -1.0, dtype=torch.float64, device=self.device)
+
+        #carry over the entries of pairs that were already cached
+        if self.pair_keys.shape[0] > 0 and num_pairs > 0:
+            old_pair = torch.searchsorted(self.pair_keys, pair_keys).clamp(max=self.pair_keys.shape[0]-1)
+            persistent = self.pair_keys[old_pair] == pair_keys
+
+            work_pair = work_pair.long()
+            keep = persistent[work_pair]
+            old_index = (self.pair_starts[old_pair] - pair_starts)[work_pair] + torch.arange(num_work, device=self.device)
+
+            faces[keep] = self.faces[old_index[keep]]
+            points[keep] = self.points[old_index[keep]]
+            distances[keep] = self.distances[old_index[keep]]
+
+        self.pair_keys = pair_keys
+        self.pair_starts = pair_starts
+        self.faces = faces
+        self.points = points
+        self.distances = distances
+
+    def detect(self, all_vertices: wp.array, work_vertex: wp.array, work_pair: wp.array, collision_pairs: wp.array, sdf_values: wp.array, max_distance: float, epsilon: float, collision_buffer: wp.array):
+        """
+        Launch the cached narrow phase for the work list passed to the last update().
+        """
+        wp.launch(cached_collision_detection, dim=work_vertex.shape[0], \
+            inputs=[all_vertices, work_vertex, work_pair, collision_pairs, sdf_values, \
+                    wp.from_torch(self.faces, dtype=wp.int32), wp.from_torch(self.points, dtype=wp.vec3d), wp.from_torch(self.distances, dtype=wp.float64), \
+                    wp.float64(max_distance), wp.float64(epsilon), wp.float32(1e-4), collision_buffer])
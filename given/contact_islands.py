@@ -0,0 +1,73 @@
+"""
+Contact Islands
+
+The incremental potential only couples two bodies through the contacts between them, so
+the Newton problem of a time step splits into independent problems, one per connected
+component (island) of the contact graph:
+    - nodes are the free dynamic bodies
+    - edges are the contact pairs between two free dynamic bodies
+Pinned and static bodies do not move, so contacts with them stay inside the island of the
+other body and never connect two islands. A body without contacts between free bodies is
+a singleton island.
+
+contact_islands labels the bodies by minimum label propagation on the device, with
+pointer jumping to shortcut long chains. localize_contacts copies the contacts of an
+island into a separate list with the object ids renumbered to the island's own bodies
+(see Simulator.island_problem).
+"""
+
+import warp as wp
+import torch
+from .object_pair_collision_detection import CollisionResult
+
+def contact_islands(contact_pairs: torch.Tensor, free: torch.Tensor) -> torch.Tensor:
+    """
+    Label the connected components of the contact graph of the free bodies.
+
+    Args:
+        contact_pairs: (P,2) (object1_id, object2_id) pairs with contacts, ids of static objects are >= free.shape[0]
+        free: (N,) bool, True for every free (dynamic and not pinned) body
+
+    Returns:
+        torch.Tensor: (N,) int64 island of every body numbered 0..K-1, -1 for bodies that are not free
+    """
+    num_bodies = free.shape[0]
+    device = free.device
+
+    a = contact_pairs[:,0].long()
+    b = contact_pairs[:,1].long()
+    edges = (a < num_bodies) & (b < num_bodies)
+    edges[edges.clone()] = free[a[edges]] & free[b[edges]]
+    a = a[edges]
+    b = b[edges]
+
+    #every body starts in its own island, islands take the smallest label of their bodies
+    labels = torch.arange(num_bodies, device=device)
+    while True:
+        previous = labels
+        smallest = torch.minimum(labels[a], labels[b])
+        labels = labels.scatter_reduce(0, torch.cat((a, b)), torch.cat((smallest, smallest)), reduce="amin")
+        labels = labels[labels]
+        if torch.equal(labels, previous):
+            break
+
+    islands = torch.full((num_bodies,), -1, dtype=torch.int64, device=device)
+    islands[free] = torch.unique(labels[free], return_inverse=True)[1]
+
+    return islands
+
+@wp.kernel
+def localize_contacts(
+    contacts_out: wp.array(dtype=CollisionResult),
+    contacts: wp.array(dtype=CollisionResult),
+    contact_index: wp.array(dtype=wp.int32),
+    local_ids: wp.array2d(dtype=wp.int32)
+):
+    # one thread per island contact, copies the contact and renumbers its objects
+    i = wp.tid()
+
+    c = contacts[contact_index[i]]
+    c.object1_id = local_ids[i, 0]
+    c.object2_id = local_ids[i, 1]
+
+    contacts_out[i] = c
@@ -0,0 +1,122 @@
+"""
+Contact Manifold Reduction
+
+A resting contact between two meshes produces one contact per penetrating vertex, so a
+flat patch can generate hundreds of contacts for a single object pair. This module
+clusters the contacts of every (object1_id, object2_id) pair into at most max_points
+representative contacts so the cost of the contact energy, gradient and Hessian no longer
+grows with the mesh resolution at the contact patch.
+
+Contacts of a pair are binned on a g x g grid (g = floor(sqrt(max_points))) spanning the
+two longest axes of the bounding box of their reference positions on object 1. Pairs with
+at most max_points contacts are left untouched. Each cluster is replaced by one contact
+whose reference positions, closest point, normal and distance are the means over the
+cluster (the normal keeps the mean length of the cluster normals). The weight of a
+representative contact is the size of its cluster, the penalty energy kernels multiply
+the energy of a contact by its weight,
+    E = w k (n . (x_b - x_a))^2
+so a representative contact counts like the cluster it replaces.
+"""
+
+import warp as wp
+import torch
+from .object_pair_collision_detection import CollisionResult
+
+@wp.kernel
+def read_contact_fields(contacts: wp.array(dtype=CollisionResult), fields_out: wp.array2d(dtype=wp.float64), ids_out: wp.array2d(dtype=wp.int32)):
+    # one thread per contact, fields are (ref_pos_1, ref_pos_2, closest_point, contact_normal, distance)
+    cid = wp.tid()
+    c = contacts[cid]
+
+    for i in range(3):
+        fields_out[cid, i] = c.ref_pos_1[i]
+        fields_out[cid, 3 + i] = c.ref_pos_2[i]
+        fields_out[cid, 6 + i] = c.closest_point[i]
+        fields_out[cid, 9 + i] = c.contact_normal[i]
+    fields_out[cid, 12] = c.distance
+
+    ids_out[cid, 0] = c.object1_id
+    ids_out[cid, 1] = c.object2_id
+
+@wp.kernel
+def write_reduced_contacts(contacts_out: wp.array(dtype=CollisionResult), fields: wp.array2d(dtype=wp.float64), ids: wp.array2d(dtype=wp.int32), weights: wp.array(dtype=wp.float64)):
+    # one thread per representative contact
+    cid = wp.tid()
+
+    result = CollisionResult()
+    result.ref_pos_1 = wp.vec3d(fields[cid, 0], fields[cid, 1], fields[cid, 2])
+    result.ref_pos_2 = wp.vec3d(fields[cid, 3], fields[cid, 4], fields[cid, 5])
+    result.closest_point = wp.vec3d(fields[cid, 6], fields[cid, 7], fields[cid, 8])
+    result.contact_normal = wp.vec3d(fields[cid, 9], fields[cid, 10], fields[cid, 11])
+    result.weight = weights[cid]
+    result.distance = fields[cid, 12]
+    result.is_valid = wp.int32(1)
+    result.object1_id = ids[cid, 0]
+    result.object2_id = ids[cid, 1]
+
+    contacts_out[cid] = result
+
+def reduce_contact_manifolds(contacts: wp.array, num_contacts: int, num_objects: int, max_points: int) -> int:
+    """
+    Replace the contacts of every object pair by at most max_points representative contacts, in place.
+
+    Args:
+        contacts: array of CollisionResult, the first num_contacts entries are valid
+        num_contacts: number of valid contacts
+        num_objects: total number of objects in the scene
+        max_points: maximum number of contacts kept per object pair
+
+    Returns:
+        int: the number of contacts after reduction, stored at the front of contacts
+    """
+    if num_contacts == 0:
+        return 0
+
+    device = wp.device_to_torch(contacts.device)
+
+    fields = torch.zeros((num_contacts, 13), dtype=torch.float64, device=device)
+    ids = torch.zeros((num_contacts, 2), dtype=torch.int32, device=device)
+    wp.launch(read_contact_fields, dim=num_contacts, inputs=[contacts, wp.from_torch(fields), wp.from_torch(ids)], device=contacts.device)
+
+    #pair of every contact and the rank of the contact in its pair
+    pair_keys, contact_pair, pair_counts = torch.unique(ids[:,0].long()*num_objects + ids[:,1].long(), return_inverse=True, return_counts=True)
+    order = torch.argsort(contact_pair, stable=True)
+    pair_starts = torch.cumsum(pair_counts, 0) - pair_counts
+    rank = torch.empty_like(contact_pair)
+    rank[order] = torch.arange(num_contacts, device=device) - pair_starts[contact_pair[order]]
+
+    #grid cell of every contact on the two longest axes of its pair's contact patch
+    ref_pos = fields[:, 0:3]
+    index = contact_pair.unsqueeze(1).expand(-1, 3)
+    lower = torch.full((pair_keys.shape[0], 3), float("inf"), dtype=torch.float64, device=device).scatter_reduce(0, index, ref_pos, reduce="amin")
+    upper = torch.full((pair_keys.shape[0], 3), -float("inf"), dtype=torch.float64, device=device).scatter_reduce(0, index, ref_pos, reduce="amax")
+    extent = upper - lower
+    axes = torch.argsort(extent, dim=1, descending=True)[:, 0:2]
+
+    grid_size = max(int(max_points**0.5), 1)
+    cell = torch.zeros_like(contact_pair)
+    for i in range(2):
+        axis = axes[contact_pair, i]
+        axis_extent = extent[contact_pair, axis]
+        coordinate = (ref_pos.gather(1, axis.unsqueeze(1)).squeeze(1) - lower[contact_pair, axis])/torch.where(axis_extent > 0, axis_extent, torch.ones_like(axis_extent))
+        cell = cell*grid_size + torch.clamp((coordinate*grid_size).long(), 0, grid_size - 1)
+
+    #small pairs keep every contact
+    cell = torch.where(pair_counts[contact_pair] <= max_points, rank, cell)
+
+    #average every cluster
+    _, cluster, cluster_counts = torch.unique(contact_pair*max(max_points, grid_size*grid_size) + cell, return_inverse=True, return_counts=True)
+    num_clusters = cluster_counts.shape[0]
+    weights = cluster_counts.to(torch.float64)
+    reduced_fields = torch.zeros((num_clusters, 13), dtype=torch.float64, device=device).index_add_(0, cluster, fields)/weights.unsqueeze(1)
+
+    #the mean of diverging normals is shorter than the normals, keep its direction and the mean length
+    normal_lengths = torch.zeros((num_clusters,), dtype=torch.float64, device=device).index_add_(0, cluster, torch.linalg.norm(fields[:, 9:12], dim=1))/weights
+    reduced_fields[:, 9:12] = torch.nn.functional.normalize(reduced_fields[:, 9:12], dim=1)*normal_lengths.unsqueeze(1)
+
+    reduced_ids = torch.zeros((num_clusters, 2), dtype=torch.int32, device=device)
+    reduced_ids[cluster] = ids
+
+    wp.launch(write_reduced_contacts, dim=num_clusters, inputs=[contacts, wp.from_torch(reduced_fields), wp.from_torch(reduced_ids), wp.from_torch(weights)], device=contacts.device)
+
+    return num_clusters
@@ -0,0 +1,92 @@
+"""
+Per Pair Reduction of the Contact Hessian Blocks
+
+The contact Hessian couples every pair of objects that share at least one contact. For a
+contact between object a (the querying object) and object b (the target object)
+d2penalty_spring_dq2 writes four 12x12 blocks:
+    - Index contact_id*4:   (a, a)
+    - Index contact_id*4+1: (b, b)
+    - Index contact_id*4+2: (a, b)
+    - Index contact_id*4+3: (b, a)
+Contacts that share an object pair would produce duplicate triplets that
+bsr_set_from_triplets (or the in place assembly of given/system_matrix.py) has to sort
+and sum in every Newton iteration. A pair of touching meshes easily has tens of contacts.
+
+The contacts are sorted by their (object1_id, object2_id) key once per step. The contacts
+of a pair then form a contiguous segment of the sorted order and reduce_contact_pairs sums
+every segment into one set of four blocks per pair,
+    H_pair,k = sum over the contacts c of the pair of H_c,k        k = aa, bb, ab, ba
+with one thread per pair block and no atomics, so the sum is deterministic. The Newton
+system is built from 4 triplets per contact pair instead of 4 per contact.
+
+The pairs are sorted by object1_id then object2_id and the blocks of every pair are in
+the order of d2penalty_spring_dq2. All of this runs on the device, the only host sync is
+the number of pairs.
+"""
+
+import warp as wp
+import torch
+
+@wp.kernel
+def sum_pair_blocks(
+    pair_blocks_out: wp.array(dtype=wp.mat((12,12),dtype=wp.float64)),
+    contact_blocks: wp.array(dtype=wp.mat((12,12),dtype=wp.float64)),
+    contact_order: wp.array(dtype=wp.int32),
+    pair_offsets: wp.array(dtype=wp.int32)
+):
+    # one thread per pair block, sums block k of the contacts of pair p
+    tid = wp.tid()
+    p = tid // 4
+    k = tid - 4*p
+
+    block = wp.matrix(shape=(12,12), dtype=wp.float64)
+    for j in range(pair_offsets[p], pair_offsets[p + 1]):
+        block += contact_blocks[4*contact_order[j] + k]
+
+    pair_blocks_out[tid] = block
+
+def contact_pair_segments(pair_indices_out: torch.Tensor, contact_ids: torch.Tensor, num_objects: int):
+    """
+    Sort the contacts by object pair and build the block triplets of the pairs.
+
+    Args:
+        pair_indices_out: (>= 4*P, 2) int32 tensor, filled with the (row, column) block index of every per pair Hessian block
+        contact_ids: (num_contacts, 2) int32 tensor of (object1_id, object2_id) for every contact
+        num_objects: total number of objects in the scene
+
+    Returns:
+        tuple: (P,2) unique (object1_id, object2_id) pairs with contacts sorted by object1_id then object2_id,
+            (num_contacts,) int32 contacts sorted by pair, (P+1,) int32 offset of the contacts of every pair in the sorted order
+    """
+    keys = contact_ids[:,0].long()*num_objects + contact_ids[:,1].long()
+    order = torch.argsort(keys, stable=True)
+    pair_keys, counts = torch.unique_consecutive(keys[order], return_counts=True)
+
+    offsets = torch.zeros((pair_keys.shape[0] + 1,), dtype=torch.int32, device=contact_ids.device)
+    offsets[1:] = torch.cumsum(counts, dim=0)
+
+    #the (a,a), (b,b), (a,b), (b,a) blocks of every pair, in d2penalty_spring_dq2 order
+    a = pair_keys // num_objects
+    b = pair_keys % num_objects
+    pair_blocks = torch.stack((torch.stack((a, a), dim=1), torch.stack((b, b), dim=1), torch.stack((a, b), dim=1), torch.stack((b, a), dim=1)), dim=1)
+    pair_indices_out[0:4*pair_keys.shape[0], :] = pair_blocks.reshape((-1,2)).to(pair_indices_out.dtype)
+
+    return torch.stack((a, b), dim=1), order.to(torch.int32), offsets
+
+def reduce_contact_pairs(pair_blocks_out: torch.Tensor, contact_blocks: torch.Tensor, contact_order: torch.Tensor, pair_offsets: torch.Tensor):
+    """
+    Sum the contact Hessian blocks of every contact pair.
+
+    Args:
+        pair_blocks_out: (>= 4*P,12,12) filled with the four Hessian blocks of every pair
+        contact_blocks: (>= 4*num_contacts,12,12) Hessian blocks of every contact, see d2penalty_spring_dq2
+        contact_order: (num_contacts,) contacts sorted by pair, see contact_pair_segments
+        pair_offsets: (P+1,) offsets of the pairs in contact_order, see contact_pair_segments
+    """
+    num_pair_blocks = 4*(pair_offsets.shape[0] - 1)
+    if num_pair_blocks == 0:
+        return
+
+    wp.launch(sum_pair_blocks, dim=num_pair_blocks, inputs=[wp.from_torch(pair_blocks_out, dtype=wp.mat((12,12),dtype=wp.float64)), \
+        wp.from_torch(contact_blocks, dtype=wp.mat((12,12),dtype=wp.float64)), wp.from_torch(contact_order), wp.from_torch(pair_offsets)], \
+        device=wp.device_from_torch(pair_blocks_out.device))
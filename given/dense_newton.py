@@ -0,0 +1,75 @@
+"""
+Batched Dense Newton Solver for Single Body Islands
+
+A body that is not in contact with another free body (see given/contact_islands.py) has
+a Newton problem with a single 12x12 block, so sparse matrices and CG are pure overhead.
+batched_dense_newton solves the problems of all such bodies at once:
+    - the Newton direction of every body comes from a batched Cholesky solve of its
+      12x12 Hessian block
+    - every body has its own convergence test ||g_i|| < tolerance and stops updating
+      once it has converged
+    - every body has its own line search over alpha in {1, 1/2, 1/4, 1/8, 1/16}
+
+The line search evaluates the incremental potential of every body at all step sizes
+alpha in {0, 1, 1/2, 1/4, 1/8, 1/16} at once (the batched energy kernels accumulate the
+energy of every body into its own slot, see assignment/elastic_energy_batched.py), and
+every body takes the largest step size that satisfies the Armijo condition
+    phi_i(alpha) - phi_i(0) <= c alpha phi_i'(0),        phi_i'(0) = g_i^T p_i
+or half the smallest step size if none does, like the batched line search of
+given/line_search.py.
+
+The iteration cap and the gradient norm tolerance are the ones of newtons_method, so
+single body islands stop where the other Newton solves stop.
+"""
+
+import torch
+from .line_search import line_search_alphas, armijo_step_size
+
+NEWTON_MAX_ITERATIONS = 10
+NEWTON_TOLERANCE = 1e-1
+
+def batched_dense_newton(q: torch.Tensor, gradient_func, hessian_blocks_func, batched_energy_func, max_iterations: int = NEWTON_MAX_ITERATIONS, \
+    tolerance: float = NEWTON_TOLERANCE, c: float = 1e-4) -> int:
+    """
+    Minimize the incremental potential of independent bodies, in place.
+
+    Args:
+        q: (12*S,) configuration of the S bodies, updated in place
+        gradient_func: function (12*S,) -> (12*S,) gradient of the incremental potential
+        hessian_blocks_func: function (12*S,) -> (S,12,12) Hessian block of every body
+        batched_energy_func: function (q, p, alphas) -> (A,S) incremental potential of every body at q + alpha*p
+        max_iterations: maximum number of Newton iterations
+        tolerance: gradient norm below which a body has converged
+        c: Armijo constant
+
+    Returns:
+        int: number of Newton iterations
+    """
+    num_bodies = q.shape[0] // 12
+    alphas = line_search_alphas(q.device, q.dtype)
+    active = torch.ones((num_bodies,), dtype=torch.bool, device=q.device)
+
+    iterations = 0
+    for _ in range(max_iterations):
+        g = gradient_func(q).reshape((num_bodies, 12))
+        active &= torch.linalg.norm(g, dim=1) >= tolerance
+        if not torch.any(active):
+            break
+
+        #Newton direction of every body, diagonal fallback for blocks that are not positive definite
+        H = hessian_blocks_func(q)
+        L, info = torch.linalg.cholesky_ex(H)
+        p = -torch.cholesky_solve(g.unsqueeze(2), L).squeeze(2)
+        failed = info > 0
+        if torch.any(failed):
+            p[failed] = -g[failed]/torch.diagonal(H[failed], dim1=1, dim2=2)
+        p[~active] = 0.0
+
+        #potential of every body at every step size, one batched evaluation
+        energies = batched_energy_func(q, p.reshape((-1,)), alphas)
+        step = armijo_step_size(energies, alphas, torch.sum(g*p, dim=1), c)
+
+        q += (step.unsqueeze(1)*p).reshape((-1,))
+        iterations += 1
+
+    return iterations
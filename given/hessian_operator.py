@@ -0,0 +1,223 @@
+"""
+Matrix Free Newton System
+
+hessian_func assembles the Newton system matrix
+    H = M + dt^2 (H_e + H_c)
+as a sum of BSR matrices and sets the contact Hessian from 4 triplets per contact, which
+allocates new sparse matrices in every Newton iteration. CG only needs products with the
+system matrix, so HessianOperator applies it without assembling it:
+    - the mass term is applied from the 4x4 mass blocks (see given/compact_mass.py) and
+      the elastic term from the 12x12 elastic Hessian blocks, one thread per body
+          z_i = alpha ((I_3 (x) Mbar_i) + dt^2 H_e,ii) x_i + beta y_i
+    - the contact term is applied directly from the contact list, one thread per contact.
+      The penetration depth d = n . (J_b q_b - J_a q_a) of a contact is linear in q for a
+      fixed normal, so the Hessian of its energy w k d^2 is
+          H_c = 2 w k J^T n n^T J,        J^T n = [-J_a^T n, J_b^T n]
+      and its product with x only needs the scalar s = n . (J_b x_b - J_a x_a)
+          z_a -= alpha dt^2 2 w k s J_a^T n
+          z_b += alpha dt^2 2 w k s J_b^T n
+      No contact Hessian blocks are evaluated, stored or summed per pair.
+
+The operator is built once per time step, when the contacts are known. The only input that
+changes between Newton iterations is the elastic Hessian, whose blocks are rewritten in
+place by d2energy_dq2.
+
+The operator works on the free DOFs only, i.e. it applies P H P^T for the fixed DOF
+projection P of given/fixed_dof_projection.py, and the contact terms of pinned or static
+objects are skipped. diagonal() gives the diagonal blocks of the projected system for
+the diagonal and block Jacobi preconditioners.
+"""
+
+import warp as wp
+import warp.sparse as wps
+import warp.optim.linear as wpol
+import torch
+from .object_pair_collision_detection import CollisionResult
+from .compact_mass import CompactMass
+
+@wp.func
+def contact_normal_jacobian(X: wp.vec3d, n: wp.vec3d):
+    # J(X)^T n, the gradient of n . x with x = J(X) q the world position of the undeformed point X
+    g = wp.vector(length=12, dtype=wp.float64)
+    for r in range(3):
+        g[4*r + 0] = n[r]*X[0]
+        g[4*r + 1] = n[r]*X[1]
+        g[4*r + 2] = n[r]*X[2]
+        g[4*r + 3] = n[r]
+
+    return g
+
+@wp.func
+def reduced_index(obj: wp.int32, reduced_blocks: wp.array(dtype=wp.int32)):
+    # index of an object among the free bodies, -1 for static and pinned objects
+    if obj >= reduced_blocks.shape[0]:
+        return -1
+
+    return reduced_blocks[obj]
+
+@wp.kernel
+def body_blocks_mv(
+    z: wp.array(dtype=wp.vec(length=12,dtype=wp.float64)),
+    x: wp.array(dtype=wp.vec(length=12,dtype=wp.float64)),
+    y: wp.array(dtype=wp.vec(length=12,dtype=wp.float64)),
+    mass_blocks: wp.array(dtype=wp.mat((4,4),dtype=wp.float64)),
+    energy_blocks: wp.array(dtype=wp.mat((12,12),dtype=wp.float64)),
+    free_blocks: wp.array(dtype=wp.int32),
+    dt2: wp.float64,
+    alpha: wp.float64,
+    beta: wp.float64
+):
+    # one thread per free body, z = alpha*(M + dt^2 H_e) x + beta*y
+    i = wp.tid()
+    body = free_blocks[i]
+    xi = x[i]
+    Mbar = mass_blocks[body]
+
+    result = dt2*(energy_blocks[body] @ xi)
+    for r in range(3):
+        for c in range(4):
+            s = wp.float64(0.0)
+            for d in range(4):
+                s += Mbar[c,d]*xi[4*r + d]
+            result[4*r + c] = result[4*r + c] + s
+
+    result = alpha*result
+    if beta != wp.float64(0.0):
+        result += beta*y[i]
+
+    z[i] = result
+
+@wp.kernel
+def contact_mv(
+    z: wp.array(dtype=wp.vec(length=12,dtype=wp.float64)),
+    x: wp.array(dtype=wp.vec(length=12,dtype=wp.float64)),
+    contacts: wp.array(dtype=CollisionResult),
+    reduced_blocks: wp.array(dtype=wp.int32),
+    scale: wp.float64
+):
+    # one thread per contact, z += scale*2 w J^T n n^T J x
+    contact_id = wp.tid()
+    contact = contacts[contact_id]
+
+    a = reduced_index(contact.object1_id, reduced_blocks)
+    b = reduced_index(contact.object2_id, reduced_blocks)
+    if a < 0 and b < 0:
+        return
+
+    g_a = contact_normal_jacobian(contact.ref_pos_1, contact.contact_normal)
+    g_b = contact_normal_jacobian(contact.ref_pos_2, contact.contact_normal)
+
+    #n . (J_b x_b - J_a x_a), static and pinned objects have no DOFs in x
+    s = wp.float64(0.0)
+    if a >= 0:
+        s -= wp.dot(g_a, x[a])
+    if b >= 0:
+        s += wp.dot(g_b, x[b])
+
+    s *= scale*wp.float64(2.0)*contact.weight
+    if a >= 0:
+        wp.atomic_sub(z, a, s*g_a)
+    if b >= 0:
+        wp.atomic_add(z, b, s*g_b)
+
+@wp.kernel
+def body_diagonal_blocks(
+    blocks_out: wp.array(dtype=wp.mat((12,12),dtype=wp.float64)),
+    mass_blocks: wp.array(dtype=wp.mat((4,4),dtype=wp.float64)),
+    energy_blocks: wp.array(dtype=wp.mat((12,12),dtype=wp.float64)),
+    free_blocks: wp.array(dtype=wp.int32),
+    dt2: wp.float64
+):
+    # one thread per free body, (I_3 (x) Mbar) + dt^2 H_e
+    i = wp.tid()
+    body = free_blocks[i]
+    Mbar = mass_blocks[body]
+
+    block = dt2*energy_blocks[body]
+    for r in range(3):
+        for c in range(4):
+            for d in range(4):
+                block[4*r + c, 4*r + d] = block[4*r + c, 4*r + d] + Mbar[c,d]
+
+    blocks_out[i] = block
+
+@wp.kernel
+def contact_diagonal_blocks(
+    blocks_out: wp.array(dtype=wp.mat((12,12),dtype=wp.float64)),
+    contacts: wp.array(dtype=CollisionResult),
+    reduced_blocks: wp.array(dtype=wp.int32),
+    scale: wp.float64
+):
+    # one thread per contact, adds scale*2 w J_a^T n n^T J_a to the block of a and the same for b
+    contact_id = wp.tid()
+    contact = contacts[contact_id]
+
+    a = reduced_index(contact.object1_id, reduced_blocks)
+    b = reduced_index(contact.object2_id, reduced_blocks)
+    w = scale*wp.float64(2.0)*contact.weight
+
+    if a >= 0:
+        g_a = contact_normal_jacobian(contact.ref_pos_1, contact.contact_normal)
+        wp.atomic_add(blocks_out, a, w*wp.outer(g_a, g_a))
+    if b >= 0:
+        g_b = contact_normal_jacobian(contact.ref_pos_2, contact.contact_normal)
+        wp.atomic_add(blocks_out, b, w*wp.outer(g_b, g_b))
+
+class HessianOperator(wpol.LinearOperator):
+    """
+    Projected Newton system matrix P (M + dt^2 (H_e + H_c)) P^T as a linear operator, can be passed as A to warp.optim.linear.cg.
+    """
+
+    def __init__(self, mass: CompactMass, energy_blocks: wp.array, contacts: wp.array, num_contacts: int, contact_stiffness: float, dt: float, \
+        free_blocks: torch.Tensor, reduced_blocks: torch.Tensor):
+        """
+        Args:
+            mass: 4x4 mass block of every dynamic body
+            energy_blocks: (N,) 12x12 elastic Hessian block of every dynamic body, read at every product so it can be updated in place
+            contacts: contact list, the first num_contacts entries are used
+            num_contacts: number of contacts
+            contact_stiffness: stiffness k of the penalty springs
+            dt: time step
+            free_blocks: (F,) int32 body index of every free (not pinned) body
+            reduced_blocks: (N,) int32 index of every body among the free bodies, -1 for pinned bodies
+        """
+        num_free = free_blocks.shape[0]
+        super().__init__((12*num_free, 12*num_free), wp.mat((12,12),dtype=wp.float64), energy_blocks.device, self.apply)
+
+        self.mass = mass
+        self.energy_blocks = energy_blocks
+        self.contacts = contacts
+        self.num_contacts = num_contacts
+        self.contact_stiffness = contact_stiffness
+        self.dt2 = dt*dt
+
+        #warp views of the index tensors and the diagonal blocks, created once so apply() and diagonal() only launch kernels
+        self.free_blocks_wp = wp.from_torch(free_blocks)
+        self.reduced_blocks_wp = wp.from_torch(reduced_blocks)
+        self.diagonal_blocks = wp.zeros(shape=(num_free,), dtype=wp.mat((12,12),dtype=wp.float64), device=energy_blocks.device)
+        self.diagonal_matrix = wps.bsr_diag(self.diagonal_blocks)
+
+    def apply(self, x: wp.array, y: wp.array, z: wp.array, alpha: float, beta: float):
+        """
+        z = alpha*A x + beta*y, the matvec of warp.optim.linear.LinearOperator.
+        """
+        wp.launch(body_blocks_mv, dim=self.free_blocks_wp.shape[0], inputs=[z, x, y, self.mass.blocks_wp, self.energy_blocks, self.free_blocks_wp, \
+            wp.float64(self.dt2), wp.float64(alpha), wp.float64(beta)], device=self.device)
+
+        wp.launch(contact_mv, dim=self.num_contacts, inputs=[z, x, self.contacts, self.reduced_blocks_wp, \
+            wp.float64(alpha*self.dt2*self.contact_stiffness)], device=self.device)
+
+    def diagonal(self) -> wps.BsrMatrix:
+        """
+        Diagonal blocks of the projected system matrix, rewritten in place at every call.
+
+        Returns:
+            wps.BsrMatrix: block diagonal matrix, can be passed to warp.optim.linear.preconditioner or block_jacobi_preconditioner
+        """
+        wp.launch(body_diagonal_blocks, dim=self.free_blocks_wp.shape[0], inputs=[self.diagonal_blocks, self.mass.blocks_wp, self.energy_blocks, \
+            self.free_blocks_wp, wp.float64(self.dt2)], device=self.device)
+        wp.launch(contact_diagonal_blocks, dim=self.num_contacts, inputs=[self.diagonal_blocks, self.contacts, self.reduced_blocks_wp, \
+            wp.float64(self.dt2*self.contact_stiffness)], device=self.device)
+
+        wps.bsr_set_diag(self.diagonal_matrix, self.diagonal_blocks)
+        return self.diagonal_matrix
@@ -0,0 +1,52 @@
+"""
+Batched Line Search
+
+The backtracking line search of newtons_method evaluates the energy for one step size at a
+time and reads every value back to the host to test the Armijo condition, so a step can
+cost up to five round trips between the device and the host. The batched line search
+evaluates the energy for a fixed set of step sizes
+    alpha in {0, 1, 1/2, 1/4, 1/8, 1/16}
+along the descent direction p (p = -Δq) in one go (see Simulator.step,
+batched_energy_func) and picks the largest alpha that satisfies the Armijo condition
+    E(q + alpha p) - E(q) <= c alpha g^T p
+on the device. alpha = 0 gives the energy at the current configuration. If no step size
+satisfies the condition half of the smallest one is taken, the step size the backtracking
+search ends with after its last failed trial. The selected step size stays a device tensor, so the update
+    q = q + alpha p
+does not need any host sync.
+"""
+
+import torch
+
+LINE_SEARCH_ALPHAS = [0.0, 1.0, 0.5, 0.25, 0.125, 0.0625]
+
+def line_search_alphas(device, dtype=torch.float64) -> torch.Tensor:
+    """
+    Step sizes evaluated by the batched line search.
+
+    Returns:
+        torch.Tensor: (6,) step sizes, alpha = 0 first, then 1, 1/2, ..., 1/16
+    """
+    return torch.tensor(LINE_SEARCH_ALPHAS, dtype=dtype, device=device)
+
+def armijo_step_size(energies: torch.Tensor, alphas: torch.Tensor, slope: torch.Tensor, c: float = 1e-8, tolerance: float = 0.0) -> torch.Tensor:
+    """
+    Select the largest step size satisfying the Armijo condition, without leaving the device.
+
+    Args:
+        energies: (A,) energy at q + alpha*p for every step size, or (A,S) energies of S independent problems
+        alphas: (A,) step sizes, alphas[0] must be 0
+        slope: g^T p, directional derivative of the energy along the descent direction p, scalar tensor or (S,) for S problems
+        c: Armijo constant
+        tolerance: energy increase below which a step is accepted regardless of the Armijo condition
+
+    Returns:
+        torch.Tensor: scalar tensor (or (S,) tensor) holding the selected step size, half the smallest step size if none is accepted
+    """
+    step_sizes = alphas[1:].reshape((-1,) + (1,)*(energies.dim() - 1))
+    decrease = energies[1:] - energies[0]
+    accepted = (decrease <= c*step_sizes*slope) | (decrease < tolerance)
+
+    #largest accepted step size, same as backtracking from alpha = 1
+    candidates = torch.where(accepted, step_sizes, torch.zeros_like(step_sizes))
+    return torch.where(torch.any(accepted, dim=0), candidates.max(dim=0).values, 0.5*alphas[1:].min())
@@ -1,6 +1,8 @@
 from sympy.core.logic import Or
 import warp as wp
 import torch 
+from .analytic_shapes import AnalyticShape, SHAPE_MESH, analytic_signed_distance
+from .sdf_grid import SDFGrid, sdf_grid_sample
 
 # Collision detection result structure
 @wp.struct
@@ -9,11 +11,196 @@ class CollisionResult:
     ref_pos_2: wp.vec3d #vertex position in undeformed space of object 2
     closest_point: wp.vec3d  # closest point on mesh 2
     contact_normal: wp.vec3d  # contact normal
+    weight: wp.float64  # factor of the contact in the penalty energy, 1 unless the contact represents a cluster of contacts (see contact_manifold.py)
     is_valid: wp.int32  # flag indicating if contact is valid
     distance: wp.float64  # signed distance to mesh 2
     object1_id: wp.int32  # ID of object 1 (querying object)
     object2_id: wp.int32  # ID of object 2 (target object)
 
+# Per pair data for the batched narrow phase, everything that does not depend on the query vertex
+@wp.struct
+class CollisionPair:
+    A1: wp.mat33d  # deformation part of the affine transform of object 1
+    t1: wp.vec3d  # translation of object 1
+    A2: wp.mat33d  # deformation part of the affine transform of object 2
+    A2_inv: wp.mat33d  # inverse of A2, maps world space into object 2's undeformed space
+    t2: wp.vec3d  # translation of object 2
+    mesh2_id: wp.uint64  # Warp mesh ID for object 2
+    shape2: AnalyticShape  # analytic shape of object 2, SHAPE_MESH if its mesh is used
+    sdf2: SDFGrid  # signed distance grid of object 2, zero dims if it has none
+    object1_id: wp.int32  # ID of object 1 (querying object)
+    object2_id: wp.int32  # ID of object 2 (target object)
+
+@wp.func
+def affine_deformation(q_obj: wp.vec(length=12,dtype=wp.float64)):
+    # q format: [R00, R01, R02, tx, R10, R11, R12, ty, R20, R21, R22, tz]
+    return wp.mat33d(
+        q_obj[0], q_obj[1], q_obj[2],
+        q_obj[4], q_obj[5], q_obj[6],
+        q_obj[8], q_obj[9], q_obj[10]
+    )
+
+@wp.func
+def affine_translation(q_obj: wp.vec(length=12,dtype=wp.float64)):
+    return wp.vec3d(q_obj[3], q_obj[7], q_obj[11])
+
+@wp.func
+def mesh_face_collision(
+    local_vertex: wp.vec3d,
+    world_vertex: wp.vec3d,
+    A2: wp.mat33d,
+    A2_inv: wp.mat33d,
+    t2: wp.vec3d,
+    mesh2_id: wp.uint64,
+    face: wp.int32,
+    u: wp.float32,
+    v: wp.float32,
+    sign: wp.float32,
+    object1_object_id: wp.int32,
+    object2_object_id: wp.int32,
+    epsilon: wp.float64
+):
+    # Transform results back to world space
+    world_closest_point = A2 * wp.vec3d(wp.mesh_eval_position(mesh2_id, face, u, v)) + t2
+    world_normal = wp.transpose(A2_inv)*wp.vec3d(wp.mesh_eval_face_normal(mesh2_id, face))
+    
+    # Store collision result
+    result = CollisionResult()
+    result.ref_pos_1 = local_vertex 
+    result.ref_pos_2 = wp.vec3d(wp.mesh_eval_position(mesh2_id, face, u, v))
+    result.closest_point = world_closest_point
+    result.contact_normal = world_normal
+    result.weight = wp.float64(1.0)
+    result.distance = wp.length(world_vertex - world_closest_point) # I want positive distance when there's penetration
+    result.object1_id = object1_object_id
+    result.object2_id = object2_object_id
+    
+    result.is_valid = wp.int32(1) if (result.distance <= epsilon  and sign < wp.float32(0.0)) else wp.int32(0)
+
+    return result
+
+@wp.func
+def vertex_mesh_collision(
+    local_vertex: wp.vec3d,
+    A1: wp.mat33d,
+    t1: wp.vec3d,
+    A2: wp.mat33d,
+    A2_inv: wp.mat33d,
+    t2: wp.vec3d,
+    mesh2_id: wp.uint64,
+    object1_object_id: wp.int32,
+    object2_object_id: wp.int32,
+    max_distance: wp.float64,
+    epsilon: wp.float64
+):
+    # Transform vertex from object 1's local space to world space
+    world_vertex = A1 @ local_vertex + t1
+
+    # Transform world vertex to object 2's local space for query
+    local_query_point = A2_inv * (world_vertex - t2)
+    
+    # Query closest point on mesh 2 using mesh_query_point_sign_normal
+    query_result = wp.mesh_query_point_sign_normal(
+        id=mesh2_id,
+        point=wp.vector(wp.float32(local_query_point[0]), wp.float32(local_query_point[1]), wp.float32(local_query_point[2]), length=3,dtype=wp.float32),
+        max_dist=wp.float32(max_distance),
+        epsilon=wp.float32(epsilon)
+    )
+    
+    return mesh_face_collision(local_vertex, world_vertex, A2, A2_inv, t2, mesh2_id, query_result.face, query_result.u, query_result.v, query_result.sign, \
+        object1_object_id, object2_object_id, epsilon)
+
+@wp.func
+def signed_distance_collision(
+    local_vertex: wp.vec3d,
+    world_vertex: wp.vec3d,
+    local_query_point: wp.vec3d,
+    sdf: wp.vec4d,
+    A2: wp.mat33d,
+    A2_inv: wp.mat33d,
+    t2: wp.vec3d,
+    object1_object_id: wp.int32,
+    object2_object_id: wp.int32,
+    epsilon: wp.float64
+):
+    # contact from the signed distance and unit gradient (sdf = (grad phi, phi)) of object 2 at the query point
+    local_normal = wp.vec3d(sdf[0], sdf[1], sdf[2])
+    local_closest_point = local_query_point - sdf[3]*local_normal
+
+    world_closest_point = A2 * local_closest_point + t2
+
+    result = CollisionResult()
+    result.ref_pos_1 = local_vertex
+    result.ref_pos_2 = local_closest_point
+    result.closest_point = world_closest_point
+    result.contact_normal = wp.transpose(A2_inv)*local_normal
+    result.weight = wp.float64(1.0)
+    result.distance = wp.length(world_vertex - world_closest_point) # I want positive distance when there's penetration
+    result.object1_id = object1_object_id
+    result.object2_id = object2_object_id
+
+    result.is_valid = wp.int32(1) if (result.distance <= epsilon and sdf[3] < wp.float64(0.0)) else wp.int32(0)
+
+    return result
+
+@wp.func
+def vertex_shape_collision(
+    local_vertex: wp.vec3d,
+    world_vertex: wp.vec3d,
+    A2: wp.mat33d,
+    A2_inv: wp.mat33d,
+    t2: wp.vec3d,
+    shape2: AnalyticShape,
+    object1_object_id: wp.int32,
+    object2_object_id: wp.int32,
+    epsilon: wp.float64
+):
+    # closed form replacement of vertex_mesh_collision for targets with an analytic shape
+    local_query_point = A2_inv * (world_vertex - t2)
+    sdf = analytic_signed_distance(shape2, local_query_point)
+
+    return signed_distance_collision(local_vertex, world_vertex, local_query_point, sdf, A2, A2_inv, t2, object1_object_id, object2_object_id, epsilon)
+
+@wp.func
+def vertex_sdf_collision(
+    local_vertex: wp.vec3d,
+    world_vertex: wp.vec3d,
+    A2: wp.mat33d,
+    A2_inv: wp.mat33d,
+    t2: wp.vec3d,
+    sdf2: SDFGrid,
+    sdf_values: wp.array(dtype=wp.float64),
+    object1_object_id: wp.int32,
+    object2_object_id: wp.int32,
+    max_distance: wp.float64,
+    epsilon: wp.float64
+):
+    # constant time replacement of vertex_mesh_collision for targets with a signed distance grid
+    local_query_point = A2_inv * (world_vertex - t2)
+    sdf = sdf_grid_sample(sdf2, sdf_values, local_query_point, max_distance)
+
+    return signed_distance_collision(local_vertex, world_vertex, local_query_point, sdf, A2, A2_inv, t2, object1_object_id, object2_object_id, epsilon)
+
+@wp.func
+def vertex_collision(
+    local_vertex: wp.vec3d,
+    pair: CollisionPair,
+    sdf_values: wp.array(dtype=wp.float64),
+    max_distance: wp.float64,
+    epsilon: wp.float64
+):
+    # narrow phase query of one vertex of object 1 against the cheapest representation of object 2
+    world_vertex = pair.A1 @ local_vertex + pair.t1
+
+    if pair.shape2.shape_type != SHAPE_MESH:
+        return vertex_shape_collision(local_vertex, world_vertex, pair.A2, pair.A2_inv, pair.t2, pair.shape2, pair.object1_id, pair.object2_id, epsilon)
+
+    if pair.sdf2.dims[0] > 0:
+        return vertex_sdf_collision(local_vertex, world_vertex, pair.A2, pair.A2_inv, pair.t2, pair.sdf2, sdf_values, pair.object1_id, pair.object2_id, max_distance, epsilon)
+
+    return vertex_mesh_collision(local_vertex, pair.A1, pair.t1, pair.A2, pair.A2_inv, pair.t2, pair.mesh2_id, \
+        pair.object1_id, pair.object2_id, max_distance, epsilon)
+
 @wp.kernel
 def object_pair_collision_detection(
     # Input mesh data for object 1 (querying vertices)
@@ -43,59 +230,152 @@ def object_pair_collision_detection(
     if tid >= mesh1_vertices.shape[0]:
         return
     
-    # Extract affine transform for object 1 (3x4 matrix stored as 12 doubles)
-    # q format: [R00, R01, R02, tx, R10, R11, R12, ty, R20, R21, R22, tz]
-    q1_start = object1_object_id
-    A1 = wp.mat33d(
-        global_q[q1_start][0], global_q[q1_start][1], global_q[q1_start][2],
-        global_q[q1_start][4], global_q[q1_start][5], global_q[q1_start][6], 
-        global_q[q1_start][8], global_q[q1_start][9], global_q[q1_start][10]
-    )
-
-    t1 = wp.vec3d(global_q[q1_start][3], global_q[q1_start][7], global_q[q1_start][11])
-    
-    # Transform vertex from object 1's local space to world space
-    local_vertex = mesh1_vertices[tid]
-    world_vertex = A1 @ local_vertex + t1
-    
-    # Extract affine transform for object 2
-    q2_start = object2_object_id
-    A2 = wp.mat33d(
-        global_q[q2_start][0], global_q[q2_start][1], global_q[q2_start][2],
-        global_q[q2_start][4], global_q[q2_start][5], global_q[q2_start][6],
-        global_q[q2_start][8], global_q[q2_start][9], global_q[q2_start][10]
-    )
-    t2 = wp.vec3d(global_q[q2_start][3], global_q[q2_start][7], global_q[q2_start][11])
-    
-    # Transform world vertex to object 2's local space for query
-    A2_inv = wp.inverse(A2) 
-    local_query_point = A2_inv * (world_vertex - t2)
-    
-    # Query closest point on mesh 2 using mesh_query_point_sign_normal
-    query_result = wp.mesh_query_point_sign_normal(
-        id=mesh2_id,
-        point=wp.vector(wp.float32(local_query_point[0]), wp.float32(local_query_point[1]), wp.float32(local_query_point[2]), length=3,dtype=wp.float32),
-        max_dist=wp.float32(max_distance),
-        epsilon=wp.float32(epsilon)
-    )
-    
-    # Transform results back to world space
-    world_closest_point = A2 * wp.vec3d(wp.mesh_eval_position(mesh2_id, query_result.face, query_result.u, query_result.v)) + t2
-    world_normal = wp.transpose(A2_inv)*wp.vec3d(wp.mesh_eval_face_normal(mesh2_id, query_result.face))
-    
-    # Store collision result
-    result = CollisionResult()
-    result.ref_pos_1 = local_vertex 
-    result.ref_pos_2 = wp.vec3d(wp.mesh_eval_position(mesh2_id, query_result.face, query_result.u, query_result.v))
-    result.closest_point = world_closest_point
-    result.contact_normal = world_normal
-    result.distance = wp.length(world_vertex - world_closest_point) # I want positive distance when there's penetration
-    result.object1_id = object1_object_id
-    result.object2_id = object2_object_id
-    
-    result.is_valid = wp.int32(1) if (result.distance <= epsilon  and query_result.sign < 0) else wp.int32(0)
+    # Extract affine transforms (3x4 matrix stored as 12 doubles) for object 1 and object 2
+    A1 = affine_deformation(global_q[object1_object_id])
+    t1 = affine_translation(global_q[object1_object_id])
+    A2 = affine_deformation(global_q[object2_object_id])
+    t2 = affine_translation(global_q[object2_object_id])
     
-    collision_results[tid] = result
+    collision_results[tid] = vertex_mesh_collision(mesh1_vertices[tid], A1, t1, A2, wp.inverse(A2), t2, mesh2_id, \
+        object1_object_id, object2_object_id, max_distance, epsilon)
+
+@wp.kernel
+def collision_pair_setup(
+    pairs_out: wp.array(dtype=CollisionPair),
+    pair_objects: wp.array2d(dtype=wp.int32),
+    mesh_ids: wp.array(dtype=wp.uint64),
+    shapes: wp.array(dtype=AnalyticShape),
+    sdf_grids: wp.array(dtype=SDFGrid),
+    global_q: wp.array(dtype=wp.vec(length=12,dtype=wp.float64))
+):
+    # one thread per candidate object pair
+    pair_id = wp.tid()
+
+    obj1 = pair_objects[pair_id, 0]
+    obj2 = pair_objects[pair_id, 1]
+
+    pair = CollisionPair()
+    pair.A1 = affine_deformation(global_q[obj1])
+    pair.t1 = affine_translation(global_q[obj1])
+    pair.A2 = affine_deformation(global_q[obj2])
+    pair.A2_inv = wp.inverse(pair.A2)
+    pair.t2 = affine_translation(global_q[obj2])
+    pair.mesh2_id = mesh_ids[obj2]
+    pair.shape2 = shapes[obj2]
+    pair.sdf2 = sdf_grids[obj2]
+    pair.object1_id = obj1
+    pair.object2_id = obj2
+
+    pairs_out[pair_id] = pair
+
+@wp.kernel
+def batched_collision_detection(
+    # Undeformed vertices of every object, concatenated
+    all_vertices: wp.array(dtype=wp.vec3d),
+
+    # Work list, one entry per (query vertex, candidate pair)
+    work_vertex: wp.array(dtype=wp.int32),
+    work_pair: wp.array(dtype=wp.int32),
+
+    # Per pair transforms computed by collision_pair_setup
+    pairs: wp.array(dtype=CollisionPair),
+
+    # Node values of all signed distance grids
+    sdf_values: wp.array(dtype=wp.float64),
+
+    # Collision detection parameters
+    max_distance: wp.float64,
+    epsilon: wp.float64,
+
+    # Output arrays
+    collision_results: wp.array(dtype=CollisionResult)
+):
+    # one thread per work list entry
+    tid = wp.tid()
+
+    if tid >= work_vertex.shape[0]:
+        return
+
+    collision_results[tid] = vertex_collision(all_vertices[work_vertex[tid]], pairs[work_pair[tid]], sdf_values, max_distance, epsilon)
+
+@wp.kernel
+def collision_valid_flags(flags_out: wp.array(dtype=wp.int32), collision_buffer: wp.array(dtype=CollisionResult)):
+    tid = wp.tid()
+
+    if tid >= flags_out.shape[0]:
+        return
+
+    flags_out[tid] = collision_buffer[tid].is_valid
+
+@wp.kernel
+def scatter_collision_buffer(num_collisions: wp.array(dtype=wp.int32), collision_results: wp.array(dtype=CollisionResult), collision_buffer: wp.array(dtype=CollisionResult), valid_offsets: wp.array(dtype=wp.int32)):
+    tid = wp.tid()
+
+    if tid >= valid_offsets.shape[0] or collision_buffer[tid].is_valid == 0:
+        return #do nothing, we're out of bounds or this contact is not valid
+
+    idx = num_collisions[0] + valid_offsets[tid] #exclusive scan of the valid flags gives the slot of this contact
+
+    if idx < collision_results.shape[0]:
+        collision_results[idx] = collision_buffer[tid]
+
+@wp.kernel
+def advance_collision_count(num_collisions: wp.array(dtype=wp.int32), valid_flags: wp.array(dtype=wp.int32), valid_offsets: wp.array(dtype=wp.int32)):
+    last = valid_offsets.shape[0] - 1
+    num_collisions[0] = num_collisions[0] + valid_offsets[last] + valid_flags[last]
+
+def compact_collision_buffer(
+    num_collisions: wp.array(dtype=wp.int32),
+    collision_results: wp.array(dtype=CollisionResult),
+    collision_buffer: wp.array(dtype=CollisionResult),
+    valid_flags: wp.array(dtype=wp.int32) = None,
+    valid_offsets: wp.array(dtype=wp.int32) = None
+):
+    """
+    Append the valid contacts of collision_buffer to collision_results.
+
+    Contacts keep their order in collision_buffer, so the contact list (and every sum over it)
+    is reproducible from run to run.
+
+    Args:
+        num_collisions: Length 1 array holding the number of contacts in collision_results, advanced by the number of valid contacts
+        collision_results: Output array of valid contacts
+        collision_buffer: One candidate contact per query, valid contacts are marked with is_valid
+        valid_flags: Optional int32 scratch array with at least collision_buffer.shape[0] entries
+        valid_offsets: Optional int32 scratch array with at least collision_buffer.shape[0] entries
+    """
+    num_entries = collision_buffer.shape[0]
+
+    if num_entries == 0:
+        return
+
+    if valid_flags is None:
+        valid_flags = wp.empty(shape=(num_entries,), dtype=wp.int32, device=collision_buffer.device)
+    if valid_offsets is None:
+        valid_offsets = wp.empty(shape=(num_entries,), dtype=wp.int32, device=collision_buffer.device)
+
+    valid_flags = valid_flags[0:num_entries]
+    valid_offsets = valid_offsets[0:num_entries]
+
+    #step one is to compute indices for valid contacts by computing the cumulative sum of the is valid flags
+    wp.launch(collision_valid_flags, dim=num_entries, inputs=[valid_flags, collision_buffer], device=collision_buffer.device)
+    wp.utils.array_scan(valid_flags, valid_offsets, inclusive=False)
+
+    #step two is to insert the valid contacts into the appropriate positions in collision_results
+    wp.launch(scatter_collision_buffer, dim=num_entries, inputs=[num_collisions, collision_results, collision_buffer, valid_offsets], device=collision_buffer.device)
+
+    #step three is to update the number of contacts
+    wp.launch(advance_collision_count, dim=1, inputs=[num_collisions, valid_flags, valid_offsets], device=collision_buffer.device)
+
+@wp.kernel
+def contact_object_ids(ids_out: wp.array2d(dtype=wp.int32), contacts: wp.array(dtype=CollisionResult)):
+    contact_id = wp.tid()
+
+    if contact_id >= ids_out.shape[0]:
+        return
+
+    ids_out[contact_id, 0] = contacts[contact_id].object1_id
+    ids_out[contact_id, 1] = contacts[contact_id].object2_id
 
 # Helper function to launch the collision detection kernel
 def detect_collisions(
@@ -146,28 +426,113 @@ def detect_collisions(
     )
     
 
-    @wp.kernel
-    def reduce_collision_buffer(num_collisions: wp.array(dtype=wp.int32), collision_results: wp.array(dtype=CollisionResult), collision_buffer: wp.array(dtype=CollisionResult)):
-        tid = wp.tid()
+    #collision buffer stores a contact for each vertex in mesh 1
+    #some of those contacts are invalid, so we need to reduce the collision buffer into the collision results
+    #using a prefix sum of the is_valid flags in the CollisionResult struct
+    compact_collision_buffer(wp.from_torch(current_num_contacts, dtype=wp.int32), collision_results, collision_buffer[0:num_vertices])
 
-        if tid >= collision_buffer.shape[0] or collision_buffer[tid].is_valid == 0:
-            return #do nothing, we're out of bounda
+    return current_num_contacts.item()
 
-        idx = wp.atomic_add(num_collisions, 0, 1) #add one to num_collisions and store prev value which is index for this collision into results array
 
-        if idx < collision_results.shape[0]:
-            collision_results[idx] = collision_buffer[tid]
+def build_collision_work_list(pair_objects: torch.Tensor, vertex_offsets: torch.Tensor):
+    """
+    Expand candidate object pairs into a flat narrow phase work list.
 
+    Args:
+        pair_objects: (P,2) tensor of ordered (query object, target object) pairs
+        vertex_offsets: (N+1,) tensor, the vertices of object i are all_vertices[vertex_offsets[i]:vertex_offsets[i+1]]
 
-    #collision buffer stores a contact for each vertex in mesh 1the collision buffer
-    #some of those contacts are invalid, so we need to reduce the collision buffer into the collision results
-    #using a fast parallel reduction scheme
-    #valid contacts are marked in the collision buffer using the is_valid flag in the CollisionResult struct
-    wp.launch(reduce_collision_buffer, dim=collision_buffer.shape[0], inputs=[current_num_contacts, collision_results, collision_buffer])
+    Returns:
+        (work_vertex, work_pair): int32 tensors with one entry per (query vertex, pair), grouped by pair
+    """
+    pair_objects = pair_objects.to(vertex_offsets.device).long()
+    first_vertex = vertex_offsets[pair_objects[:,0]]
+    counts = vertex_offsets[pair_objects[:,0] + 1] - first_vertex
 
-    #step one is to compute indices for valid contacts by  computing  the cumuative sum of the is valid flags
-    #step two is to insert the valid contacts into tne appropriate positions in collision_results and return the new number of contacts
-    #step three is to return the new number of contacts
-    return current_num_contacts.item()
+    work_pair = torch.repeat_interleave(torch.arange(pair_objects.shape[0], device=vertex_offsets.device), counts)
+    pair_starts = torch.cumsum(counts, 0) - counts
+    work_vertex = first_vertex[work_pair] + torch.arange(work_pair.shape[0], device=vertex_offsets.device) - pair_starts[work_pair]
+
+    return work_vertex.to(torch.int32), work_pair.to(torch.int32)
+
+# Helper function to launch collision detection for every candidate pair at once
+def detect_collisions_batched(
+    collision_results: wp.array(dtype=CollisionResult),
+    current_num_contacts: torch.Tensor,
+    collision_buffer: wp.array(dtype=CollisionResult),
+    collision_pairs: wp.array(dtype=CollisionPair),
+    valid_flags: wp.array(dtype=wp.int32),
+    valid_offsets: wp.array(dtype=wp.int32),
+    all_vertices: wp.array(dtype=wp.vec3d),
+    work_vertex: wp.array(dtype=wp.int32),
+    work_pair: wp.array(dtype=wp.int32),
+    pair_objects: wp.array2d(dtype=wp.int32),
+    mesh_ids: wp.array(dtype=wp.uint64),
+    global_q: wp.array(dtype=wp.vec(length=12,dtype=wp.float64)),
+    max_distance: wp.float64 = 1.0,
+    epsilon: wp.float64 = 1e-3,
+    contact_cache = None,
+    shapes: wp.array(dtype=AnalyticShape) = None,
+    sdf_grids: wp.array(dtype=SDFGrid) = None,
+    sdf_values: wp.array(dtype=wp.float64) = None
+):
+    """
+    Launch collision detection for a whole work list of (query vertex, object pair) entries.
+
+    Args:
+        collision_results: Output array of valid contacts, appended to starting at current_num_contacts
+        current_num_contacts: Length 1 tensor holding the number of contacts in collision_results
+        collision_buffer: Scratch array with at least one entry per work list entry
+        collision_pairs: Scratch array with at least one entry per candidate pair
+        valid_flags: int32 scratch array with at least one entry per work list entry
+        valid_offsets: int32 scratch array with at least one entry per work list entry
+        all_vertices: Undeformed vertices of every object, concatenated
+        work_vertex: Index into all_vertices for each work list entry
+        work_pair: Index into pair_objects for each work list entry
+        pair_objects: (P,2) ordered (query object, target object) candidate pairs
+        mesh_ids: Warp mesh ID for every object
+        global_q: Global generalized coordinates array
+        max_distance: Maximum distance for mesh queries
+        epsilon: Small value for distance comparisons
+        contact_cache: Optional ContactCache (see contact_cache.py) already aligned with this work list
+        shapes: Optional AnalyticShape for every object (see analytic_shapes.py), all targets are meshes if None
+        sdf_grids: Optional SDFGrid for every object (see sdf_grid.py), used for targets without an analytic shape
+        sdf_values: Node values of all signed distance grids, required if sdf_grids is given
+
+    Returns:
+        int: the new number of contacts in collision_results
+    """
+    num_pairs = pair_objects.shape[0]
+    num_work = work_vertex.shape[0]
+
+    if num_pairs == 0 or num_work == 0:
+        return current_num_contacts.item()
+
+    if shapes is None:
+        shapes = wp.zeros(shape=(mesh_ids.shape[0],), dtype=AnalyticShape, device=mesh_ids.device)
+    if sdf_grids is None:
+        sdf_grids = wp.zeros(shape=(mesh_ids.shape[0],), dtype=SDFGrid, device=mesh_ids.device)
+        sdf_values = wp.zeros(shape=(0,), dtype=wp.float64, device=mesh_ids.device)
 
+    #transforms and inverses are computed once per pair rather than once per vertex
+    wp.launch(collision_pair_setup, dim=num_pairs, inputs=[collision_pairs, pair_objects, mesh_ids, shapes, sdf_grids, global_q])
 
+    if contact_cache is not None:
+        #warm started queries that reuse the closest faces of the previous time step
+        contact_cache.detect(all_vertices, work_vertex, work_pair, collision_pairs, sdf_values, max_distance, epsilon, collision_buffer[0:num_work])
+    else:
+        wp.launch(
+            kernel=batched_collision_detection,
+            dim=num_work,
+            inputs=[
+                all_vertices,
+                work_vertex, work_pair,
+                collision_pairs, sdf_values,
+                max_distance, epsilon, collision_buffer[0:num_work]
+            ]
+        )
+
+    #a single compaction over the whole work list, contacts come out grouped by pair in work list order
+    compact_collision_buffer(wp.from_torch(current_num_contacts, dtype=wp.int32), collision_results, collision_buffer[0:num_work], valid_flags, valid_offsets)
+
+    return current_num_contacts.item()
@@ -0,0 +1,90 @@
+"""
+Reusable Scratch Buffers
+
+Solves that are set up again in every time step (e.g. the Newton problem of a contact
+island, see Simulator.island_problem) need a handful of work buffers whose size depends
+on the step. Allocating them anew every step costs an allocation (and on the GPU often a
+synchronization) per buffer. ScratchBuffers keeps every buffer under a name and hands out
+a view of the requested size, the storage only grows (by at least a factor of two) when a
+larger size is requested. Objects that do not have a size (a sparse matrix, a solver)
+are created once per name.
+"""
+
+import math
+import warp as wp
+import torch
+
+class ScratchBuffers:
+    """
+    Named scratch tensors and warp arrays that are reused from call to call and only grow.
+    """
+
+    def __init__(self, device):
+        """
+        Args:
+            device: torch device of the buffers
+        """
+        self.device = device
+        self.buffers = {}
+
+    def tensor(self, name: str, shape: tuple, dtype, zero: bool = True) -> torch.Tensor:
+        """
+        Contiguous tensor view of the buffer called name.
+
+        Args:
+            name: buffer name, every name holds one dtype
+            shape: shape of the view
+            dtype: torch dtype
+            zero: fill the view with zeros
+
+        Returns:
+            torch.Tensor: view of the buffer, valid until the next request of the same name
+        """
+        size = math.prod(shape)
+        buffer = self.buffers.get(name)
+        if buffer is None or buffer.numel() < size:
+            capacity = max(size, 2*buffer.numel()) if buffer is not None else size
+            buffer = torch.zeros((capacity,), dtype=dtype, device=self.device)
+            self.buffers[name] = buffer
+
+        view = buffer[0:size].reshape(shape)
+        if zero:
+            view.zero_()
+
+        return view
+
+    def array(self, name: str, size: int, dtype) -> wp.array:
+        """
+        Warp array view of the buffer called name, e.g. for arrays of structs.
+
+        Args:
+            name: buffer name, every name holds one dtype
+            size: number of elements of the view
+            dtype: warp dtype
+
+        Returns:
+            wp.array: view of the first size elements of the buffer, not cleared
+        """
+        buffer = self.buffers.get(name)
+        if buffer is None or buffer.shape[0] < size:
+            capacity = max(size, 2*buffer.shape[0]) if buffer is not None else size
+            buffer = wp.zeros(shape=(capacity,), dtype=dtype, device=wp.device_from_torch(self.device))
+            self.buffers[name] = buffer
+
+        return buffer[0:size]
+
+    def object(self, name: str, factory):
+        """
+        Object called name, created by factory() on the first request.
+
+        Args:
+            name: object name
+            factory: function without arguments creating the object
+
+        Returns:
+            the object
+        """
+        if name not in self.buffers:
+            self.buffers[name] = factory()
+
+        return self.buffers[name]
@@ -0,0 +1,120 @@
+"""
+Signed Distance Grids
+
+For dense meshes a closest point query traverses a deep BVH, so its cost grows with the
+size of the target mesh. An object can instead precompute its signed distance field on a
+regular grid in its undeformed space (see utils/compute_sdf_grid.py). A query is then a
+constant time trilinear interpolation of the eight surrounding grid nodes, and the
+gradient of the interpolant gives the contact normal.
+
+The grids of all objects are stored back to back in one flat array of node values,
+every object has an SDFGrid header describing where its nodes start and how they map to
+its undeformed space. Node (i, j, k) of a grid is stored at offset + (i*ny + j)*nz + k.
+Objects without a grid have zero dims.
+
+Points outside the grid are reported as far away from the surface, so the grid has to be
+padded by at least the contact threshold.
+"""
+
+import warp as wp
+import numpy as np
+
+@wp.struct
+class SDFGrid:
+    origin: wp.vec3d  # undeformed space position of node (0, 0, 0)
+    spacing: wp.float64  # distance between neighbouring nodes
+    dims: wp.vec3i  # number of nodes along each axis, zero if the object has no grid
+    offset: wp.int32  # index of node (0, 0, 0) in the flat value array
+
+@wp.func
+def sdf_grid_node(grid: SDFGrid, values: wp.array(dtype=wp.float64), i: wp.int32, j: wp.int32, k: wp.int32):
+    return values[grid.offset + (i*grid.dims[1] + j)*grid.dims[2] + k]
+
+@wp.func
+def sdf_grid_sample(grid: SDFGrid, values: wp.array(dtype=wp.float64), point: wp.vec3d, far_distance: wp.float64):
+    # returns (grad phi, phi) of the trilinear interpolant, grad phi is normalized
+    x = (point - grid.origin)/grid.spacing
+
+    outside = False
+    for axis in range(3):
+        if x[axis] < wp.float64(0.0) or x[axis] > wp.float64(grid.dims[axis] - 1):
+            outside = True
+    if outside:
+        return wp.vec4d(wp.float64(0.0), wp.float64(1.0), wp.float64(0.0), far_distance)
+
+    # cell containing the point and the local coordinates inside it
+    i = wp.min(wp.int32(x[0]), grid.dims[0] - 2)
+    j = wp.min(wp.int32(x[1]), grid.dims[1] - 2)
+    k = wp.min(wp.int32(x[2]), grid.dims[2] - 2)
+    u = x[0] - wp.float64(i)
+    v = x[1] - wp.float64(j)
+    w = x[2] - wp.float64(k)
+
+    c000 = sdf_grid_node(grid, values, i, j, k)
+    c001 = sdf_grid_node(grid, values, i, j, k + 1)
+    c010 = sdf_grid_node(grid, values, i, j + 1, k)
+    c011 = sdf_grid_node(grid, values, i, j + 1, k + 1)
+    c100 = sdf_grid_node(grid, values, i + 1, j, k)
+    c101 = sdf_grid_node(grid, values, i + 1, j, k + 1)
+    c110 = sdf_grid_node(grid, values, i + 1, j + 1, k)
+    c111 = sdf_grid_node(grid, values, i + 1, j + 1, k + 1)
+
+    one = wp.float64(1.0)
+
+    # interpolate along z, then y, then x keeping the partial derivatives
+    c00 = c000*(one - w) + c001*w
+    c01 = c010*(one - w) + c011*w
+    c10 = c100*(one - w) + c101*w
+    c11 = c110*(one - w) + c111*w
+
+    c0 = c00*(one - v) + c01*v
+    c1 = c10*(one - v) + c11*v
+
+    phi = c0*(one - u) + c1*u
+
+    grad = wp.vec3d(
+        c1 - c0,
+        (c01 - c00)*(one - u) + (c11 - c10)*u,
+        ((c001 - c000)*(one - v) + (c011 - c010)*v)*(one - u) + ((c101 - c100)*(one - v) + (c111 - c110)*v)*u
+    )
+
+    length = wp.length(grad)
+    if length > wp.float64(0.0):
+        grad = grad/length
+    else:
+        grad = wp.vec3d(wp.float64(0.0), wp.float64(1.0), wp.float64(0.0))
+
+    return wp.vec4d(grad[0], grad[1], grad[2], phi)
+
+def sdf_grid_arrays(grids: list, device) -> (wp.array, wp.array):
+    """
+    Pack per object signed distance grids into Warp arrays.
+
+    Args:
+        grids: one entry per object, either None or a (values, origin, spacing) tuple as returned by compute_sdf_grid,
+            objects given the same values array share its nodes
+        device: Warp or torch device
+
+    Returns:
+        (headers, values): array of SDFGrid structs, one per object, and the flat float64 array of all grid nodes
+    """
+    headers = []
+    all_values = [np.zeros((0,), dtype=np.float64)]
+    offset = 0
+    shared_offsets = {}
+
+    for grid in grids:
+        header = SDFGrid()
+        if grid is not None:
+            values, origin, spacing = grid
+            header.origin = wp.vec3d(*[float(x) for x in origin])
+            header.spacing = float(spacing)
+            header.dims = wp.vec3i(*[int(x) for x in values.shape])
+            if id(values) not in shared_offsets:
+                shared_offsets[id(values)] = offset
+                all_values.append(values.reshape(-1))
+                offset += values.size
+            header.offset = shared_offsets[id(values)]
+        headers.append(header)
+
+    return wp.array(headers, dtype=SDFGrid, device=str(device)), wp.array(np.concatenate(all_values), dtype=wp.float64, device=str(device))
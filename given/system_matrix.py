@@ -0,0 +1,195 @@
+"""
+Fixed Pattern Newton System Matrix
+
+Assembling M + dt^2 (H_e + H_c) with the BSR operators allocates a new matrix for every
++ and *, and bsr_set_from_triplets sorts the contact triplets again in every Newton
+iteration, although the block pattern only depends on which bodies are in contact.
+SystemMatrix keeps one BsrMatrix whose pattern is the union of
+    - one diagonal block per body
+    - the (a, b) and (b, a) blocks of every pair of free bodies in contact
+It is rebuilt only when the set of contact pairs changes, which is detected on the device
+by comparing the block keys of the new pattern with the stored ones. The constant part of
+the matrix is written once when the pattern is built and kept in a copy of the values:
+    C_ii  = I_3 (x) Mbar_i             free bodies, from the 4x4 mass blocks (see given/compact_mass.py)
+    C_ii  = I                          pinned bodies
+Every stored block of the contact Hessian gets the offset of its block in the matrix once
+per step, and every Newton iteration only writes values in place:
+    A     = C
+    A_ii += dt^2 H_e,ii                free bodies
+    A_rc += dt^2 H_c,k                 contact block k at (r, c), r and c free
+
+The fixed DOF projection is folded into the matrix: pinned bodies keep an identity
+diagonal block and no coupling, so with their gradient entries set to zero the Newton
+direction leaves them in place and the system can be solved without P.
+"""
+
+import warp as wp
+import warp.sparse as wps
+import torch
+from .compact_mass import CompactMass
+
+@wp.kernel
+def write_constant_blocks(
+    values: wp.array(dtype=wp.mat((12,12),dtype=wp.float64)),
+    mass_blocks: wp.array(dtype=wp.mat((4,4),dtype=wp.float64)),
+    diagonal_slots: wp.array(dtype=wp.int32),
+    pinned: wp.array(dtype=wp.int32)
+):
+    # one thread per body, the mass block of free bodies and an identity block for pinned bodies
+    i = wp.tid()
+
+    if pinned[i] != 0:
+        values[diagonal_slots[i]] = wp.identity(n=12, dtype=wp.float64)
+    else:
+        Mbar = mass_blocks[i]
+        block = wp.matrix(shape=(12,12), dtype=wp.float64)
+        for r in range(3):
+            for c in range(4):
+                for d in range(4):
+                    block[4*r + c, 4*r + d] = Mbar[c,d]
+        values[diagonal_slots[i]] = block
+
+@wp.kernel
+def add_energy_blocks(
+    values: wp.array(dtype=wp.mat((12,12),dtype=wp.float64)),
+    energy_blocks: wp.array(dtype=wp.mat((12,12),dtype=wp.float64)),
+    diagonal_slots: wp.array(dtype=wp.int32),
+    pinned: wp.array(dtype=wp.int32),
+    dt2: wp.float64
+):
+    # one thread per body, every body owns its diagonal slot so no atomics are needed
+    i = wp.tid()
+
+    if pinned[i] == 0:
+        values[diagonal_slots[i]] = values[diagonal_slots[i]] + dt2*energy_blocks[i]
+
+@wp.kernel
+def add_contact_blocks(
+    values: wp.array(dtype=wp.mat((12,12),dtype=wp.float64)),
+    contact_blocks: wp.array(dtype=wp.mat((12,12),dtype=wp.float64)),
+    contact_slots: wp.array(dtype=wp.int32),
+    dt2: wp.float64
+):
+    # one thread per contact Hessian block, blocks of pinned or static bodies have no slot
+    k = wp.tid()
+    slot = contact_slots[k]
+
+    if slot >= 0:
+        wp.atomic_add(values, slot, dt2*contact_blocks[k])
+
+class SystemMatrix:
+    """
+    Newton system matrix with a persistent block pattern and in place value updates.
+
+    Call update_pattern() once per step, then assemble() in every Newton iteration.
+    """
+
+    def __init__(self, mass: CompactMass, pinned_blocks: torch.Tensor, device):
+        """
+        Args:
+            mass: 4x4 mass block of every dynamic body
+            pinned_blocks: indices of the pinned bodies
+            device: torch device
+        """
+        num_blocks = mass.blocks.shape[0]
+        self.num_blocks = num_blocks
+        self.mass = mass
+        self.device = device
+
+        self.pinned = torch.zeros((num_blocks,), dtype=torch.int32, device=device)
+        self.pinned[pinned_blocks.long()] = 1
+
+        self.matrix = wps.bsr_zeros(num_blocks, num_blocks, block_type=wp.mat((12,12),dtype=wp.float64), device=wp.device_from_torch(device))
+        self.keys = None
+        self.block_keys = None
+        self.diagonal_slots = None
+        self.constant_values = None
+        self.contact_slots = torch.zeros((0,), dtype=torch.int32, device=device)
+        self.num_patterns = 0
+
+    def set_pinned(self, pinned_blocks: torch.Tensor):
+        """
+        Replace the set of pinned bodies, the block pattern is rebuilt by the next update_pattern().
+
+        Args:
+            pinned_blocks: indices of the pinned bodies
+        """
+        self.pinned.zero_()
+        self.pinned[pinned_blocks.long()] = 1
+        self.keys = None
+
+    def update_pattern(self, contact_pairs: torch.Tensor, contact_indices: torch.Tensor):
+        """
+        Rebuild the block pattern if the contact pairs changed and locate every contact Hessian block in it.
+
+        Args:
+            contact_pairs: (P,2) unique (object1_id, object2_id) pairs with contacts, see contact_pair_segments
+            contact_indices: (K,2) (row, column) body index of every contact Hessian block
+        """
+        n = self.num_blocks
+
+        #coupling blocks between free dynamic bodies, both orientations
+        a = contact_pairs[:,0].long()
+        b = contact_pairs[:,1].long()
+        coupled = (a < n) & (b < n) & (a != b)
+        coupled[coupled.clone()] = (self.pinned[a[coupled]] == 0) & (self.pinned[b[coupled]] == 0)
+        a = a[coupled]
+        b = b[coupled]
+
+        diagonal = torch.arange(n, device=self.device)
+        keys = torch.unique(torch.cat((diagonal*n + diagonal, a*n + b, b*n + a)))
+
+        #compared on the device, the values are only compared when the number of blocks matches
+        changed = self.keys is None or self.keys.shape != keys.shape or not torch.equal(self.keys, keys)
+        if changed:
+            rows = (keys // n).to(torch.int32)
+            columns = (keys % n).to(torch.int32)
+            zeros = torch.zeros((keys.shape[0], 12, 12), dtype=torch.float64, device=self.device)
+            wps.bsr_set_from_triplets(self.matrix, wp.from_torch(rows), wp.from_torch(columns), wp.from_torch(zeros, dtype=wp.mat((12,12),dtype=wp.float64)), \
+                prune_numerical_zeros=False)
+
+            #block keys in storage order, sorted since BSR blocks are sorted by row then column
+            nnz = self.matrix.nnz_sync()
+            offsets = wp.to_torch(self.matrix.offsets)[0:n + 1].long()
+            stored_columns = wp.to_torch(self.matrix.columns)[0:nnz].long()
+            stored_rows = torch.repeat_interleave(torch.arange(n, device=self.device), offsets[1:] - offsets[0:n])
+            self.block_keys = stored_rows*n + stored_columns
+            self.diagonal_slots = torch.searchsorted(self.block_keys, diagonal*n + diagonal).to(torch.int32)
+
+            #the constant blocks are written once per pattern, every assemble starts from a copy of them
+            wp.launch(write_constant_blocks, dim=n, inputs=[self.matrix.values, self.mass.blocks_wp, wp.from_torch(self.diagonal_slots), wp.from_torch(self.pinned)], \
+                device=self.matrix.device)
+            self.constant_values = wp.clone(self.matrix.values)
+
+            self.keys = keys
+            self.num_patterns += 1
+
+        #slot of every contact Hessian block, -1 if it touches a pinned or static body
+        rows = contact_indices[:,0].long()
+        columns = contact_indices[:,1].long()
+        valid = (rows < n) & (columns < n)
+        valid[valid.clone()] = (self.pinned[rows[valid]] == 0) & (self.pinned[columns[valid]] == 0)
+
+        slots = torch.searchsorted(self.block_keys, rows*n + columns)
+        self.contact_slots = torch.where(valid, slots, -1).to(torch.int32)
+
+    def assemble(self, energy_blocks: wp.array, contact_blocks: torch.Tensor, dt: float) -> wps.BsrMatrix:
+        """
+        Write the values of the system matrix in place.
+
+        Args:
+            energy_blocks: (N,) 12x12 elastic Hessian block of every dynamic body
+            contact_blocks: (K,12,12) contact Hessian blocks, in the order given to update_pattern
+            dt: time step
+
+        Returns:
+            wps.BsrMatrix: the system matrix, with identity blocks for pinned bodies
+        """
+        wp.copy(self.matrix.values, self.constant_values)
+
+        wp.launch(add_energy_blocks, dim=self.num_blocks, inputs=[self.matrix.values, energy_blocks, wp.from_torch(self.diagonal_slots), \
+            wp.from_torch(self.pinned), wp.float64(dt*dt)], device=self.matrix.device)
+        wp.launch(add_contact_blocks, dim=self.contact_slots.shape[0], inputs=[self.matrix.values, wp.from_torch(contact_blocks, dtype=wp.mat((12,12),dtype=wp.float64)), \
+            wp.from_torch(self.contact_slots), wp.float64(dt*dt)], device=self.matrix.device)
+
+        return self.matrix
@@ -0,0 +1,163 @@
+"""
+Vertex Culling Narrow Phase Work List
+
+build_collision_work_list sends every vertex of the querying object of a candidate pair
+to the narrow phase, even if only a small patch of it is close to the target object. This
+module culls the query vertices: every object keeps a BVH over its undeformed collision
+vertices, and for each candidate pair (a, b) only the vertices of a that lie inside the
+overlap of the (inflated) world space bounds of a and b are emitted.
+
+The overlap box is mapped into the undeformed space of a through the inverse of its
+affine transform,
+    center_local = A_a^-1 (center_world - t_a)
+    half_local   = |A_a^-1| half_world
+and the vertex BVH of a is queried with the resulting box, so the cost of building the
+work list scales with the number of vertices near the contact region rather than with the
+size of a. Only the query side is culled, this is not a tree against tree traversal: the
+target b is still handled by the closest point query of every emitted vertex against the
+mesh BVH of b.
+
+The work list is built in two passes: the first counts the vertices of every pair, an
+exclusive scan of the counts gives the start of every pair in the work list and the
+second pass writes the vertices. Vertices keep their BVH traversal order, so the list is
+deterministic.
+"""
+
+import warp as wp
+import torch
+from .object_pair_collision_detection import affine_deformation, affine_translation
+
+@wp.func
+def overlap_query_box(
+    obj1: wp.int32,
+    obj2: wp.int32,
+    world_lowers: wp.array(dtype=wp.vec3d),
+    world_uppers: wp.array(dtype=wp.vec3d),
+    global_q: wp.array(dtype=wp.vec(length=12,dtype=wp.float64))
+):
+    # returns the overlap of the world bounds of obj1 and obj2 in the undeformed space of obj1 as (lower, upper, non empty)
+    lower = wp.max(world_lowers[obj1], world_lowers[obj2])
+    upper = wp.min(world_uppers[obj1], world_uppers[obj2])
+
+    empty = lower[0] > upper[0] or lower[1] > upper[1] or lower[2] > upper[2]
+
+    A_inv = wp.inverse(affine_deformation(global_q[obj1]))
+    t = affine_translation(global_q[obj1])
+
+    center = A_inv @ (wp.float64(0.5)*(lower + upper) - t)
+    half = wp.float64(0.5)*(upper - lower)
+    local_half = wp.vec3d(
+        wp.abs(A_inv[0, 0])*half[0] + wp.abs(A_inv[0, 1])*half[1] + wp.abs(A_inv[0, 2])*half[2],
+        wp.abs(A_inv[1, 0])*half[0] + wp.abs(A_inv[1, 1])*half[1] + wp.abs(A_inv[1, 2])*half[2],
+        wp.abs(A_inv[2, 0])*half[0] + wp.abs(A_inv[2, 1])*half[1] + wp.abs(A_inv[2, 2])*half[2]
+    )
+
+    local_lower = center - local_half
+    local_upper = center + local_half
+
+    return wp.vec3f(wp.float32(local_lower[0]), wp.float32(local_lower[1]), wp.float32(local_lower[2])), \
+        wp.vec3f(wp.float32(local_upper[0]), wp.float32(local_upper[1]), wp.float32(local_upper[2])), not empty
+
+@wp.kernel
+def count_overlap_vertices(
+    counts_out: wp.array(dtype=wp.int32),
+    pair_objects: wp.array2d(dtype=wp.int32),
+    world_lowers: wp.array(dtype=wp.vec3d),
+    world_uppers: wp.array(dtype=wp.vec3d),
+    global_q: wp.array(dtype=wp.vec(length=12,dtype=wp.float64)),
+    vertex_bvh_ids: wp.array(dtype=wp.uint64)
+):
+    # one thread per candidate pair
+    pair_id = wp.tid()
+    obj1 = pair_objects[pair_id, 0]
+
+    lower, upper, overlapping = overlap_query_box(obj1, pair_objects[pair_id, 1], world_lowers, world_uppers, global_q)
+
+    count = wp.int32(0)
+    if overlapping:
+        query = wp.bvh_query_aabb(vertex_bvh_ids[obj1], lower, upper)
+        vertex = wp.int32(0)
+        while wp.bvh_query_next(query, vertex):
+            count += 1
+
+    counts_out[pair_id] = count
+
+@wp.kernel
+def write_overlap_vertices(
+    work_vertex_out: wp.array(dtype=wp.int32),
+    work_pair_out: wp.array(dtype=wp.int32),
+    pair_starts: wp.array(dtype=wp.int32),
+    pair_objects: wp.array2d(dtype=wp.int32),
+    world_lowers: wp.array(dtype=wp.vec3d),
+    world_uppers: wp.array(dtype=wp.vec3d),
+    global_q: wp.array(dtype=wp.vec(length=12,dtype=wp.float64)),
+    vertex_bvh_ids: wp.array(dtype=wp.uint64),
+    vertex_offsets: wp.array(dtype=wp.int32)
+):
+    # one thread per candidate pair, same traversal as count_overlap_vertices
+    pair_id = wp.tid()
+    obj1 = pair_objects[pair_id, 0]
+
+    lower, upper, overlapping = overlap_query_box(obj1, pair_objects[pair_id, 1], world_lowers, world_uppers, global_q)
+
+    if overlapping:
+        slot = pair_starts[pair_id]
+        query = wp.bvh_query_aabb(vertex_bvh_ids[obj1], lower, upper)
+        vertex = wp.int32(0)
+        while wp.bvh_query_next(query, vertex):
+            work_vertex_out[slot] = vertex_offsets[obj1] + vertex
+            work_pair_out[slot] = pair_id
+            slot += 1
+
+def build_vertex_bvhs(vertices: list, device) -> list:
+    """
+    Build one BVH over the (undeformed) collision vertices of every object.
+
+    Args:
+        vertices: list of (V_i,3) tensors, one per object
+        device: torch device
+
+    Returns:
+        list: wp.Bvh per object, keep these alive while their ids are in use
+    """
+    bvhs = []
+    for v in vertices:
+        points = wp.from_torch(v.to(torch.float32).contiguous(), dtype=wp.vec3f)
+        bvhs.append(wp.Bvh(points, points))
+
+    return bvhs
+
+def build_vertex_cull_work_list(pair_objects: torch.Tensor, world_lowers: torch.Tensor, world_uppers: torch.Tensor, global_q: torch.Tensor, vertex_bvh_ids: wp.array, vertex_offsets: torch.Tensor):
+    """
+    Build a narrow phase work list holding only the query vertices inside the overlap of the pair bounds.
+
+    Args:
+        pair_objects: (P,2) int32 tensor of ordered (query object, target object) pairs
+        world_lowers: (N,3) lower corners of the inflated world space bounds of every object
+        world_uppers: (N,3) upper corners of the inflated world space bounds of every object
+        global_q: (N,12) generalized coordinates of all objects
+        vertex_bvh_ids: Warp BVH ID over the undeformed collision vertices of every object (see build_vertex_bvhs)
+        vertex_offsets: (N+1,) tensor, the vertices of object i are all_vertices[vertex_offsets[i]:vertex_offsets[i+1]]
+
+    Returns:
+        (work_vertex, work_pair): int32 tensors with one entry per (query vertex, pair), grouped by pair
+    """
+    device = pair_objects.device
+    num_pairs = pair_objects.shape[0]
+
+    counts = torch.zeros((num_pairs,), dtype=torch.int32, device=device)
+    inputs = [wp.from_torch(pair_objects), wp.from_torch(world_lowers, dtype=wp.vec3d), wp.from_torch(world_uppers, dtype=wp.vec3d), \
+        wp.from_torch(global_q, dtype=wp.vec(length=12,dtype=wp.float64)), vertex_bvh_ids]
+
+    wp.launch(count_overlap_vertices, dim=num_pairs, inputs=[wp.from_torch(counts)] + inputs)
+
+    pair_starts = (torch.cumsum(counts, 0) - counts).to(torch.int32)
+    num_work = int(counts.sum().item()) if num_pairs > 0 else 0
+
+    work_vertex = torch.zeros((num_work,), dtype=torch.int32, device=device)
+    work_pair = torch.zeros((num_work,), dtype=torch.int32, device=device)
+
+    wp.launch(write_overlap_vertices, dim=num_pairs, inputs=[wp.from_torch(work_vertex), wp.from_torch(work_pair), wp.from_torch(pair_starts)] + inputs + \
+        [wp.from_torch(vertex_offsets.to(torch.int32))])
+
+    return work_vertex, work_pair
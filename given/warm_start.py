@@ -0,0 +1,55 @@
+"""
+Warm Starts for the Newton Solve
+
+Newton's method starts every time step from the configuration of the previous step and
+CG starts every Newton iteration from zero. Both throw away information that is almost
+free to reuse.
+
+Newton initial guess (see Simulator.step):
+    - predictor:      q_pred = q + (q - q_prev) + dt^2 g, the minimizer of the inertia and
+                      gravity terms of the incremental potential
+    - extrapolation:  q_pred or the acceleration extrapolation
+                          q + (q - q_prev) + (q - 2 q_prev + q_prev_prev)
+                      whichever has the lower incremental potential
+Pinned objects and objects with contacts in the current step keep their previous
+configuration, predicting a body into a contact starts Newton far inside the stiff
+penalty region.
+
+CG initial guess (scaled_warm_start): the Newton direction of the previous iteration d is
+scaled to minimize the CG objective of the current system A x = b along d,
+    x0 = s d,   s = (d . b)/(d . A d)
+which can only reduce the initial energy norm error compared to x0 = 0.
+"""
+
+import warp as wp
+import warp.sparse as wps
+import warp.optim.linear as wpol
+import torch
+
+def scaled_warm_start(A, b: torch.Tensor, d: torch.Tensor) -> torch.Tensor:
+    """
+    Scale a previous solution to best fit a new linear system.
+
+    Args:
+        A: symmetric positive definite BsrMatrix with 12x12 blocks or LinearOperator (e.g. HessianOperator)
+        b: right hand side of the new system
+        d: previous solution, same shape as b
+
+    Returns:
+        torch.Tensor: s*d with s minimizing 0.5 x^T A x - b^T x along d, zero if d^T A d is not positive
+    """
+    d = d.reshape(-1)
+    x = wp.from_torch(d.reshape((-1,12)).contiguous(), dtype=wp.vec(length=12,dtype=wp.float64))
+    if isinstance(A, wpol.LinearOperator):
+        Ax = wp.zeros_like(x)
+        A.matvec(x, Ax, Ax, 1.0, 0.0)
+    else:
+        Ax = A @ x
+    Ad = wp.to_torch(Ax).reshape(-1)
+
+    #stays on the device, no host sync on the scale
+    curvature = torch.dot(d, Ad)
+    positive = curvature > 0
+    s = torch.where(positive, torch.dot(d, b.reshape(-1))/torch.where(positive, curvature, torch.ones_like(curvature)), torch.zeros_like(curvature))
+
+    return (s*d).reshape(b.shape)
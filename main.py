@@ -39,14 +39,14 @@ def ui_callback():
         sim.step()
         #update the vertices in the mesh
         for i in range(len(sim.objects)):
-            ps.get_surface_mesh("mesh"+"_"+str(i)).update_vertex_positions(transform_mesh(sim.objects[i][1].vertices, sim.q[i*12:(i+1)*12]).detach().cpu().numpy())
+            ps.get_surface_mesh("mesh"+"_"+str(sim.objects[i][1].config_index)).update_vertex_positions(transform_mesh(sim.objects[i][1].vertices, sim.q[i*12:(i+1)*12]).detach().cpu().numpy())
 
     #reset button
     if psim.Button("Reset Simulation"):
         print("Resetting Simulation")
         sim.reset()
         for i in range(len(sim.objects)):
-            ps.get_surface_mesh("mesh"+"_"+str(i)).update_vertex_positions(transform_mesh(sim.objects[i][1].vertices, sim.q[i*12:(i+1)*12]).detach().cpu().numpy())
+            ps.get_surface_mesh("mesh"+"_"+str(sim.objects[i][1].config_index)).update_vertex_positions(transform_mesh(sim.objects[i][1].vertices, sim.q[i*12:(i+1)*12]).detach().cpu().numpy())
 
         
     
@@ -54,7 +54,7 @@ def ui_callback():
         sim.step()
         #update the vertices in the mesh
         for i in range(len(sim.objects)):
-            ps.get_surface_mesh("mesh"+"_"+str(i)).update_vertex_positions(transform_mesh(sim.objects[i][1].vertices, sim.q[i*12:(i+1)*12]).detach().cpu().numpy())
+            ps.get_surface_mesh("mesh"+"_"+str(sim.objects[i][1].config_index)).update_vertex_positions(transform_mesh(sim.objects[i][1].vertices, sim.q[i*12:(i+1)*12]).detach().cpu().numpy())
 
 if __name__ == "__main__":
     #check arguments, load approriate model and test configuration
@@ -94,13 +94,13 @@ if __name__ == "__main__":
             # Register two objects (once)
             for i in range(len(sim.objects)):
                 face_counts = 3*torch.ones(sim.objects[i][1].triangles.shape[0], dtype=torch.int32, device=sim.sim_device)
-                w.add_mesh("Obj"+"_"+str(i), face_counts=face_counts, face_indices=sim.objects[i][1].triangles.reshape((-1,)).detach().cpu().numpy(), num_points=sim.objects[i][1].vertices.shape[0])
+                w.add_mesh("Obj"+"_"+str(sim.objects[i][1].config_index), face_counts=face_counts, face_indices=sim.objects[i][1].triangles.reshape((-1,)).detach().cpu().numpy(), num_points=sim.objects[i][1].vertices.shape[0])
                 
             for k in range(args.num_steps):
                 print("Step "+str(k))
                 sim.step()
                 for i in range(len(sim.objects)):
-                    w.write_points("Obj"+"_"+str(i), sim.get_deformed_vertices(i).reshape((-1,3)).detach().cpu().numpy(), timecode=k)
+                    w.write_points("Obj"+"_"+str(sim.objects[i][1].config_index), sim.get_deformed_vertices(i).reshape((-1,3)).detach().cpu().numpy(), timecode=k)
 
             w.close()
                         
@@ -114,7 +114,7 @@ if __name__ == "__main__":
    
     #launch polyscope and display surface mesh
     for i in range(len(sim.objects)):
-        ps.register_surface_mesh("mesh"+"_"+str(i), transform_mesh(sim.objects[i][1].vertices, sim.q[i*12:(i+1)*12]).detach().cpu().numpy(), sim.objects[i][1].triangles.detach().cpu().numpy())
+        ps.register_surface_mesh("mesh"+"_"+str(sim.objects[i][1].config_index), transform_mesh(sim.objects[i][1].vertices, sim.q[i*12:(i+1)*12]).detach().cpu().numpy(), sim.objects[i][1].triangles.detach().cpu().numpy())
 
     ps.set_user_callback(ui_callback)
 
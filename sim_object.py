@@ -1,18 +1,23 @@
 import torch
 from utils import *
-import igl
 
 #This is an affine-body-dynamics object
 #standard form of q is a 3x4 matrix, vectorized form is row flattened matrix as a 12x1 vector
 class SimObject:
 
-    def __init__(self, config: ObjectConfig, sim_device, sim_dtype):
+    def __init__(self, config: ObjectConfig, sim_device, sim_dtype, geometry_registry: GeometryRegistry = None, config_index: int = 0):
 
         
         self.sim_thin_shell = True
+        #position of the object in the scene config, the simulator reorders objects (statics last) but output is named after the config
+        self.config_index = config_index
+        self.is_static = config.geometry_type == "static"
 
-        if config.geometry_type == "rigid":
-            self.vertices, _, _, self.triangles, _, _ = igl.readOBJ(config.mesh)
+        if config.geometry_type == "rigid" or config.geometry_type == "static":
+            #objects using the same mesh file share its buffers, see utils/geometry_registry.py
+            if geometry_registry is None:
+                geometry_registry = GeometryRegistry(sim_device, sim_dtype)
+            geometry = geometry_registry.load(config)
             self.sim_thin_shell = False
         else:
             print("Only rigid objects supports")
@@ -37,14 +42,54 @@ class SimObject:
         else:
             self.pinned_dofs = None 
 
-        #convert everything to torch tensors
-        self.vertices = torch.tensor(self.vertices, dtype=sim_dtype, device=sim_device)
-        self.triangles = torch.tensor(self.triangles, dtype=torch.int32, device=sim_device)
+        #render mesh and the collision proxy used by the narrow phase, these tensors are shared with the other instances of the geometry
+        self.vertices = geometry.vertices
+        self.triangles = geometry.triangles
+        self.collision_vertices = geometry.collision_vertices
+        self.collision_triangles = geometry.collision_triangles
+
+        #objects with the same geometry key can share everything derived from the undeformed geometry
+        #static objects bake their transform into their own copy of the vertices below, they share nothing
+        self.geometry_key = None if self.is_static else geometry.key
+
+        #analytic collision shape as (type, center, size), see given/analytic_shapes.py
+        shape = config.collision_shape
+        self.collision_shape = shape.type
+        self.collision_shape_center = torch.tensor(shape.center, dtype=sim_dtype, device=sim_device)
+        if shape.type == "sphere":
+            self.collision_shape_size = torch.tensor([shape.radius, 0.0, 0.0], dtype=sim_dtype, device=sim_device)
+        elif shape.type == "half_space":
+            self.collision_shape_size = torch.nn.functional.normalize(torch.tensor(shape.normal, dtype=sim_dtype, device=sim_device), dim=0)
+        else:
+            self.collision_shape_size = torch.tensor(shape.half_extents, dtype=sim_dtype, device=sim_device)
+
+        #static objects never move, their transform is baked into the vertices so they live in world space with an identity q
+        if self.is_static:
+            A = self.obj_transform[0:3,0:3]
+            t = self.obj_transform[0:3,3]
+            self.vertices = self.vertices @ A.T + t
+            self.collision_vertices = self.collision_vertices @ A.T + t
+
+            #analytic shapes are baked too, the config only allows similarity transforms for spheres and axis aligned scaling for boxes
+            self.collision_shape_center = A @ self.collision_shape_center + t
+            if self.collision_shape == "sphere":
+                self.collision_shape_size = self.collision_shape_size*torch.abs(torch.linalg.det(A))**(1.0/3.0)
+            elif self.collision_shape == "half_space":
+                self.collision_shape_size = torch.nn.functional.normalize(torch.linalg.solve(A.T, self.collision_shape_size), dim=0)
+            elif self.collision_shape == "box":
+                self.collision_shape_size = torch.abs(A) @ self.collision_shape_size
+            self.obj_transform = torch.eye(4,4, dtype=sim_dtype, device=sim_device)
+            self.obj_initial_velocity = torch.zeros(3, dtype=sim_dtype, device=sim_device)
+            self.pinned_dofs = None
+
+        self.sdf_resolution = config.sdf_resolution
 
         self.rho = config.material.density
         self.params = torch.tensor([config.material.youngs, config.material.poissons], dtype=sim_dtype, device=sim_device)
 
     def num_dofs(self):
+        if self.is_static:
+            return 0 #static objects are not simulated
         return 1 #just one dof per object
 
     def dof_block_size(self):
@@ -5,6 +5,7 @@ from utils import *
 import igl
 import warp as wp
 import warp.sparse as wsp
+from concurrent.futures import ThreadPoolExecutor
 from sim_object import *
 
 class Simulator:
@@ -12,7 +13,7 @@ class Simulator:
     time = 0.0 #current simulation time
     dt = 0.1 #simulation time step
     gravity = None #torch.tensor([0.0, -9.8, 0.0], dtype=sim_dtype, device=sim_device) #default gravitational acceleration
-    Mass_matrix = None
+    mass = None #CompactMass, one 4x4 mass block per dynamic body
     H_energy = None
     H_contact = None #BSR sparse contact hessian
     g_contact = None  #contact gradient 
@@ -20,6 +21,7 @@ class Simulator:
     grad_energy = None
     Pinned_matrix = None
     contact_list = None #I'm gonna store contact pairs in here 
+    contact_pairs = None #unique (object1_id, object2_id) pairs that have contacts
     elastic_energy = None
 
     def __init__(self, config: str, sim_device: str, sim_dtype: str):
@@ -37,21 +39,84 @@ class Simulator:
         self.contact_list = wp.array(shape=(self.max_contact_pairs, ), dtype=CollisionResult, device=self.sim_device)
         self.current_num_contacts = torch.tensor([0], dtype=torch.int32, device=self.sim_device)
         self.elastic_energy = torch.tensor([0.0], dtype=self.sim_dtype, device=self.sim_device)
+        self.line_search_alphas = line_search_alphas(self.sim_device, self.sim_dtype)
+        #one row per step size, the batched energy kernels accumulate every step size into its own row
+        self.line_search_energies = torch.zeros((self.line_search_alphas.shape[0], 1), dtype=self.sim_dtype, device=self.sim_device)
         #load and setup every objet from the config
+        #static objects have no DOFs, they are placed after all dynamic objects so the dynamic DOFs are the leading part of q
+        #every object keeps its config_index, output (meshes, USD prims) is named after the config order, not the simulation order
+        #objects using the same mesh file share its buffers, BVH, signed distance grid and unit density mass matrix
+        self.geometry_registry = GeometryRegistry(sim_device, sim_dtype)
+        sim_objects = [SimObject(obj, sim_device, sim_dtype, self.geometry_registry, i) for i, obj in enumerate(self.config.objects)]
+        sim_objects = [obj for obj in sim_objects if not obj.is_static] + [obj for obj in sim_objects if obj.is_static]
         obj_index = 0
-        for obj in self.config.objects:
-            self.objects.append((obj_index,SimObject(obj, sim_device, sim_dtype)))
+        for obj in sim_objects:
+            self.objects.append((obj_index,obj))
             obj_index += 1
 
-        #generate warp meshes for each object 
+        #instances of the same geometry have the same key, every static object has its own
+        self.instance_keys = [obj[1].geometry_key if obj[1].geometry_key is not None else ("static", obj[0]) for obj in self.objects]
+
+        #generate warp meshes for each object from its collision proxy, one per geometry
         self.mesh_dict = {} #mesh diectionary because I guess you can't do anything else 
+        shared_meshes = {}
         
         for i in range(len(self.objects)):
-           self.mesh_dict[i] = wp.Mesh(points=wp.from_torch(self.objects[i][1].vertices.reshape(-1,3).to(torch.float32),dtype=wp.vec3f), indices=wp.from_torch(self.objects[i][1].triangles.reshape(-1,),dtype=wp.int32))
-
-        #find max number of vertices in any object
-        self.max_vertices = torch.Tensor([len(obj[1].vertices) for obj in self.objects]).max()
-        self.obj_pair_contact_buffer = wp.array(shape=(self.max_vertices,), dtype=CollisionResult, device=self.sim_device)
+           if self.instance_keys[i] not in shared_meshes:
+               shared_meshes[self.instance_keys[i]] = wp.Mesh(points=wp.from_torch(self.objects[i][1].collision_vertices.reshape(-1,3).to(torch.float32),dtype=wp.vec3f), indices=wp.from_torch(self.objects[i][1].collision_triangles.reshape(-1,),dtype=wp.int32))
+           self.mesh_dict[i] = shared_meshes[self.instance_keys[i]]
+
+        #undeformed bounding boxes of each object, used by the broad phase
+        self.broad_phase = self.config.broad_phase
+        self.local_lowers = torch.stack([obj[1].collision_vertices.min(dim=0).values for obj in self.objects]).to(self.sim_dtype)
+        self.local_uppers = torch.stack([obj[1].collision_vertices.max(dim=0).values for obj in self.objects]).to(self.sim_dtype)
+        self.world_lowers = torch.zeros_like(self.local_lowers)
+        self.world_uppers = torch.zeros_like(self.local_uppers)
+        self.hash_grid = HashGridBroadPhase(self.sim_device) if self.broad_phase == "hash_grid" else None
+
+        #query vertices of every object in one array so the narrow phase can process all candidate pairs in one launch
+        self.all_vertices = torch.cat([obj[1].collision_vertices for obj in self.objects]).to(self.sim_dtype)
+        self.vertex_offsets = torch.tensor([0] + [len(obj[1].collision_vertices) for obj in self.objects], dtype=torch.int64, device=self.sim_device).cumsum(0)
+        self.mesh_ids = wp.array([self.mesh_dict[i].id for i in range(len(self.objects))], dtype=wp.uint64, device=self.sim_device)
+        self.collision_shapes = analytic_shape_array([obj[1].collision_shape for obj in self.objects], [obj[1].collision_shape_center.tolist() for obj in self.objects], \
+            [obj[1].collision_shape_size.tolist() for obj in self.objects], self.sim_device)
+
+        #signed distance grids of the collision meshes, padded so that every vertex within the contact threshold of the surface is inside the grid
+        #instances of a geometry with the same resolution share their grid
+        sdf_grids = []
+        shared_grids = {}
+        for obj in self.objects:
+            if obj[1].sdf_resolution is None:
+                sdf_grids.append(None)
+                continue
+
+            key = (self.instance_keys[obj[0]], obj[1].sdf_resolution)
+            if key not in shared_grids:
+                shared_grids[key] = compute_sdf_grid(obj[1].collision_vertices.cpu().numpy(), obj[1].collision_triangles.cpu().numpy(), obj[1].sdf_resolution, \
+                    4.0*self.contact_threshold, self.config.sdf_cache_directory)
+            sdf_grids.append(shared_grids[key])
+        self.sdf_grids, self.sdf_values = sdf_grid_arrays(sdf_grids, self.sim_device)
+        self.contact_object_ids = torch.zeros((self.max_contact_pairs, 2), dtype=torch.int32, device=self.sim_device)
+
+        #vertex BVHs used to cull the query vertices of every candidate pair
+        self.narrow_phase = self.config.narrow_phase
+        if self.narrow_phase == "vertex_cull":
+            #one BVH per geometry
+            first_instance = {}
+            for i in range(len(self.objects)):
+                first_instance.setdefault(self.instance_keys[i], i)
+            self.vertex_bvhs = build_vertex_bvhs([self.objects[i][1].collision_vertices for i in first_instance.values()], self.sim_device)
+            shared_bvhs = dict(zip(first_instance.keys(), self.vertex_bvhs))
+            self.vertex_bvh_ids = wp.array([shared_bvhs[key].id for key in self.instance_keys], dtype=wp.uint64, device=self.sim_device)
+
+        #closest faces of the previous time step, reused by the narrow phase for resting contacts
+        self.contact_cache = ContactCache(self.sim_device) if self.config.contact_caching else None
+
+        #narrow phase scratch buffers, grown on demand
+        self.collision_buffer = wp.array(shape=(0,), dtype=CollisionResult, device=self.sim_device)
+        self.collision_pairs = wp.array(shape=(0,), dtype=CollisionPair, device=self.sim_device)
+        self.collision_valid_flags = wp.array(shape=(0,), dtype=wp.int32, device=self.sim_device)
+        self.collision_valid_offsets = wp.array(shape=(0,), dtype=wp.int32, device=self.sim_device)
 
     def setup_simulation(self):
 
@@ -61,141 +126,649 @@ class Simulator:
         print("Initializing simulation")
         #init quantities needed for simulation
        
-        #how many dofs do I have ? 
+        #how many dofs do I have ? (static objects have none)
         self.total_dofs = sum([obj[1].num_dofs() for obj in self.objects])
         self.dof_block_size = self.objects[0][1].dof_block_size()
 
         print("Initializing Global variables")
         #make global gravity vector for the simulation
-        self.g_gravity = torch.zeros((len(self.objects),3,4),dtype=self.sim_dtype, device=self.sim_device)
+        self.g_gravity = torch.zeros((self.total_dofs,3,4),dtype=self.sim_dtype, device=self.sim_device)
         self.g_gravity[:, :, 3] = self.gravity
         self.g_gravity = self.g_gravity.reshape((-1,))
 
-        #precompute mass matrix for the scene 
-        self.Mass_matrix = block_diagonal_identity(wp.mat((12,12), dtype=wp.float64), 1, 1, self.total_dofs, self.sim_device, self.sim_dtype)
+        #precompute mass matrix for the scene, the mass matrix of a body is three copies of a 4x4 block, see given/compact_mass.py
+        mass_blocks = torch.zeros((self.total_dofs,4,4), dtype=self.sim_dtype, device=self.sim_device)
         self.H_energy = block_diagonal_identity(wp.mat((12,12), dtype=wp.float64), 1, 1, self.total_dofs, self.sim_device, self.sim_dtype)
+        #diagonal blocks M_i + dt^2 H_i of the Newton system, rewritten whenever the Hessian is evaluated
+        self.body_blocks = torch.zeros((self.total_dofs,12,12), dtype=self.sim_dtype, device=self.sim_device)
         self.g_energy = torch.zeros((self.total_dofs*self.dof_block_size,), dtype=self.sim_dtype, device=self.sim_device)
-        self.q = torch.zeros((self.total_dofs*self.dof_block_size,), dtype=self.sim_dtype, device=self.sim_device)
+        #q stores the affine transform of every object, the solver only updates the dynamic part q_dynamic, static objects keep an identity transform
+        self.q = torch.zeros((len(self.objects)*self.dof_block_size,), dtype=self.sim_dtype, device=self.sim_device)
+        self.q_dynamic = self.q[0:self.total_dofs*self.dof_block_size]
         self.qm1 = self.q.clone()
-        self.volumes = torch.zeros((len(self.objects),), dtype=self.sim_dtype, device=self.sim_device)
+        self.volumes = torch.zeros((self.total_dofs,), dtype=self.sim_dtype, device=self.sim_device)
         self.global_pinned_dofs = torch.Tensor([]).to(self.sim_dtype).to(self.sim_device)
         self.g_contact = torch.zeros_like(self.q)
-        self.H_contact= wsp.bsr_zeros(cols_of_blocks=len(self.objects), rows_of_blocks = len(self.objects), block_type=wp.mat((12,12), dtype=wp.dtype_from_torch(self.q.dtype)), device=wp.device_from_torch(self.q.device))
+        #line search direction of every object, static objects do not move
+        self.line_search_direction = torch.zeros_like(self.q)
+        self.H_contact= wsp.bsr_zeros(cols_of_blocks=self.total_dofs, rows_of_blocks = self.total_dofs, block_type=wp.mat((12,12), dtype=wp.dtype_from_torch(self.q.dtype)), device=wp.device_from_torch(self.q.device))
         self.contact_indices = torch.zeros((4*self.max_contact_pairs, 2), dtype=torch.int32, device=self.sim_device)
         self.contact_hessian_values = torch.zeros((4*self.max_contact_pairs, 12, 12), dtype=self.sim_dtype, device=self.sim_device)
+        #contact Hessian summed per contact pair, contact_indices holds the (row, column) of these blocks
+        self.pair_hessian_values = torch.zeros((4*self.max_contact_pairs, 12, 12), dtype=self.sim_dtype, device=self.sim_device)
 
         #fill in mass matrix 
+        #the mass matrix is linear in the density, instances of a geometry scale one unit density mass matrix and share its volume
+        unit_masses = {}
         for i in range(len(self.objects)):
 
-            #compute mass matrix blocks
-            indexed_vertices = wp.indexedarray(data=wp.from_torch(self.objects[i][1].vertices, dtype=wp.vec3d), indices=wp.from_torch(self.objects[i][1].triangles.reshape(-1,)))
-            wp.launch(mass_matrix_abd_object, dim=self.objects[i][1].triangles.shape[0], \
-                inputs=[wp.to_torch(self.Mass_matrix.values)[i,:,:], wp.from_torch(self.volumes[i:(i+1)],dtype=wp.float64), indexed_vertices, self.objects[i][1].rho])
-
             #initialize global q and qm1
             self.objects[i][1].set_initial_dofs(self.q[i*12:(i+1)*12], self.qm1[i*12:(i+1)*12], self.dt)
 
+            if self.objects[i][1].is_static:
+                continue
+
+            #compute mass matrix blocks
+            if self.instance_keys[i] not in unit_masses:
+                unit_mass = torch.zeros((12,12), dtype=self.sim_dtype, device=self.sim_device)
+                volume = torch.zeros((1,), dtype=self.sim_dtype, device=self.sim_device)
+                indexed_vertices = wp.indexedarray(data=wp.from_torch(self.objects[i][1].vertices, dtype=wp.vec3d), indices=wp.from_torch(self.objects[i][1].triangles.reshape(-1,)))
+                wp.launch(mass_matrix_abd_object, dim=self.objects[i][1].triangles.shape[0], \
+                    inputs=[unit_mass, wp.from_torch(volume,dtype=wp.float64), indexed_vertices, 1.0])
+                unit_masses[self.instance_keys[i]] = (compact_mass_blocks(unit_mass.unsqueeze(0))[0], volume)
+
+            unit_mass, volume = unit_masses[self.instance_keys[i]]
+            mass_blocks[i] = self.objects[i][1].rho*unit_mass
+            self.volumes[i:(i+1)] = volume
+
             #update pinned dof array
             if self.objects[i][1].pinned_dofs is not None:
                 self.global_pinned_dofs = torch.cat([self.global_pinned_dofs, self.objects[i][1].pinned_dofs + i])
             
+        self.mass = CompactMass(mass_blocks)
+
         
-        #setup scene fixed DOF projection matrix
-        self.P_pinned = fixed_dof_projection(None, self.q.reshape((-1,12)), self.global_pinned_dofs)
+        #the extrapolation warm start needs q at the two previous steps, start with a constant velocity history
+        self.qm2 = 2.0*self.qm1 - self.q
+
+        #Newton and CG iterations of every step, see solver_statistics
+        self.newton_iterations = []
+        self.cg_iterations = []
+
+        #persistent system matrix, its block pattern only changes with the contact pairs
+        self.system_matrix = SystemMatrix(self.mass, self.global_pinned_dofs, self.sim_device) if self.config.solver_settings.fixed_pattern else None
+
+        #scratch buffers and direct solvers of the contact islands of the last step, see solve_islands
+        self.island_workspaces = {}
+
+        #sparse direct solver, keeps its symbolic factorization while the contact pattern does not change
+        self.direct_solver = BlockCholeskySolver() if self.config.solver_settings.linear_solver == "cholesky" else None
+
+        #bodies at rest are frozen until something wakes them up, see given/body_sleeping.py
+        movable = torch.ones((self.total_dofs,), dtype=torch.bool, device=self.sim_device)
+        movable[self.global_pinned_dofs.long()] = False
+        self.sleeping = BodySleeping(movable, self.config.sleep_velocity, self.config.sleep_force_change, self.config.sleep_steps) if self.config.sleep_velocity is not None else None
+        self.contact_forces = torch.zeros_like(self.q)
+
+        self.update_free_dofs()
+
+    #free DOFs of the scene, everything but the pinned and the sleeping bodies
+    #rebuilds the fixed DOF projection and the per body index maps, call it whenever a body falls asleep or wakes up
+    def update_free_dofs(self):
+
+        fixed_bodies = self.global_pinned_dofs.long()
+        if self.sleeping is not None:
+            fixed_bodies = torch.unique(torch.cat((fixed_bodies, torch.nonzero(self.sleeping.asleep).reshape((-1,)))))
+
+        #warm starts only move the free objects, pinned objects stay where they are
+        self.free_dofs = torch.ones((self.total_dofs, self.dof_block_size), dtype=torch.bool, device=self.sim_device)
+        self.free_dofs[fixed_bodies] = False
+        self.free_dofs = self.free_dofs.reshape((-1,))
+
+        #free bodies and the index of every body among them, for the matrix free Newton system
+        free_bodies = self.free_dofs.reshape((-1,self.dof_block_size))[:,0]
+        self.free_blocks = torch.nonzero(free_bodies).reshape((-1,)).to(torch.int32)
+        self.reduced_blocks = torch.full((self.total_dofs,), -1, dtype=torch.int32, device=self.sim_device)
+        self.reduced_blocks[self.free_blocks.long()] = torch.arange(self.free_blocks.shape[0], dtype=torch.int32, device=self.sim_device)
+
+        #mass of the free bodies, the inverse of its blocks preconditions the projected Newton system
+        self.free_mass = self.mass.subset(self.free_blocks)
+
+        #objects that cannot move this step, contacts between two of them are not needed
+        self.frozen_objects = torch.ones((len(self.objects),), dtype=torch.bool, device=self.sim_device)
+        self.frozen_objects[0:self.total_dofs] = ~free_bodies
+
+        if self.system_matrix is not None:
+            self.system_matrix.set_pinned(fixed_bodies)
+
+        #setup scene fixed DOF projection matrix, static objects have no DOFs and need no projection
+        self.P_pinned = fixed_dof_projection(None, self.q_dynamic.reshape((-1,12)), fixed_bodies)
 
     #reset simulation objects to initial states
     def reset(self):
         
+        if self.contact_cache is not None:
+            self.contact_cache.reset()
+
         for i in range(len(self.objects)):
             #initialize global q and qm1
             self.objects[i][1].set_initial_dofs(self.q[i*12:(i+1)*12], self.qm1[i*12:(i+1)*12], self.dt)
 
+        self.qm2 = 2.0*self.qm1 - self.q
+        self.newton_iterations = []
+        self.cg_iterations = []
+
+        if self.sleeping is not None:
+            self.sleeping.reset()
+            self.update_free_dofs()
+
     #take one simulation time step
     def step(self):
         
-        num_contacts = 0
-        num_contact_objects = 0
-        self.current_num_contacts[0] = 0  #reset curret number of contacts 
+        num_contacts = self.detect_contacts()
 
+        #awake bodies touching sleeping ones wake them up, the contacts of the woken bodies among themselves were skipped so they are detected again
+        while self.sleeping is not None and self.sleeping.wake_on_contacts(self.contact_pairs, self.body_velocities()):
+            self.update_free_dofs()
+            num_contacts = self.detect_contacts()
 
-        #find contac pairs between objects
-        for obj_a in range(len(self.objects)):
-            for obj_b in range(len(self.objects)):
-                if obj_a != obj_b:
-                    old_num_contacts = num_contacts
-                    num_contacts = detect_collisions(self.contact_list, self.current_num_contacts, self.obj_pair_contact_buffer, \
-                        self.objects[obj_a][1].vertices, self.mesh_dict[obj_b].id, self.q.reshape((-1,12)), obj_a, obj_b, 0.2, self.contact_threshold)
-
-                    if num_contacts > old_num_contacts:
-                        #keep track of sparse matrix contact structure here
-                        #if there is a contact between obj_a and obj_b I need to add (obj_a, obj_a), (obj_b, obj_b), (obj_a, obj_b) and (obj_b, obj_a) to the contact hessian sparsity pattern
-                        self.contact_indices[num_contact_objects,0] = obj_a
-                        self.contact_indices[num_contact_objects,1] = obj_a 
-                        self.contact_indices[num_contact_objects+1,0] = obj_b
-                        self.contact_indices[num_contact_objects+1,1] = obj_b
-                        self.contact_indices[num_contact_objects+2,0] = obj_a
-                        self.contact_indices[num_contact_objects+2,1] = obj_b
-                        self.contact_indices[num_contact_objects+3,0] = obj_b
-                        self.contact_indices[num_contact_objects+3,1] = obj_a
-        
-                        num_contact_objects += 4
-                        
-       
-       
+        num_pair_blocks = 4*self.contact_pairs.shape[0]
+
+        if self.system_matrix is not None:
+            self.system_matrix.update_pattern(self.contact_pairs, self.contact_indices[0:num_pair_blocks])
 
         #big global solve for everything
         #global q, qm1, q_pred, a_gravity,Mass_matrix,  grad_energy, params, H_blk, H_energy, dt, Pinned_matrix
-        self.q_pred = (self.q + (self.q-self.qm1) + self.dt*self.dt*self.g_gravity).detach()
+        num_dynamic = self.total_dofs*self.dof_block_size
+        self.q_pred = (self.q_dynamic + (self.q_dynamic-self.qm1[0:num_dynamic]) + self.dt*self.dt*self.g_gravity).detach()
 
         #define lambda functions for  energy, gradient and hessian
         
         #build contact list between objects 
         def energy_func(q):
             self.elastic_energy[0] = 0.0
-            wp.launch(elastic_energy, dim=len(self.objects), \
+            wp.launch(elastic_energy, dim=self.total_dofs, \
                 inputs=[wp.from_torch(self.elastic_energy, dtype=wp.float64), wp.from_torch(q.reshape((-1,12)), dtype=wp.vec(length=12,dtype=wp.float64)), wp.from_torch(self.volumes, dtype=wp.float64)], \
                 device=self.sim_device)
             
-            wp.launch(penalty_spring, dim=num_contacts, inputs=[wp.from_torch(self.elastic_energy, dtype=wp.float64), wp.from_torch(q.reshape((-1,12)), dtype=wp.vec(length=12,dtype=wp.float64)), self.contact_list, wp.float64(self.contact_stiffness)])
+            wp.launch(penalty_spring, dim=num_contacts, inputs=[wp.from_torch(self.elastic_energy, dtype=wp.float64), wp.from_torch(self.scene_q(q).reshape((-1,12)), dtype=wp.vec(length=12,dtype=wp.float64)), self.contact_list, wp.float64(self.contact_stiffness)])
           
 
             return self.elastic_energy[0].item()
 
         def gradient_func(q):
-            wp.launch(denergy_dq, dim=len(self.objects), \
+            wp.launch(denergy_dq, dim=self.total_dofs, \
                 inputs=[wp.from_torch(self.g_energy.reshape((-1,12)),dtype=wp.vec(length=12,dtype=wp.float64)), wp.from_torch(q.reshape((-1,12)), dtype=wp.vec(length=12,dtype=wp.float64)), wp.from_torch(self.volumes, dtype=wp.float64)], \
                 device=self.sim_device)
 
             #fill in contact gradients
             self.g_contact.zero_() #zero out old contact gradients
             
-            wp.launch(dpenalty_spring_dq, dim=num_contacts, inputs=[wp.from_torch(self.g_contact.reshape((-1,12)),dtype=wp.vec(length=12,dtype=wp.float64)), wp.from_torch(q.reshape((-1,12)), dtype=wp.vec(length=12,dtype=wp.float64)), self.contact_list, wp.float64(self.contact_stiffness)])
-            return self.Mass_matrix@wp.from_torch(q - self.q_pred) + (wp.from_torch(self.g_energy.reshape((-1,12)),dtype=wp.vec(length=12,dtype=wp.float64))+ wp.from_torch(self.g_contact.reshape((-1,12)),dtype=wp.vec(length=12,dtype=wp.float64)))*wp.float64(self.dt*self.dt) 
+            wp.launch(dpenalty_spring_dq, dim=num_contacts, inputs=[wp.from_torch(self.g_contact.reshape((-1,12)),dtype=wp.vec(length=12,dtype=wp.float64)), wp.from_torch(self.scene_q(q).reshape((-1,12)), dtype=wp.vec(length=12,dtype=wp.float64)), self.contact_list, wp.float64(self.contact_stiffness)])
+            g = self.mass.matvec(q - self.q_pred) + (wp.from_torch(self.g_energy.reshape((-1,12)),dtype=wp.vec(length=12,dtype=wp.float64))+ wp.from_torch(self.g_contact[0:num_dynamic].reshape((-1,12)),dtype=wp.vec(length=12,dtype=wp.float64)))*wp.float64(self.dt*self.dt) 
+
+            #the fixed pattern system matrix holds the pinned DOF projection, the gradient of pinned DOFs has to vanish
+            if self.system_matrix is not None:
+                wp.to_torch(g).reshape((-1,))[~self.free_dofs] = 0.0
+
+            return g
         
+        #energy at q + alpha*p for every line search step size, stays on the device
+        #one launch over (step size, object) and one over (step size, contact) pairs, every step size accumulates into its own row
+        def batched_energy_func(q, p, alphas):
+            energies = self.line_search_energies[0:alphas.shape[0]]
+            energies.zero_()
+            self.line_search_direction[0:num_dynamic] = p
+
+            wp.launch(elastic_energy_batched, dim=(alphas.shape[0], self.total_dofs), \
+                inputs=[wp.from_torch(energies), wp.from_torch(q.reshape((-1,12)), dtype=wp.vec(length=12,dtype=wp.float64)), wp.from_torch(p.reshape((-1,12)), dtype=wp.vec(length=12,dtype=wp.float64)), \
+                    wp.from_torch(alphas), wp.from_torch(self.volumes, dtype=wp.float64)], device=self.sim_device)
+            wp.launch(penalty_spring_batched, dim=(alphas.shape[0], num_contacts), \
+                inputs=[wp.from_torch(energies), wp.from_torch(self.scene_q(q).reshape((-1,12)), dtype=wp.vec(length=12,dtype=wp.float64)), \
+                    wp.from_torch(self.line_search_direction.reshape((-1,12)), dtype=wp.vec(length=12,dtype=wp.float64)), wp.from_torch(alphas), self.contact_list, wp.float64(self.contact_stiffness)], \
+                device=self.sim_device)
+
+            return energies[:,0]
+
+        #the matrix free system is built once per step, between Newton iterations only the elastic Hessian blocks it reads change
+        hessian_operator = HessianOperator(self.mass, self.H_energy.values, self.contact_list, num_contacts, self.contact_stiffness, self.dt, self.free_blocks, \
+            self.reduced_blocks) if self.config.solver_settings.matrix_free else None
+
         def hessian_func(q):
-            wp.launch(d2energy_dq2, dim=len(self.objects), \
+            wp.launch(d2energy_dq2, dim=self.total_dofs, \
                 inputs=[wp.to_torch(self.H_energy.values), wp.from_torch(q.reshape((-1,12)), dtype=wp.vec(length=12,dtype=wp.float64)), wp.from_torch(self.volumes, dtype=wp.float64)], \
                 device=self.sim_device)
-            
-            
+
+            #the contact term of the matrix free system is applied from the contact list, it needs no contact Hessian blocks
+            if hessian_operator is not None:
+                return hessian_operator
+
             self.contact_hessian_values.zero_()
             #fill in contact hessian 
-            wp.launch(d2penalty_spring_dq2, dim=num_contacts, inputs=[self.contact_hessian_values, wp.from_torch(self.q.reshape((-1,12)), dtype=wp.vec(length=12,dtype=wp.float64)), self.contact_list, wp.float64(self.contact_stiffness)])
+            wp.launch(d2penalty_spring_dq2, dim=num_contacts, inputs=[self.contact_hessian_values, wp.from_torch(self.scene_q(q).reshape((-1,12)), dtype=wp.vec(length=12,dtype=wp.float64)), self.contact_list, wp.float64(self.contact_stiffness)])
+
+            #one set of blocks per contact pair instead of one per contact
+            reduce_contact_pairs(self.pair_hessian_values, self.contact_hessian_values, self.contact_order, self.pair_offsets)
             
+            #write the values of the persistent system matrix in place, its mass blocks were written with its pattern
+            if self.system_matrix is not None:
+                return self.system_matrix.assemble(self.H_energy.values, self.pair_hessian_values[0:num_pair_blocks], self.dt)
+
+            #mass and elastic Hessian blocks in one pass, the 12x12 mass blocks are never stored
+            body_blocks = wp.from_torch(self.mass.system_blocks(self.body_blocks, wp.to_torch(self.H_energy.values), self.dt*self.dt), dtype=wp.mat((12,12),dtype=wp.float64))
 
             #allocate sparsity pattern for contact hessian (assuming this doesn't change during newton iterations)
-            wsp.bsr_set_from_triplets(self.H_contact, wp.from_torch(self.contact_indices[0:num_contact_objects,0], dtype=wp.int32), wp.from_torch(self.contact_indices[0:num_contact_objects,1], dtype=wp.int32), wp.from_torch(self.contact_hessian_values[0:num_contact_objects,:,:], dtype=wp.mat((12,12), dtype=wp.dtype_from_torch(self.sim_dtype))))
+            #blocks that involve static objects fall outside the matrix and are discarded by bsr_set_from_triplets
+            #the blocks are already summed per pair, so there are no duplicate triplets left to sort and sum
+            #the row and column indices are columns of contact_indices, bsr_set_from_triplets needs them contiguous
+            wsp.bsr_set_from_triplets(self.H_contact, wp.from_torch(self.contact_indices[0:num_pair_blocks,0].contiguous(), dtype=wp.int32), wp.from_torch(self.contact_indices[0:num_pair_blocks,1].contiguous(), dtype=wp.int32), wp.from_torch(self.pair_hessian_values[0:num_pair_blocks,:,:], dtype=wp.mat((12,12), dtype=wp.dtype_from_torch(self.sim_dtype))))
 
 
             
-            return self.Mass_matrix + self.dt*self.dt*(self.H_energy + self.H_contact)
+            return wsp.bsr_diag(body_blocks) + self.dt*self.dt*self.H_contact
         
 
+        #diagonal Hessian block of every dynamic body, for the block descent solver
+        def hessian_blocks_func(q):
+            wp.launch(d2energy_dq2, dim=self.total_dofs, \
+                inputs=[wp.to_torch(self.H_energy.values), wp.from_torch(q.reshape((-1,12)), dtype=wp.vec(length=12,dtype=wp.float64)), wp.from_torch(self.volumes, dtype=wp.float64)], \
+                device=self.sim_device)
+
+            self.contact_hessian_values.zero_()
+            wp.launch(d2penalty_spring_dq2, dim=num_contacts, inputs=[self.contact_hessian_values, wp.from_torch(self.scene_q(q).reshape((-1,12)), dtype=wp.vec(length=12,dtype=wp.float64)), self.contact_list, wp.float64(self.contact_stiffness)])
+
+            reduce_contact_pairs(self.pair_hessian_values, self.contact_hessian_values, self.contact_order, self.pair_offsets)
+
+            #contact blocks on the diagonal of dynamic bodies
+            rows = self.contact_indices[0:num_pair_blocks,0].long()
+            on_diagonal = (rows == self.contact_indices[0:num_pair_blocks,1].long()) & (rows < self.total_dofs)
+            blocks = self.mass.system_blocks(self.body_blocks, wp.to_torch(self.H_energy.values), self.dt*self.dt)
+
+            return blocks.index_add_(0, rows[on_diagonal], self.dt*self.dt*self.pair_hessian_values[0:num_pair_blocks][on_diagonal])
+
+        q_start = self.warm_start_configuration(energy_func, self.contact_object_ids[0:num_contacts])
+
+        self.qm2 = self.qm1
         self.qm1 = self.q.detach().clone()
 
-        #compute new position
-        newtons_method(self.q, energy_func, gradient_func, hessian_func, self.P_pinned)
+        if q_start is not None:
+            self.q_dynamic.copy_(q_start)
+
+        #compute new position, island by island or in one global solve
+        if self.free_blocks.shape[0] == 0:
+            #every body is pinned or asleep
+            iterations = None
+        elif self.config.solver_settings.method == "block_descent":
+            colors = color_bodies(self.contact_pairs, self.free_dofs.reshape((-1,self.dof_block_size))[:,0])
+            sweeps = block_descent(self.q_dynamic, lambda q: wp.to_torch(gradient_func(q)).reshape((-1,)), hessian_blocks_func, colors, \
+                self.config.solver_settings.max_iterations, self.config.solver_settings.tolerance, self.config.solver_settings.chebyshev_rho)
+            iterations = (sweeps, 0)
+        elif self.config.solver_settings.contact_islands:
+            iterations = self.solve_islands(self.contact_object_ids[0:num_contacts])
+        else:
+            iterations = newtons_method(self.q_dynamic, energy_func, gradient_func, hessian_func, self.P_pinned if self.system_matrix is None else None, self.config.solver_settings.preconditioner, self.direct_solver, \
+            self.config.solver_settings.cg_warm_start, batched_energy_func if self.config.solver_settings.line_search == "batched" else None, \
+            self.mass if self.system_matrix is not None else self.free_mass)
+        if iterations is not None:
+            self.newton_iterations.append(iterations[0])
+            self.cg_iterations.append(iterations[1])
+
+        if self.sleeping is not None:
+            self.update_sleeping(num_contacts)
+
+    #solve every island of the contact graph on its own, see given/contact_islands.py
+    #single body islands share one batched dense solve, larger islands get their own Newton solve
+    def solve_islands(self, contact_ids: torch.Tensor):
+
+        free = self.free_dofs.reshape((-1,self.dof_block_size))[:,0]
+        islands = contact_islands(self.contact_pairs, free)
+
+        island_sizes = torch.bincount(islands[free], minlength=1)
+        body_island_size = torch.where(free, island_sizes[islands.clamp(min=0)], 0)
+
+        q_bodies = self.q_dynamic.reshape((-1,12))
+        newton_iterations = 0
+        cg_iterations = 0
+
+        #scratch buffers and direct solver of every island, keyed by its bodies and kept while the island persists
+        workspaces = {}
+        def workspace(bodies):
+            key = tuple(bodies.tolist())
+            workspaces[key] = self.island_workspaces[key] if key in self.island_workspaces else ScratchBuffers(self.sim_device)
+            return workspaces[key]
+
+        singletons = torch.nonzero(body_island_size == 1).reshape((-1,))
+        if singletons.shape[0] > 0:
+            q_island, _, gradient_func, _, hessian_blocks_func, _, batched_potential_func = self.island_problem(singletons, contact_ids, workspace(singletons))
+            #same iteration cap and gradient norm tolerance as newtons_method, tested per body
+            newton_iterations += batched_dense_newton(q_island, lambda q: wp.to_torch(gradient_func(q)).reshape((-1,)), hessian_blocks_func, batched_potential_func, \
+                NEWTON_MAX_ITERATIONS, NEWTON_TOLERANCE)
+            q_bodies[singletons] = q_island.reshape((-1,12))
+
+        #bodies of every island with more than one body
+        grouped = torch.nonzero(body_island_size > 1).reshape((-1,))
+        grouped = grouped[torch.argsort(islands[grouped], stable=True)]
+        groups = torch.split(grouped, torch.unique_consecutive(islands[grouped], return_counts=True)[1].tolist()) if grouped.shape[0] > 0 else []
+        scratches = [workspace(bodies) for bodies in groups]
+
+        def solve(bodies, scratch):
+            q_island, energy_func, gradient_func, hessian_func, _, batched_energy_func, _ = self.island_problem(bodies, contact_ids, scratch)
+            #the solver keeps its symbolic factorization while the island keeps its contact pattern
+            direct_solver = scratch.object("direct_solver", BlockCholeskySolver) if self.config.solver_settings.linear_solver == "cholesky" else None
+
+            iterations = newtons_method(q_island, energy_func, gradient_func, hessian_func, None, self.config.solver_settings.preconditioner, direct_solver, \
+                self.config.solver_settings.cg_warm_start, batched_energy_func if self.config.solver_settings.line_search == "batched" else None, \
+                scratch.object("mass", lambda: self.mass.subset(bodies)))
+            q_bodies[bodies] = q_island.reshape((-1,12))
+
+            return iterations
+
+        if self.config.solver_settings.island_threads > 0:
+            with ThreadPoolExecutor(max_workers=self.config.solver_settings.island_threads) as pool:
+                results = list(pool.map(solve, groups, scratches))
+        else:
+            results = [solve(bodies, scratch) for bodies, scratch in zip(groups, scratches)]
+
+        for result in results:
+            if result is not None:
+                newton_iterations += result[0]
+                cg_iterations += result[1]
+
+        #islands that did not persist into this step release their buffers
+        self.island_workspaces = workspaces
+
+        return newton_iterations, cg_iterations
+
+    #Newton problem of a set of free bodies whose contacts only involve each other or fixed (pinned or static) objects
+    #returns the configuration of the bodies and their energy, gradient, Hessian, Hessian diagonal block, batched line search energy
+    #and batched per body incremental potential functions
+    #every problem works in its own scratch buffers (see given/scratch_buffers.py), so problems with different buffers can be solved concurrently
+    def island_problem(self, bodies: torch.Tensor, contact_ids: torch.Tensor, scratch: ScratchBuffers):
+
+        num_objects = len(self.objects)
+        num_bodies = bodies.shape[0]
+        dt2 = self.dt*self.dt
+        block_type = wp.mat((12,12), dtype=wp.float64)
+        vector_type = wp.vec(length=12,dtype=wp.float64)
+
+        #contacts of the island and the fixed objects they touch, renumbered to island bodies first, then fixed objects
+        in_island = scratch.tensor("in_island", (num_objects,), torch.bool)
+        in_island[bodies] = True
+        ids = contact_ids.long()
+        contact_index = torch.nonzero(in_island[ids[:,0]] | in_island[ids[:,1]]).reshape((-1,))
+        ids = ids[contact_index]
+        fixed = torch.unique(ids[~in_island[ids]])
+        scene = torch.cat((bodies, fixed))
+
+        local = scratch.tensor("local", (num_objects,), torch.int64, zero=False).fill_(-1)
+        local[scene] = torch.arange(scene.shape[0], device=self.sim_device)
+        local_ids = local[ids].to(torch.int32)
+
+        num_contacts = contact_index.shape[0]
+        contacts = scratch.array("contacts", num_contacts, CollisionResult)
+        wp.launch(localize_contacts, dim=num_contacts, inputs=[contacts, self.contact_list, wp.from_torch(contact_index.to(torch.int32)), wp.from_torch(local_ids)], device=self.sim_device)
+
+        q_island = self.q_dynamic.reshape((-1,12))[bodies].reshape((-1,)).clone()
+        q_fixed = self.q.reshape((-1,12))[fixed].reshape((-1,))
+        q_pred = self.q_pred.reshape((-1,12))[bodies].reshape((-1,))
+        #the bodies of a workspace never change, neither do their volumes and mass blocks
+        volumes = scratch.object("volumes", lambda: self.volumes[bodies].contiguous())
+        mass = scratch.object("mass", lambda: self.mass.subset(bodies))
+
+        energy = scratch.tensor("energy", (1,), self.sim_dtype)
+        g_energy = scratch.tensor("g_energy", (num_bodies*12,), self.sim_dtype)
+        g_contact = scratch.tensor("g_contact", (scene.shape[0]*12,), self.sim_dtype)
+        H_energy = scratch.tensor("H_energy", (num_bodies,12,12), self.sim_dtype)
+        body_blocks = scratch.tensor("body_blocks", (num_bodies,12,12), self.sim_dtype, zero=False)
+        H_contact = scratch.object("H_contact", lambda: wsp.bsr_zeros(num_bodies, num_bodies, block_type=block_type, device=self.sim_device))
+        contact_indices = scratch.tensor("contact_indices", (4*num_contacts,2), torch.int32)
+        contact_hessian_values = scratch.tensor("contact_hessian_values", (4*num_contacts,12,12), self.sim_dtype)
+        pair_hessian_values = scratch.tensor("pair_hessian_values", (4*num_contacts,12,12), self.sim_dtype)
+        contact_pairs, contact_order, pair_offsets = contact_pair_segments(contact_indices, local_ids, scene.shape[0])
+        contact_indices = contact_indices[0:4*contact_pairs.shape[0]]
+        pair_hessian_values = pair_hessian_values[0:4*contact_pairs.shape[0]]
+        line_search_direction = scratch.tensor("line_search_direction", (scene.shape[0]*12,), self.sim_dtype)
+
+        def island_scene_q(q):
+            return torch.cat((q, q_fixed)).reshape((-1,12))
+
+        def energy_func(q):
+            energy.zero_()
+            wp.launch(elastic_energy, dim=num_bodies, inputs=[wp.from_torch(energy), wp.from_torch(q.reshape((-1,12)), dtype=vector_type), wp.from_torch(volumes)], device=self.sim_device)
+            wp.launch(penalty_spring, dim=num_contacts, inputs=[wp.from_torch(energy), wp.from_torch(island_scene_q(q), dtype=vector_type), contacts, wp.float64(self.contact_stiffness)], device=self.sim_device)
+
+            return energy[0].item()
+
+        #energy at q + alpha*p for every line search step size, one batched launch for the bodies and one for the contacts
+        #num_slots = 1 gives the total energy, num_slots = num_bodies the energy of every body if no two bodies share a contact
+        def batched_energies(q, p, alphas, num_slots):
+            energies = scratch.tensor("line_search_energies", (alphas.shape[0], num_slots), self.sim_dtype)
+            line_search_direction[0:num_bodies*12] = p
+
+            wp.launch(elastic_energy_batched, dim=(alphas.shape[0], num_bodies), inputs=[wp.from_torch(energies), wp.from_torch(q.reshape((-1,12)), dtype=vector_type), \
+                wp.from_torch(p.reshape((-1,12)), dtype=vector_type), wp.from_torch(alphas), wp.from_torch(volumes)], device=self.sim_device)
+            wp.launch(penalty_spring_batched, dim=(alphas.shape[0], num_contacts), inputs=[wp.from_torch(energies), wp.from_torch(island_scene_q(q), dtype=vector_type), \
+                wp.from_torch(line_search_direction.reshape((-1,12)), dtype=vector_type), wp.from_torch(alphas), contacts, wp.float64(self.contact_stiffness)], device=self.sim_device)
+
+            return energies
+
+        def batched_energy_func(q, p, alphas):
+            return batched_energies(q, p, alphas, 1)[:,0]
+
+        #incremental potential 0.5 dq^T M dq + dt^2 E of every body at q + alpha*p, for the per body line search of batched_dense_newton
+        def batched_potential_func(q, p, alphas):
+            dq = (q - q_pred).reshape((1,-1,3,4)) + alphas.reshape((-1,1,1,1))*p.reshape((1,-1,3,4))
+            inertia = 0.5*torch.einsum("asri,sij,asrj->as", dq, mass.blocks, dq)
+
+            return inertia + dt2*batched_energies(q, p, alphas, num_bodies)
+
+        def gradient_func(q):
+            wp.launch(denergy_dq, dim=num_bodies, inputs=[wp.from_torch(g_energy.reshape((-1,12)), dtype=vector_type), wp.from_torch(q.reshape((-1,12)), dtype=vector_type), wp.from_torch(volumes)], \
+                device=self.sim_device)
+
+            g_contact.zero_()
+            wp.launch(dpenalty_spring_dq, dim=num_contacts, inputs=[wp.from_torch(g_contact.reshape((-1,12)), dtype=vector_type), wp.from_torch(island_scene_q(q), dtype=vector_type), contacts, \
+                wp.float64(self.contact_stiffness)], device=self.sim_device)
+
+            return mass.matvec(q - q_pred) + \
+                (wp.from_torch(g_energy.reshape((-1,12)), dtype=vector_type) + wp.from_torch(g_contact[0:num_bodies*12].reshape((-1,12)), dtype=vector_type))*wp.float64(dt2)
+
+        def hessian_values(q):
+            wp.launch(d2energy_dq2, dim=num_bodies, inputs=[wp.from_torch(H_energy, dtype=block_type), wp.from_torch(q.reshape((-1,12)), dtype=vector_type), wp.from_torch(volumes)], device=self.sim_device)
+
+            contact_hessian_values.zero_()
+            wp.launch(d2penalty_spring_dq2, dim=num_contacts, inputs=[contact_hessian_values, wp.from_torch(island_scene_q(q), dtype=vector_type), contacts, wp.float64(self.contact_stiffness)], \
+                device=self.sim_device)
+            reduce_contact_pairs(pair_hessian_values, contact_hessian_values, contact_order, pair_offsets)
+
+        def hessian_func(q):
+            hessian_values(q)
+
+            #blocks of fixed objects fall outside the matrix and are discarded by bsr_set_from_triplets
+            wsp.bsr_set_from_triplets(H_contact, wp.from_torch(contact_indices[:,0].contiguous()), wp.from_torch(contact_indices[:,1].contiguous()), wp.from_torch(pair_hessian_values, dtype=block_type))
+
+            return wsp.bsr_diag(wp.from_torch(mass.system_blocks(body_blocks, H_energy, dt2), dtype=block_type)) + dt2*H_contact
+
+        def hessian_blocks_func(q):
+            hessian_values(q)
+
+            rows = contact_indices[:,0].long()
+            on_diagonal = (rows == contact_indices[:,1].long()) & (rows < num_bodies)
+
+            return mass.system_blocks(body_blocks, H_energy, dt2).index_add_(0, rows[on_diagonal], dt2*pair_hessian_values[on_diagonal])
+
+        return q_island, energy_func, gradient_func, hessian_func, hessian_blocks_func, batched_energy_func, batched_potential_func
+
+    #velocity (q - qm1)/dt of every dynamic body, one row per body
+    def body_velocities(self):
+
+        num_dynamic = self.total_dofs*self.dof_block_size
+        return ((self.q_dynamic - self.qm1[0:num_dynamic])/self.dt).reshape((-1,self.dof_block_size))
+
+    #put the islands that have been at rest long enough to sleep, see given/body_sleeping.py
+    def update_sleeping(self, num_contacts: int):
+
+        #contact force of every body at the new configuration
+        self.contact_forces.zero_()
+        wp.launch(dpenalty_spring_dq, dim=num_contacts, inputs=[wp.from_torch(self.contact_forces.reshape((-1,12)), dtype=wp.vec(length=12,dtype=wp.float64)), \
+            wp.from_torch(self.q.reshape((-1,12)), dtype=wp.vec(length=12,dtype=wp.float64)), self.contact_list, wp.float64(self.contact_stiffness)])
+
+        free_bodies = self.free_dofs.reshape((-1,self.dof_block_size))[:,0]
+        islands = contact_islands(self.contact_pairs, free_bodies)
+        if self.sleeping.update(self.body_velocities(), self.contact_forces[0:self.total_dofs*self.dof_block_size].reshape((-1,self.dof_block_size)), islands):
+            self.update_free_dofs()
+
+        #sleeping bodies are at rest, they start without velocity when they wake up
+        asleep = self.sleeping.asleep.repeat_interleave(self.dof_block_size)
+        num_dynamic = self.total_dofs*self.dof_block_size
+        self.qm1[0:num_dynamic][asleep] = self.q_dynamic[asleep]
+        self.qm2[0:num_dynamic][asleep] = self.q_dynamic[asleep]
+
+    #change the velocity of an object by velocity (3D), wakes the object up if it is asleep
+    def apply_impulse(self, obj_id: int, velocity):
+
+        self.qm1.reshape((-1,12))[obj_id, 3::4] -= self.dt*torch.tensor(velocity, dtype=self.sim_dtype, device=self.sim_device)
+
+        if self.sleeping is not None and self.sleeping.wake(torch.tensor([obj_id], device=self.sim_device)):
+            self.update_free_dofs()
+
+    #incremental potential minimized by the Newton solve, energy_func only holds the elastic and contact terms
+    def incremental_potential(self, q: torch.Tensor, energy_func):
+
+        dq = q - self.q_pred
+        inertia = 0.5*torch.dot(dq, wp.to_torch(self.mass.matvec(dq)).reshape((-1,)))
+
+        return inertia.item() + self.dt*self.dt*energy_func(q)
+
+    #initial guess of the Newton solve for this step, None to start from the previous configuration
+    #objects in contact start from the previous configuration, predicting them into the contact leads to large stiff penalty forces
+    def warm_start_configuration(self, energy_func, contact_object_ids: torch.Tensor):
+
+        warm_start = self.config.solver_settings.warm_start
+        if warm_start == "none":
+            return None
+
+        num_dynamic = self.total_dofs*self.dof_block_size
+        q = self.q_dynamic.detach()
+        candidates = [self.q_pred]
+
+        if warm_start == "extrapolation":
+            qm1 = self.qm1[0:num_dynamic]
+            qm2 = self.qm2[0:num_dynamic]
+            candidates.append(q + (q - qm1) + (q - 2.0*qm1 + qm2))
+
+        moving = torch.ones((len(self.objects),), dtype=torch.bool, device=self.sim_device)
+        moving[contact_object_ids.reshape((-1,)).long()] = False
+        moving = self.free_dofs & moving[0:self.total_dofs].repeat_interleave(self.dof_block_size)
+
+        candidates = [torch.where(moving, c, q) for c in candidates]
+        if len(candidates) == 1:
+            return candidates[0]
+
+        energies = [self.incremental_potential(c, energy_func) for c in candidates]
+        return candidates[energies.index(min(energies))]
+
+    #Newton and CG iteration counts over the steps taken so far
+    #pass the statistics of a run without warm starts as baseline to get the iterations the warm starts save
+    def solver_statistics(self, baseline: dict = None):
+
+        num_steps = len(self.newton_iterations)
+        statistics = {
+            "steps": num_steps,
+            "newton_iterations": sum(self.newton_iterations),
+            "cg_iterations": sum(self.cg_iterations),
+            "newton_iterations_per_step": sum(self.newton_iterations)/max(num_steps, 1),
+            "cg_iterations_per_step": sum(self.cg_iterations)/max(num_steps, 1),
+        }
+
+        if baseline is not None:
+            statistics["newton_iterations_saved"] = baseline["newton_iterations"] - statistics["newton_iterations"]
+            statistics["cg_iterations_saved"] = baseline["cg_iterations"] - statistics["cg_iterations"]
+
+        return statistics
     
+    #find the contacts of this step, fills contact_list and contact_pairs and returns the number of contacts
+    def detect_contacts(self):
+
+        self.current_num_contacts[0] = 0  #reset curret number of contacts 
+
+        #find contac pairs between objects, only object pairs that pass the broad phase are sent to the narrow phase
+        candidate_pairs = self.find_candidate_pairs().to(torch.int32).to(self.sim_device)
+
+        #pairs of frozen (pinned, static or sleeping) objects cannot change the solve
+        if self.sleeping is not None:
+            candidate_pairs = candidate_pairs[~(self.frozen_objects[candidate_pairs[:,0].long()] & self.frozen_objects[candidate_pairs[:,1].long()])]
+
+        if self.narrow_phase == "vertex_cull":
+            work_vertex, work_pair = build_vertex_cull_work_list(candidate_pairs, self.world_lowers, self.world_uppers, self.q.reshape((-1,12)), self.vertex_bvh_ids, self.vertex_offsets)
+        else:
+            work_vertex, work_pair = build_collision_work_list(candidate_pairs, self.vertex_offsets)
+        self.reserve_narrow_phase_buffers(candidate_pairs.shape[0], work_vertex.shape[0])
+
+        if self.contact_cache is not None:
+            self.contact_cache.update(candidate_pairs, work_pair, len(self.objects))
+
+        num_contacts = detect_collisions_batched(self.contact_list, self.current_num_contacts, self.collision_buffer, self.collision_pairs, \
+            self.collision_valid_flags, self.collision_valid_offsets, \
+            wp.from_torch(self.all_vertices, dtype=wp.vec3d), wp.from_torch(work_vertex), wp.from_torch(work_pair), wp.from_torch(candidate_pairs), \
+            self.mesh_ids, wp.from_torch(self.q.reshape((-1,12)), dtype=wp.vec(length=12,dtype=wp.float64)), 0.2, self.contact_threshold, self.contact_cache, self.collision_shapes, self.sdf_grids, self.sdf_values)
+        num_contacts = min(num_contacts, self.max_contact_pairs)
+
+        #replace the contacts of every object pair by a bounded set of representative contacts
+        if self.config.contact_manifold_points is not None:
+            num_contacts = reduce_contact_manifolds(self.contact_list, num_contacts, len(self.objects), self.config.contact_manifold_points)
+
+        #keep track of sparse matrix contact structure here
+        #if there is a contact between obj_a and obj_b I need to add (obj_a, obj_a), (obj_b, obj_b), (obj_a, obj_b) and (obj_b, obj_a) to the contact hessian sparsity pattern
+        wp.launch(contact_object_ids, dim=num_contacts, inputs=[wp.from_torch(self.contact_object_ids), self.contact_list])
+        #contacts are sorted by object pair so their Hessian blocks can be summed per pair, see given/contact_pair_reduction.py
+        self.contact_pairs, self.contact_order, self.pair_offsets = contact_pair_segments(self.contact_indices, self.contact_object_ids[0:num_contacts], len(self.objects))
+
+        return num_contacts
+
+    #ordered (query object, target object) pairs that need to be sent to the narrow phase
+    def find_candidate_pairs(self):
+
+        num_objects = len(self.objects)
+
+        #world space bounds of every object, inflated by the contact threshold
+        compute_world_bounds(self.world_lowers, self.world_uppers, self.q.reshape((-1,12)), self.local_lowers, self.local_uppers, self.contact_threshold)
+
+        if self.broad_phase == "none":
+            all_pairs = torch.cartesian_prod(torch.arange(num_objects), torch.arange(num_objects))
+            return all_pairs[(all_pairs[:,0] != all_pairs[:,1]) & (all_pairs[:,0] < self.total_dofs)]
+
+        if self.broad_phase == "hash_grid":
+            pairs = self.hash_grid.pairs(self.world_lowers, self.world_uppers)
+        else:
+            pairs = sweep_and_prune(self.world_lowers, self.world_uppers)
+
+        #collision detection is one sided (vertices of a against the mesh of b) so each overlapping pair is checked in both directions
+        #static objects never query, contact terms are only generated for the vertices of dynamic objects
+        ordered_pairs = torch.cat([pairs, pairs.flip(1)])
+        ordered_pairs = ordered_pairs[ordered_pairs[:,0] < self.total_dofs]
+        return ordered_pairs[torch.argsort(ordered_pairs[:,0]*num_objects + ordered_pairs[:,1])]
+
+    #make sure the narrow phase scratch buffers can hold num_pairs pairs and num_work work list entries
+    def reserve_narrow_phase_buffers(self, num_pairs: int, num_work: int):
+
+        if self.collision_pairs.shape[0] < num_pairs:
+            self.collision_pairs = wp.array(shape=(max(num_pairs, 2*self.collision_pairs.shape[0]),), dtype=CollisionPair, device=self.sim_device)
+
+        if self.collision_buffer.shape[0] < num_work:
+            capacity = max(num_work, 2*self.collision_buffer.shape[0])
+            self.collision_buffer = wp.array(shape=(capacity,), dtype=CollisionResult, device=self.sim_device)
+            self.collision_valid_flags = wp.array(shape=(capacity,), dtype=wp.int32, device=self.sim_device)
+            self.collision_valid_offsets = wp.array(shape=(capacity,), dtype=wp.int32, device=self.sim_device)
+
+    #configuration of every object in the scene given the configuration q of the dynamic objects
+    def scene_q(self, q: torch.Tensor):
+
+        if q.shape[0] == self.q.shape[0]:
+            return q
+
+        return torch.cat((q, self.q[q.shape[0]:]))
+
     def get_deformed_vertices(self, obj_id: int):
         return self.objects[obj_id][1].get_deformed_vertices(self.q[obj_id*12:(obj_id+1)*12])
 
@@ -0,0 +1,77 @@
+"""
+Granular pile scene configuration.
+A 10x10x10 block of spheres falling on a static floor, uses the hash grid broad phase.
+"""
+
+from data import get_data_directory
+from utils import SimulationConfig, ObjectConfig, MaterialConfig, SolverConfig, ShapeConfig
+
+class BunnyConfig(SimulationConfig):
+    """Granular pile scene configuration."""
+    
+    def __init__(self):
+        # Material for every sphere
+        tet_material = MaterialConfig(
+            density=1000.0,
+            material_model="NeoHookean",
+            youngs=1e8,
+            poissons=0.3,
+        )
+        
+        # Solver settings
+        solver_settings = SolverConfig(
+            max_iterations=200,
+            tolerance=1e-3
+        )
+
+        #sphere.obj is an icosphere of radius 0.2, slightly off the origin
+        sphere_shape = ShapeConfig(type="sphere", center=[0.015632, 0.0, -0.001367], radius=0.2)
+
+        floor = ObjectConfig(
+            geometry_type="static",
+            mesh=str(get_data_directory() / "slab.obj"),
+            transform=[
+                [5.0, 0.0, 0.0, 0.0],
+                [0.0, 1.0, 0.0, 0.0],
+                [0.0, 0.0, 5.0, 0.0],
+                [0.0, 0.0, 0.0, 1.0]
+            ],
+            material=tet_material
+        )
+        
+        objects = []
+
+        #spheres on a slightly jittered lattice so the pile does not stay stacked
+        n = 10
+        for i in range(n):
+            for j in range(n):
+                for k in range(n):
+                    sphere = ObjectConfig(
+                        geometry_type="rigid",
+                        mesh=str(get_data_directory() / "sphere.obj"),
+                        transform=[
+                            [1.0, 0.0, 0.0, (i - 0.5*n)*0.45 + 0.01*(j%3)],
+                            [0.0, 1.0, 0.0, 0.3 + k*0.45],
+                            [0.0, 0.0, 1.0, (j - 0.5*n)*0.45 + 0.01*(i%3)],
+                            [0.0, 0.0, 0.0, 1.0]
+                        ],
+                        material=tet_material,
+                        collision_num_vertices=64,
+                        collision_shape=sphere_shape
+                    )
+
+                    objects.append(sphere)
+
+        objects.append(floor)
+            
+        # Initialize simulation configuration
+        super().__init__(
+            objects=objects,
+            timestep=0.01,
+            gravity=[0.0, -9.8, 0.0],
+            contact_stiffness=1e4,
+            contact_threshold=1e-2,
+            max_contact_pairs=100000,
+            broad_phase="hash_grid",
+            solver_settings=solver_settings
+        )
@@ -0,0 +1,94 @@
+"""
+Two spheres falling on a static floor, using analytic collision shapes.
+The spheres are described by their center and radius and the floor by the half space below its top face,
+so no contact query needs a BVH traversal.
+"""
+
+from data import get_data_directory
+from utils import SimulationConfig, ObjectConfig, MaterialConfig, SolverConfig, ShapeConfig
+
+class BunnyConfig(SimulationConfig):
+    """Two analytic spheres on an analytic static floor scene configuration."""
+    
+    def __init__(self):
+        # Material shared by the spheres and the floor
+        tet_material = MaterialConfig(
+            density=1000.0,
+            material_model="NeoHookean",
+            youngs=1e8,  # 100 MPa
+            poissons=0.3,
+        )
+        
+        # Solver settings
+        solver_settings = SolverConfig(
+            max_iterations=200,
+            tolerance=1e-3
+        )
+        
+       
+        #sphere.obj is an icosphere of radius 0.2, slightly off the origin
+        sphere_shape = ShapeConfig(type="sphere", center=[0.015632, 0.0, -0.001367], radius=0.2)
+        floor_shape = ShapeConfig(type="half_space", center=[0.0, 0.038311, 0.0], normal=[0.0, 1.0, 0.0])
+
+        floor = ObjectConfig(
+            geometry_type="static",
+            mesh=str(get_data_directory() / "slab.obj"),
+            initial_velocity=[0.0, 0.0, 0.0],  # ignored, static objects do not move
+            transform=[
+                [1.0, 0.0, 0.0, 0.0],
+                [0.0, 1.0, 0.0, 0.0],
+                [0.0, 0.0, 1.0, 0.0],
+                [0.0, 0.0, 0.0, 1.0]
+            ],
+            material=tet_material,
+            collision_shape=floor_shape
+        )
+        
+        objects = []
+
+        #two spheres above the floor, the upper one is offset in x so it lands on the side of the lower one
+        
+        sphere_0 = ObjectConfig(
+            geometry_type="rigid",
+            mesh=str(get_data_directory() / "sphere.obj"),
+            initial_velocity=[0.0, 0.0, 0.0],  # dropped from rest
+            
+            transform=[
+                [1.0, 0.0, 0.0, 0.25],
+                [0.0, 1.0, 0.0, 1.0],
+                [0.0, 0.0, 1.0, 0.0],
+                [0.0, 0.0, 0.0, 1.0]
+            ],
+            material=tet_material,
+            collision_shape=sphere_shape
+        )
+
+        sphere_1 = ObjectConfig(
+            geometry_type="rigid",
+            mesh=str(get_data_directory() / "sphere.obj"),
+            initial_velocity=[0.0, 0.0, 0.0],  # dropped from rest
+            
+            transform=[
+                [1.0, 0.0, 0.0, 0.0],
+                [0.0, 1.0, 0.0, 0.5],
+                [0.0, 0.0, 1.0, 0.0],
+                [0.0, 0.0, 0.0, 1.0]
+            ],
+            material=tet_material,
+            collision_shape=sphere_shape
+        )
+
+        objects.append(sphere_0)
+
+        objects.append(floor)
+        objects.append(sphere_1)
+            
+        # Initialize simulation configuration
+        super().__init__(
+            objects=objects,
+            timestep=0.01,
+            gravity=[0.0, -9.8, 0.0],
+            contact_stiffness=1e4,
+            contact_threshold=1e-2,
+            solver_settings=solver_settings
+        )
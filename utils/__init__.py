@@ -1,8 +1,11 @@
 # Utils package for finite element analysis utilities
 from .block_diagonal_identity import block_diagonal_identity
 from .to_torch_tensor import to_torch_tensor
-from .config import SimulationConfig, ObjectConfig, MaterialConfig, SolverConfig
+from .config import SimulationConfig, ObjectConfig, MaterialConfig, SolverConfig, ShapeConfig
 from .model import Model
 from .load_config import load_config
 from .emu2lame import emu2lame 
+from .decimate_mesh import decimate_mesh
+from .compute_sdf_grid import compute_sdf_grid
+from .geometry_registry import Geometry, GeometryRegistry
 from .usdmultimeshwriter import USDMultiMeshWriter
\ No newline at end of file
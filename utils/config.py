@@ -32,6 +32,17 @@ class SolverConfig:
     """Configuration for Newton solver."""
     max_iterations: int = 300
     tolerance: float = 1e-3
+    preconditioner: str = "diag"  # CG preconditioner, "diag" (Jacobi), "block_jacobi" (inverse of every 12x12 diagonal block) or "mass" (inverse of the 4x4 mass blocks, factored once)
+    linear_solver: str = "cg"  # Newton system solver, "cg" (preconditioned conjugate gradients) or "cholesky" (sparse block Cholesky, symbolic analysis reused while the contact pattern is unchanged)
+    warm_start: str = "none"  # Newton initial guess, "none" (previous step), "predictor" (q_pred) or "extrapolation" (lower energy of q_pred and acceleration extrapolation)
+    cg_warm_start: bool = False  # start CG from the previous Newton direction scaled to the current system
+    line_search: str = "backtracking"  # "backtracking" (one energy evaluation and host sync per trial) or "batched" (all step sizes at once, selected on the device)
+    matrix_free: bool = False  # apply the Newton system matrix to vectors without assembling it (CG only)
+    fixed_pattern: bool = False  # assemble the Newton system matrix in place into a persistent block pattern, rebuilt only when the contact pairs change
+    contact_islands: bool = False  # solve every connected component of the contact graph on its own, single bodies in one batched dense solve
+    island_threads: int = 0  # number of threads solving islands concurrently, 0 solves them one after the other
+    method: str = "newton"  # "newton" (global Newton solve) or "block_descent" (local Newton steps body by body over a coloring of the contact graph, up to max_iterations sweeps)
+    chebyshev_rho: Optional[float] = None  # if set, block descent sweeps are Chebyshev accelerated with this estimate of their spectral radius
     
     def __post_init__(self):
         """Validate solver parameters after initialization."""
@@ -39,12 +50,61 @@ class SolverConfig:
             raise ValueError("Max iterations must be positive")
         if self.tolerance <= 0:
             raise ValueError("Tolerance must be positive")
+        if self.preconditioner not in ["diag", "block_jacobi", "mass"]:
+            raise ValueError("Preconditioner must be 'diag' or 'block_jacobi' or 'mass'")
+        if self.linear_solver not in ["cg", "cholesky"]:
+            raise ValueError("Linear solver must be 'cg' or 'cholesky'")
+        if self.warm_start not in ["none", "predictor", "extrapolation"]:
+            raise ValueError("Warm start must be 'none' or 'predictor' or 'extrapolation'")
+        if self.line_search not in ["backtracking", "batched"]:
+            raise ValueError("Line search must be 'backtracking' or 'batched'")
+        if self.matrix_free and self.linear_solver != "cg":
+            raise ValueError("Matrix free Newton systems require the 'cg' linear solver")
+        if self.matrix_free and self.fixed_pattern:
+            raise ValueError("Matrix free and fixed pattern Newton systems are exclusive")
+        if self.contact_islands and (self.matrix_free or self.fixed_pattern):
+            raise ValueError("Contact islands assemble their own Newton systems, they cannot be matrix free or fixed pattern")
+        if self.island_threads < 0:
+            raise ValueError("Island threads must be non-negative")
+        if self.method not in ["newton", "block_descent"]:
+            raise ValueError("Method must be 'newton' or 'block_descent'")
+        if self.method == "block_descent" and (self.contact_islands or self.matrix_free or self.fixed_pattern):
+            raise ValueError("Block descent does not solve a global Newton system, it cannot be combined with contact islands, matrix free or fixed pattern systems")
+        if self.chebyshev_rho is not None and not (0 < self.chebyshev_rho < 1):
+            raise ValueError("Chebyshev spectral radius must be in range (0, 1)")
+
+
+@dataclass
+class ShapeConfig:
+    """Analytic collision shape, given in the undeformed space of the object's mesh."""
+    type: str = "mesh"  # "mesh", "sphere", "box" or "half_space"
+    center: List[float] = field(default_factory=lambda: [0.0, 0.0, 0.0])  # sphere/box center or a point on the plane of a half space
+    radius: float = 0.0  # sphere radius
+    half_extents: List[float] = field(default_factory=lambda: [0.0, 0.0, 0.0])  # box half extents
+    normal: List[float] = field(default_factory=lambda: [0.0, 1.0, 0.0])  # outward normal of a half space
+    
+    def __post_init__(self):
+        """Validate shape parameters after initialization."""
+        if self.type not in ["mesh", "sphere", "box", "half_space"]:
+            raise ValueError("Shape type must be 'mesh' or 'sphere' or 'box' or 'half_space' ")
+        if len(self.center) != 3:
+            raise ValueError("Shape center must be 3D")
+        if len(self.half_extents) != 3:
+            raise ValueError("Box half extents must be 3D")
+        if len(self.normal) != 3:
+            raise ValueError("Half space normal must be 3D")
+        if self.type == "sphere" and self.radius <= 0:
+            raise ValueError("Sphere radius must be positive")
+        if self.type == "box" and min(self.half_extents) <= 0:
+            raise ValueError("Box half extents must be positive")
+        if self.type == "half_space" and sum([x*x for x in self.normal]) == 0:
+            raise ValueError("Half space normal must be non-zero")
 
 
 @dataclass
 class ObjectConfig:
     """Configuration for a simulation object."""
-    geometry_type: str = "solid"  # "solid" or "cloth"
+    geometry_type: str = "solid"  # "solid", "shell", "rigid" or "static" (immovable collider without DOFs)
     mesh: str = ""  # Path to mesh file
     initial_velocity: List[float] = field(default_factory=lambda: [0.0, 0.0, 0.0])
     transform: List[List[float]] = field(default_factory=lambda: [
@@ -55,6 +115,10 @@ class ObjectConfig:
     ])
     material: MaterialConfig = field(default_factory=MaterialConfig)
     pinned_dofs: Optional[List[int]] = None  
+    collision_mesh: str = ""  # Optional path to a coarse mesh used for collision detection instead of the render mesh
+    collision_num_vertices: Optional[int] = None  # Optional target vertex count for an automatically decimated collision mesh
+    collision_shape: ShapeConfig = field(default_factory=ShapeConfig)  # Optional analytic shape used instead of the mesh surface in the narrow phase
+    sdf_resolution: Optional[int] = None  # Optional number of cells along the longest side of a precomputed signed distance grid used instead of the mesh surface
   
     
     def __post_init__(self):
@@ -73,9 +137,33 @@ class ObjectConfig:
         if len(self.initial_velocity) != 3:
             raise ValueError("Initial velocity must be 3D")
         
+        # Validate collision proxy
+        if self.collision_mesh and self.collision_num_vertices is not None:
+            raise ValueError("Specify either a collision mesh or a collision vertex count, not both")
+        if self.collision_num_vertices is not None and self.collision_num_vertices < 4:
+            raise ValueError("Collision vertex count must be at least 4")
+        
+        # Validate signed distance grid
+        if self.sdf_resolution is not None and self.sdf_resolution < 2:
+            raise ValueError("Signed distance grid resolution must be at least 2")
+        
         # Validate geometry type
-        if self.geometry_type not in ["solid", "shell", "rigid"]:
-            raise ValueError("Geometry type must be 'solid' or 'shell' or 'rigid' ")
+        if self.geometry_type not in ["solid", "shell", "rigid", "static"]:
+            raise ValueError("Geometry type must be 'solid' or 'shell' or 'rigid' or 'static' ")
+
+        # Static objects bake their transform into their analytic shape, only transforms that keep the shape type can be baked
+        if self.geometry_type == "static":
+            A = [row[0:3] for row in self.transform[0:3]]
+            scale = max(abs(x) for row in A for x in row)
+            if self.collision_shape.type == "sphere":
+                #A^T A = s^2 I, a rotation (or reflection) times a uniform scale maps a sphere to a sphere
+                G = [[sum(A[k][i]*A[k][j] for k in range(3)) for j in range(3)] for i in range(3)]
+                if any(abs(G[i][j] - (G[0][0] if i == j else 0.0)) > 1e-6*scale*scale for i in range(3) for j in range(3)):
+                    raise ValueError("Static sphere collision shapes only support rotations and uniform scaling")
+            if self.collision_shape.type == "box":
+                #a diagonal A keeps the box axis aligned, boxes are not stored with an orientation
+                if any(abs(A[i][j]) > 1e-6*scale for i in range(3) for j in range(3) if i != j):
+                    raise ValueError("Static box collision shapes only support axis aligned scaling, not rotations")
 
 
 @dataclass
@@ -88,6 +176,14 @@ class SimulationConfig:
     max_contact_pairs: int = 5000
     contact_stiffness: float = 1e6
     contact_threshold: float = 1e-2
+    broad_phase: str = "sap"  # "sap" (sweep and prune over object bounds), "hash_grid" (uniform grid over object centers, for thousands of bodies) or "none" (test all object pairs)
+    contact_caching: bool = False  # reuse closest faces of the previous time step in the narrow phase
+    contact_manifold_points: Optional[int] = None  # if set, the contacts of every object pair are reduced to at most this many representative contacts
+    narrow_phase: str = "vertices"  # "vertices" (query every vertex of a candidate pair) or "vertex_cull" (only vertices inside the overlap of the pair bounds, found with a BVH over the query vertices)
+    sdf_cache_directory: str = ".sdf_cache"  # where precomputed signed distance grids are stored, empty to disable
+    sleep_velocity: Optional[float] = None  # if set, bodies whose velocity stays below this value for sleep_steps steps are frozen until a new contact or an impulse wakes them up
+    sleep_force_change: float = 0.05  # change of the contact force per step, relative to its magnitude, below which a body can fall asleep
+    sleep_steps: int = 10  # number of consecutive steps at rest after which a contact island falls asleep
 
     def __post_init__(self):
         """Validate simulation configuration after initialization."""
@@ -101,4 +197,25 @@ class SimulationConfig:
             raise ValueError("At least one object must be specified")
 
         if self.contact_stiffness <= 0:
-            raise ValueError("Contact stiffness must be positive")
\ No newline at end of file
+            raise ValueError("Contact stiffness must be positive")
+
+        if self.broad_phase not in ["sap", "hash_grid", "none"]:
+            raise ValueError("Broad phase must be 'sap' or 'hash_grid' or 'none'")
+
+        if self.narrow_phase not in ["vertices", "vertex_cull"]:
+            raise ValueError("Narrow phase must be 'vertices' or 'vertex_cull'")
+
+        if self.contact_manifold_points is not None and self.contact_manifold_points < 4:
+            raise ValueError("Contact manifolds must keep at least 4 points")
+
+        if self.contact_caching and self.narrow_phase != "vertices":
+            raise ValueError("Contact caching requires the 'vertices' narrow phase")
+
+        if self.sleep_velocity is not None and self.sleep_velocity <= 0:
+            raise ValueError("Sleep velocity must be positive")
+
+        if self.sleep_force_change <= 0:
+            raise ValueError("Sleep force change must be positive")
+
+        if self.sleep_steps <= 0:
+            raise ValueError("Sleep steps must be positive")
\ No newline at end of file
@@ -0,0 +1,39 @@
+import numpy as np
+import igl
+
+def decimate_mesh(vertices: np.ndarray, triangles: np.ndarray, target_vertices: int) -> (np.ndarray, np.ndarray):
+    """
+    Builds a coarse version of a closed triangle mesh with roughly a target number of vertices.
+    
+    This Python function is used to generate collision proxies for objects whose render mesh
+    is much denser than needed for contact. The narrow phase queries every vertex of the
+    proxy, so its cost scales with the target vertex count rather than the render resolution.
+    
+    Parameters
+    ----------
+    vertices : np.ndarray
+        (V,3) array of mesh vertex positions.
+    triangles : np.ndarray
+        (F,3) array of triangle vertex indices.
+    target_vertices : int
+        Desired number of vertices of the decimated mesh.
+    
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        The decimated (vertices, triangles). If the input already has at most target_vertices
+        vertices it is returned unchanged.
+    
+    Notes
+    -----
+    Decimation uses libigl's edge collapse (igl.decimate), which stops at a face budget. For a
+    closed genus zero mesh the number of faces is 2V-4, so the face budget is derived from the
+    target vertex count.
+    """
+    if vertices.shape[0] <= target_vertices:
+        return vertices, triangles
+
+    max_faces = max(2*target_vertices - 4, 4)
+    decimated_vertices, decimated_triangles, _, _ = igl.decimate(vertices, triangles, max_faces)
+
+    return np.ascontiguousarray(decimated_vertices), np.ascontiguousarray(decimated_triangles)
@@ -0,0 +1,105 @@
+"""
+Registry of the mesh geometry shared by objects that use the same mesh file.
+"""
+
+import hashlib
+import os
+import numpy as np
+import torch
+import igl
+
+from .config import ObjectConfig
+from .decimate_mesh import decimate_mesh
+
+class Geometry:
+    """Render and collision mesh of one mesh file, shared by every object instancing it."""
+
+    def __init__(self, key: tuple, vertices: np.ndarray, triangles: np.ndarray, collision_vertices: np.ndarray, collision_triangles: np.ndarray, sim_device, sim_dtype):
+        """
+        Initialize the host and device buffers of a geometry.
+
+        Args:
+            key: identifies the geometry, equal keys mean equal buffers
+            vertices, triangles: render mesh
+            collision_vertices, collision_triangles: collision proxy mesh
+            sim_device: torch device of the device buffers
+            sim_dtype: torch dtype of the vertex positions
+        """
+        self.key = key
+
+        #host buffers
+        self.host_vertices = vertices
+        self.host_triangles = triangles
+        self.host_collision_vertices = collision_vertices
+        self.host_collision_triangles = collision_triangles
+
+        #device buffers
+        self.vertices = torch.tensor(vertices, dtype=sim_dtype, device=sim_device)
+        self.triangles = torch.tensor(triangles, dtype=torch.int32, device=sim_device)
+        self.collision_vertices = torch.tensor(collision_vertices, dtype=sim_dtype, device=sim_device)
+        self.collision_triangles = torch.tensor(collision_triangles, dtype=torch.int32, device=sim_device)
+
+class GeometryRegistry:
+    """Loads every mesh file once and hands out the same Geometry to all objects using it."""
+
+    def __init__(self, sim_device, sim_dtype):
+        """
+        Initialize an empty registry.
+
+        Args:
+            sim_device: torch device of the device buffers
+            sim_dtype: torch dtype of the vertex positions
+        """
+        self.sim_device = sim_device
+        self.sim_dtype = sim_dtype
+        self.meshes = {}  # (path, content hash) -> (vertices, triangles) read from the file
+        self.geometries = {}  # (mesh key, collision proxy key) -> Geometry
+
+    def read_mesh(self, path: str) -> (tuple, np.ndarray, np.ndarray):
+        """
+        Read a mesh file unless a file with the same path and content was read before.
+
+        Args:
+            path: path of an OBJ file
+
+        Returns:
+            tuple: (key, vertices, triangles) where key is the (absolute path, content hash) of the file
+        """
+        with open(path, "rb") as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+        key = (os.path.realpath(path), digest)
+
+        if key not in self.meshes:
+            vertices, _, _, triangles, _, _ = igl.readOBJ(path)
+            self.meshes[key] = (vertices, triangles)
+
+        return (key,) + self.meshes[key]
+
+    def load(self, config: ObjectConfig) -> Geometry:
+        """
+        Geometry of an object, shared with all objects that have the same mesh and collision proxy.
+
+        Args:
+            config: object configuration, its mesh, collision_mesh and collision_num_vertices select the geometry
+
+        Returns:
+            Geometry: the shared geometry, its buffers must not be modified in place
+        """
+        mesh_key, vertices, triangles = self.read_mesh(config.mesh)
+
+        #collision proxy used by the narrow phase, the render mesh is used if no proxy is specified
+        if config.collision_mesh:
+            collision_key, collision_vertices, collision_triangles = self.read_mesh(config.collision_mesh)
+        else:
+            collision_key = config.collision_num_vertices
+
+        key = (mesh_key, collision_key)
+        if key not in self.geometries:
+            if config.collision_num_vertices is not None:
+                collision_vertices, collision_triangles = decimate_mesh(vertices, triangles, config.collision_num_vertices)
+            elif not config.collision_mesh:
+                collision_vertices, collision_triangles = vertices, triangles
+
+            self.geometries[key] = Geometry(key, vertices, triangles, collision_vertices, collision_triangles, self.sim_device, self.sim_dtype)
+
+        return self.geometries[key]